@@ -1,39 +1,463 @@
+import gc
+import os
+import re
+import sys
+import threading
 import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+from matplotlib.container import BarContainer
 import seaborn as sns
 
+'''
+Timing engine shared by every benchmark script.
+
+Each callable is run a few untimed warmup iterations first (so the cold-cache first read does not get mixed
+into the warm numbers), then timed with the garbage collector disabled. Repetition is adaptive: after the
+minimum number of runs, more runs are added until the bootstrap confidence interval of the median is within
+`target_ci` (relative half-width) of the median, or until `max_runs` / `max_time` is reached.
+
+Variables:
+- `WARMUP_RUNS`: Default number of untimed warmup iterations.
+- `TARGET_CI`: Default target relative half-width of the median's confidence interval (None = fixed runs).
+- `MAX_RUNS`: Upper bound on timed runs when repeating adaptively.
+- `MAX_TIME`: Upper bound in seconds on total timed work when repeating adaptively.
+- `CONFIDENCE`: Confidence level of the bootstrap interval.
+- `BOOTSTRAP_SAMPLES`: Number of bootstrap resamples.
+
+Output contracts (`ARROW`, `PANDAS`, `POLARS`, `COUNT`) declare what a case must hand back before the timer
+stops. Lazy results such as a DuckDB query (`con.execute(...)`/`con.sql(...)`) or a Polars LazyFrame are
+materialised inside the timed region with `fetch_arrow_table()`/`to_arrow_table()`, `.df()`, `.pl()`, `.collect()` or `fetchone()`,
+so every engine is timed for the same end-to-end work.
+
+Memory is measured after timing, in untimed runs so the instrumentation does not distort the timings: one run
+records the process peak RSS (reset via /proc/self/clear_refs on Linux, otherwise the lifetime `ru_maxrss`, which
+is only meaningful for process-isolated runs), the Arrow memory pool and the DuckDB buffer manager, and a second
+run records Python heap growth with tracemalloc. The Arrow peak of the first run is read from a proxy of the default
+pool, installed as pyarrow's default for that run only, since the default pool's own peak covers the whole process.
+During the first run of a DuckDB case the size of DuckDB's temporary directory is polled every `SPILL_POLL` seconds,
+and its peak is how much the case spilled to disk (DuckDB's profiler only reports the peak since the connection was
+opened, so a case would inherit the spill of an earlier one).
+- `MEASURE_MEMORY`: Whether `timing` profiles memory by default.
+- `SPILL_POLL`: Seconds between two reads of the size of DuckDB's temporary directory.
+'''
+
+WARMUP_RUNS = 1
+TARGET_CI = None
+MAX_RUNS = 50
+MAX_TIME = 60.0
+CONFIDENCE = 0.95
+BOOTSTRAP_SAMPLES = 2000
+MEASURE_MEMORY = True
+SPILL_POLL = 0.01
+
+# Output contracts
+ARROW = "arrow"
+PANDAS = "pandas"
+POLARS = "polars"
+COUNT = "count"
+OUTPUTS = (ARROW, PANDAS, POLARS, COUNT)
+
+
+MB = 1024 ** 2
+
+
+@dataclass
+class MemoryResult:
+    peak_rss: int = None  # process high-water mark during the run, bytes
+    peak_rss_increase: int = None  # peak RSS above the RSS at the start of the run, bytes
+    arrow_allocated: int = None  # growth of pyarrow.total_allocated_bytes() over the run (retained by the result)
+    arrow_peak: int = None  # peak of the Arrow allocations made through pyarrow's default pool during the run
+    python_peak: int = None  # tracemalloc peak during the run
+    python_growth: int = None  # tracemalloc growth over the run (retained by the result)
+    duckdb_memory_usage: int = None  # DuckDB buffer manager usage after the run
+    duckdb_memory_limit: str = None
+    duckdb_spill: int = None  # peak size of DuckDB's temporary directory during the run's last query, bytes
+
+    def summary(self):
+        def mb(value):
+            return None if value is None else value / MB
+        return {
+            "Peak RSS (MB)": mb(self.peak_rss),
+            "RSS Increase (MB)": mb(self.peak_rss_increase),
+            "Arrow Allocated (MB)": mb(self.arrow_allocated),
+            "Arrow Peak (MB)": mb(self.arrow_peak),
+            "Python Peak (MB)": mb(self.python_peak),
+            "Python Growth (MB)": mb(self.python_growth),
+            "DuckDB Memory (MB)": mb(self.duckdb_memory_usage),
+            "DuckDB Limit": self.duckdb_memory_limit,
+            "DuckDB Spill (MB)": mb(self.duckdb_spill),
+        }
+
+
+@dataclass
+class TimingResult:
+    label: str
+    times: list = field(default_factory=list)
+    warmup: int = 0
+    memory: MemoryResult = None
+
+    @property
+    def runs(self):
+        return len(self.times)
+
+    @property
+    def mean(self):
+        return float(np.mean(self.times))
+
+    @property
+    def median(self):
+        return float(np.median(self.times))
+
+    @property
+    def stddev(self):
+        return float(np.std(self.times, ddof=1)) if self.runs > 1 else 0.0
+
+    @property
+    def p5(self):
+        return float(np.percentile(self.times, 5))
+
+    @property
+    def p95(self):
+        return float(np.percentile(self.times, 95))
+
+    @property
+    def ci(self):
+        return bootstrap_ci(self.times)
+
+    @property
+    def outliers(self):
+        # Tukey fences: runs outside 1.5 * IQR of the quartiles
+        q1, q3 = np.percentile(self.times, [25, 75])
+        iqr = q3 - q1
+        times = np.asarray(self.times)
+        return int(np.sum((times < q1 - 1.5 * iqr) | (times > q3 + 1.5 * iqr)))
+
+    def scaled(self, factor, label=None):
+        # Same distribution divided by `factor`, used for relative speeds
+        return TimingResult(label or self.label, [t / factor for t in self.times], self.warmup, self.memory)
+
+    def summary(self):
+        ci_low, ci_high = self.ci
+        return {
+            "Method": self.label,
+            "Median": self.median,
+            "Mean": self.mean,
+            "Std": self.stddev,
+            "P5": self.p5,
+            "P95": self.p95,
+            "CI Low": ci_low,
+            "CI High": ci_high,
+            "Runs": self.runs,
+            "Outliers": self.outliers,
+            **(self.memory.summary() if self.memory else {}),
+        }
+
+
+# Percentile bootstrap confidence interval of a statistic (median by default)
+def bootstrap_ci(times, confidence=None, samples=None, statistic=np.median, seed=0):
+    confidence = CONFIDENCE if confidence is None else confidence
+    samples = BOOTSTRAP_SAMPLES if samples is None else samples
+    times = np.asarray(times, dtype=float)
+    if len(times) < 2:
+        value = float(statistic(times))
+        return value, value
+    rng = np.random.default_rng(seed)
+    resamples = rng.choice(times, size=(samples, len(times)), replace=True)
+    stats = statistic(resamples, axis=1)
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(stats, [alpha, 1 - alpha])
+    return float(low), float(high)
+
+
+def _ci_reached(times, target_ci):
+    low, high = bootstrap_ci(times)
+    median = np.median(times)
+    return median > 0 and (high - low) / 2 / median <= target_ci
+
+
+def _proc_status(field):
+    try:
+        with open("/proc/self/status") as f:
+            match = re.search(rf"^{field}:\s+(\d+) kB", f.read(), re.MULTILINE)
+    except OSError:
+        return None
+    return int(match.group(1)) * 1024 if match else None
+
+
+# Reset the kernel's peak RSS counter (Linux only); False when the peak can only be read as a lifetime maximum
+def _reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss():
+    peak = _proc_status("VmHWM")
+    if peak is not None:
+        return peak
+    try:
+        import resource
+    except ImportError:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def _arrow_pool():
+    # only report Arrow if the case (or an engine) has loaded it
+    pa = sys.modules.get("pyarrow")
+    return (pa, pa.default_memory_pool()) if pa else (None, None)
+
+
+# Proxy pools installed for a profiled run. Arrow buffers keep a plain pointer to the pool that allocated them, so a
+# proxy is never freed while a buffer from the run (e.g. cached by a case) may still release memory through it.
+_RUN_POOLS = []
+
+
+# Route pyarrow's default pool through a fresh proxy inside the block; yields the proxy (None without pyarrow)
+@contextmanager
+def _arrow_run_pool():
+    pa, pool = _arrow_pool()
+    if pa is None:
+        yield None
+        return
+    proxy = pa.proxy_memory_pool(pool)
+    _RUN_POOLS.append(proxy)
+    pa.set_memory_pool(proxy)
+    try:
+        yield proxy
+    finally:
+        pa.set_memory_pool(pool)
+
+
+def _duckdb_memory(con):
+    if con is None:
+        return None, None
+    usage = con.execute("SELECT sum(memory_usage_bytes) FROM duckdb_memory()").fetchone()[0]
+    limit = con.execute("SELECT current_setting('memory_limit')").fetchone()[0]
+    return (int(usage) if usage is not None else None), limit
+
+
+def _directory_size(directory):
+    size = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            try:
+                size += os.path.getsize(os.path.join(root, name))
+            except OSError:  # a temporary file removed while walking
+                pass
+    return size
+
+
+# Poll the size of `con`'s temporary directory inside the block; yields a dict that gets its peak, in bytes
+@contextmanager
+def _duckdb_spill(con):
+    spill = {}
+    if con is None:
+        yield spill
+        return
+    directory = con.execute("SELECT current_setting('temp_directory')").fetchone()[0]
+    done = threading.Event()
+
+    def poll():
+        peak = 0
+        while True:
+            peak = max(peak, _directory_size(directory))
+            if done.wait(SPILL_POLL):
+                break
+        spill["bytes"] = peak
+
+    poller = threading.Thread(target=poll, daemon=True)
+    poller.start()
+    try:
+        yield spill
+    finally:
+        done.set()
+        poller.join()
+
+
+# One untimed run for RSS/Arrow/DuckDB, then one under tracemalloc for the Python heap
+def profile_memory(func, output=None, setup=None, con=None):
+    memory = MemoryResult()
+
+    if setup:
+        setup()
+    gc.collect()
+    rss_before = _proc_status("VmRSS")
+    peak_reset = _reset_peak_rss()
+    pa, _ = _arrow_pool()
+    arrow_before = pa.total_allocated_bytes() if pa else None
+    with _duckdb_spill(con) as spill, _arrow_run_pool() as run_pool:
+        result = materialize(func(), output)
+    memory.peak_rss = _peak_rss()
+    if peak_reset and rss_before is not None:
+        memory.peak_rss_increase = max(memory.peak_rss - rss_before, 0)
+    pa, _ = _arrow_pool()
+    if pa:
+        memory.arrow_allocated = pa.total_allocated_bytes() - (arrow_before or 0)
+    if run_pool is not None:
+        memory.arrow_peak = run_pool.max_memory()
+    memory.duckdb_memory_usage, memory.duckdb_memory_limit = _duckdb_memory(con)
+    memory.duckdb_spill = spill.get("bytes")
+    del result
+
+    if setup:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        result = materialize(func(), output)
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    memory.python_peak = peak - before
+    memory.python_growth = after - before
+    del result
+    return memory
+
+
+# Force a (possibly lazy) result into the declared output contract
+def materialize(result, output):
+    if output is None:
+        return result
+    if output not in OUTPUTS:
+        raise ValueError(f"Unknown output contract {output!r}, expected one of {OUTPUTS}")
+
+    # DuckDB connections after execute() and DuckDB relations
+    if hasattr(result, "fetch_arrow_table"):
+        if output == ARROW:
+            # newer DuckDB releases deprecate fetch_arrow_table() in favour of to_arrow_table()
+            if hasattr(result, "to_arrow_table"):
+                return result.to_arrow_table()
+            return result.fetch_arrow_table()
+        if output == PANDAS:
+            return result.df()
+        if output == POLARS:
+            return result.pl()
+        row = result.fetchone()
+        return row[0]
+
+    # Polars LazyFrame
+    if hasattr(result, "collect") and hasattr(result, "explain"):
+        result = result.collect()
+
+    if output == COUNT:
+        return result if isinstance(result, (int, np.integer)) else len(result)
+    if output == PANDAS:
+        return result if isinstance(result, pd.DataFrame) else result.to_pandas()
+    if output == POLARS:
+        import polars as pl
+        return result if isinstance(result, pl.DataFrame) else pl.from_arrow(materialize(result, ARROW))
+    # ARROW
+    import pyarrow as pa
+    if isinstance(result, pa.Table):
+        return result
+    if isinstance(result, pd.DataFrame):
+        return pa.Table.from_pandas(result)
+    return result.to_arrow()
+
+
 # Benchmarking timing function
-def timing(func, runs=5, label=""):
+# `setup`, if given, runs before every warmup and timed run, outside the timed region (e.g. page cache control).
+# `con` is the DuckDB connection the case uses, if any, for its memory statistics.
+def timing(func, runs=5, label="", warmup=None, target_ci=None, max_runs=None, max_time=None, output=None, setup=None,
+           memory=None, con=None):
+    warmup = WARMUP_RUNS if warmup is None else warmup
+    target_ci = TARGET_CI if target_ci is None else target_ci
+    max_runs = MAX_RUNS if max_runs is None else max_runs
+    max_time = MAX_TIME if max_time is None else max_time
+    memory = MEASURE_MEMORY if memory is None else memory
+
+    for _ in range(warmup):
+        if setup:
+            setup()
+        materialize(func(), output)
+
     times = []
-    for _ in range(runs):
-        start = time.perf_counter()
-        func()
-        end = time.perf_counter()
-        times.append(end - start)
-    avg_time = np.mean(times)
-    print(f"{label:<15} | Avg: {avg_time:.6f}s over {runs} runs")
-    return avg_time
-
-def run_benchmark(methods_dict, runs=5, timing_func=timing):
+    gc_enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        while True:
+            if setup:
+                setup()
+            start = time.perf_counter()
+            materialize(func(), output)
+            end = time.perf_counter()
+            times.append(end - start)
+            if len(times) < runs:
+                continue
+            if target_ci is None or len(times) >= max_runs or sum(times) >= max_time:
+                break
+            if _ci_reached(times, target_ci):
+                break
+            # collect between runs, outside the timed region, so garbage does not pile up
+            gc.collect()
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    result = TimingResult(label, times, warmup)
+    if memory:
+        result.memory = profile_memory(func, output, setup, con)
+    ci_low, ci_high = result.ci
+    memory_info = ""
+    if result.memory and result.memory.peak_rss is not None:
+        memory_info = f" | Peak RSS: {result.memory.peak_rss / MB:.1f} MB"
+    print(
+        f"{label:<15} | Median: {result.median:.6f}s "
+        f"[{ci_low:.6f}, {ci_high:.6f}] p5-p95: {result.p5:.6f}-{result.p95:.6f}s "
+        f"over {result.runs} runs{memory_info}"
+    )
+    return result
+
+def run_benchmark(methods_dict, runs=5, timing_func=timing, **timing_kwargs):
     if timing_func is None:
         raise ValueError("Please provide a timing function")
 
+    # values are either a callable or a (callable, output contract) pair
     results = {}
-    for label, func in methods_dict.items():
-        results[label] = timing_func(func, runs=runs, label=label)
+    for label, method in methods_dict.items():
+        func, output = method if isinstance(method, tuple) else (method, None)
+        results[label] = timing_func(func, runs=runs, label=label, output=output, **timing_kwargs)
     return results
 
 
+def _median(value):
+    return value.median if isinstance(value, TimingResult) else value
+
 # Function to convert timings to relative speeds
 def relative_speeds(time_dict):
-    min_time = min(time_dict.values())
+    min_time = min(_median(value) for value in time_dict.values())
     speed_dict = {
-        label: time / min_time for label, time in time_dict.items()
+        label: time.scaled(min_time) if isinstance(time, TimingResult) else time / min_time
+        for label, time in time_dict.items()
     }
     return speed_dict
 
+# One row per label: the median under `y_label` followed by the rest of the summary statistics
+def results_table(results_dict, y_label="Time (s)"):
+    rows = []
+    for key, value in results_dict.items():
+        if isinstance(value, TimingResult):
+            summary = value.summary()
+            summary.pop("Method")
+            row = {"Method": key, y_label: summary.pop("Median"), **summary}
+        else:
+            row = {"Method": key, y_label: value}
+        rows.append(row)
+    return pd.DataFrame(rows)
+
 # Helper function to plot results
 def plot_results(results_dict, title, filename=None, show=False, relative=False, xtick_rotation=0):
     if relative:
@@ -41,21 +465,46 @@ def plot_results(results_dict, title, filename=None, show=False, relative=False,
     else:
         y_label = "Time (s)"
     print(f"\n{title}")
-    df_plot = pd.DataFrame([
-        {"Method": key, y_label: value}
-        for key, value in results_dict.items()
-    ])
+    df_plot = results_table(results_dict, y_label)
     print(df_plot)
-    plt.figure(figsize=(12,8))
-    ax = sns.barplot(df_plot, x="Method", y=y_label, hue="Method", palette="pastel", legend=False)
-    for container in ax.containers:
-        ax.bar_label(container, fmt="%.4f", fontsize=10)
-    plt.title(title)
-    if xtick_rotation > 0:
-        plt.xticks(rotation=xtick_rotation, ha='right')
-    plt.tight_layout()
+    # second panel with the peak memory when it was measured
+    memory_column = "RSS Increase (MB)"
+    if memory_column in df_plot and df_plot[memory_column].isna().all():
+        # no resettable peak (not Linux): fall back to the lifetime peak, meaningful for isolated runs
+        memory_column = "Peak RSS (MB)"
+    has_memory = memory_column in df_plot and df_plot[memory_column].notna().any()
+    if has_memory:
+        fig, (ax, ax_memory) = plt.subplots(1, 2, figsize=(20,8))
+    else:
+        fig, ax = plt.subplots(figsize=(12,8))
+    sns.barplot(df_plot, x="Method", y=y_label, hue="Method", palette="pastel", legend=False, ax=ax)
+    if "CI Low" in df_plot:
+        # error bars: bootstrap confidence interval of the median
+        has_ci = df_plot["CI Low"].notna()
+        lower = (df_plot[y_label] - df_plot["CI Low"]).where(has_ci, 0)
+        upper = (df_plot["CI High"] - df_plot[y_label]).where(has_ci, 0)
+        ax.errorbar(range(len(df_plot)), df_plot[y_label], yerr=[lower, upper], fmt="none", ecolor="black", capsize=5)
+    axes = [ax]
+    if has_memory:
+        sns.barplot(df_plot, x="Method", y=memory_column, hue="Method", palette="pastel", legend=False, ax=ax_memory)
+        ax_memory.set_title("Peak Memory")
+        axes.append(ax_memory)
+    for axis in axes:
+        for container in axis.containers:
+            if isinstance(container, BarContainer):
+                axis.bar_label(container, fmt="%.4f" if axis is ax else "%.1f", fontsize=10)
+        if xtick_rotation > 0:
+            axis.tick_params(axis="x", labelrotation=xtick_rotation)
+            for tick in axis.get_xticklabels():
+                tick.set_horizontalalignment("right")
+    if has_memory:
+        ax.set_title("Time")
+        fig.suptitle(title)
+    else:
+        ax.set_title(title)
+    fig.tight_layout()
     if filename:
-        plt.savefig(f"images/{filename}")
-        plt.close()
+        fig.savefig(f"images/{filename}")
+        plt.close(fig)
     if show:
-        plt.show()
\ No newline at end of file
+        plt.show()
@@ -1,82 +1,149 @@
+import os
+from functools import cache
+
+import duckdb
 import pandas as pd
-import time
+import polars as pl
 import pyarrow as pa
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-import benchmark
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+import benchmark as bm
+import registry
+from registry import case
 
 '''
-Comparing read and write speeds of csv and parquet file types using PANDAS.
-The PyArrow engine is used for handling the parquet data.
+Streaming CSV -> Parquet conversion with Pandas, PyArrow, Polars and DuckDB.
+
+Every engine converts the same CSV to Parquet without holding the whole file in memory:
+- Pandas: `read_csv(chunksize=...)`, each chunk appended to a pyarrow `ParquetWriter`
+- PyArrow: `pyarrow.csv.open_csv` streaming reader, each record batch appended to a `ParquetWriter`
+- Polars: `scan_csv().sink_parquet()` on the streaming engine
+- DuckDB: `COPY (SELECT * FROM read_csv(...)) TO ... (FORMAT parquet)`
+
+The CSV is a plain-text copy of the dataset (all files concatenated), written once to `data/csv/` before the first
+run and rebuilt when the Parquet files are newer. Timestamp columns are parsed as timestamps by every engine (Pandas
+through `parse_dates`, Polars through `try_parse_dates`, the others infer them), so every engine writes the same typed
+Parquet file.
+
+Besides the timings, the suite reports throughput (CSV MB per second of the median run) and the peak RSS increase
+of the conversion: a streaming path keeps that flat whatever the size of the CSV. Peak memory is most reliable with
+`python main.py run --suite csv_to_parquet --isolate`.
+
+Variables:
+- `SUITE`: Name of the suite in the registry.
+- `CSV_DIR`: Where the CSV copies and the converted Parquet files are written.
+- `CHUNK_ROWS`: Rows per Pandas chunk.
+- `BLOCK_SIZE`: Bytes per PyArrow CSV block (one record batch per block).
+- `REPEAT_TIMES`: Number of times each conversion will be run when this file is run as a script.
 '''
 
-# Read the CSV file in chunks
-chunksize = 10**6  # Adjust the chunk size as needed
-csv_file = '5m-Sales-Records/5m Sales Records.csv'
-# https://excelbianalytics.com/wp/downloads-18-sample-csv-files-data-sets-for-testing-sales/
-
-# Initialize an empty list to store chunks
-chunks = []
-for chunk in pd.read_csv(csv_file, chunksize=chunksize):
-    chunks.append(chunk)
-df = pd.concat(chunks)
-# print(df.head())
-# print(df.describe())
-
-# OR Generate dummy data - data if written 
-size = 10_000_000
-df = pd.DataFrame({
-    "A": np.random.randint(0, 1000, size=size),
-    "B": np.random.rand(size),
-    "C": np.random.choice(["X", "Y", "Z"], size=size)
-})
-
-# Initial function to write to csv and parquet - can comment out when files are present in dir
-# df.to_csv('Sales.csv')
-# df.to_parquet('Sales.parquet', engine='pyarrow')
-
-### ChatGPT example ###
-
-# Run benchmarks
-results_write = {
-    "CSV Write": benchmark.func(df.to_csv, "Sales.csv", index=False, label="CSV Write"),
-    "Parquet Write": benchmark.func(df.to_parquet, "Sales.parquet", engine="pyarrow", label="Parquet Write")
-}
-results_read = {
-    "CSV Read": benchmark.func(pd.read_csv, "Sales.csv", label="CSV Read"),
-    "Parquet Read": benchmark.func(pd.read_parquet, "Sales.parquet", engine="pyarrow", label="Parquet Read"),
-}
-
-# Table output
-combined_results = results_write | results_read
-df_results = pd.DataFrame.from_dict(combined_results, orient='index', columns=['Average Time (s)'])
-print(df_results)
-
-# Plotting
-def prepare_df(results_dict):
-    # Extract format and time into a DataFrame
-    data = []
-    for k, v in results_dict.items():
-        fmt = k.split()[0]  # CSV or Parquet
-        data.append({"Format": fmt, "Time (s)": v})
-    return pd.DataFrame(data)
-
-df_write = prepare_df(results_write)
-df_read = prepare_df(results_read)
-
-sns.set(style="whitegrid")
-
-fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(10, 4), sharey=False)
-
-sns.barplot(data=df_write, x="Format", y="Time (s)", palette=["tab:blue", "tab:orange"], ax=ax1)
-ax1.set_title("Write Benchmark: CSV vs Parquet")
-ax1.bar_label(ax1.containers[0], fmt="%.3f")
-
-sns.barplot(data=df_read, x="Format", y="Time (s)", palette=["tab:blue", "tab:orange"], ax=ax2)
-ax2.set_title("Read Benchmark: CSV vs Parquet")
-ax2.bar_label(ax2.containers[0], fmt="%.3f")
-
-plt.tight_layout()
-plt.savefig('speed_comparisons.png')
-plt.show()
+# parameters
+SUITE = "csv_to_parquet"
+CSV_DIR = "data/csv"
+CHUNK_ROWS = 1_000_000
+BLOCK_SIZE = 64 * 1024 ** 2
+REPEAT_TIMES = 3
+TITLES = {"single": "Single File", "multi": "Multiple Files"}
+
+# init
+con = duckdb.connect()
+
+
+def timestamp_columns(ds):
+    schema = pq.read_schema(ds.files[0])
+    return [field.name for field in schema if pa.types.is_timestamp(field.type)]
+
+
+# Plain-text copy of the dataset, streamed batch by batch; rebuilt when the Parquet files change
+@cache
+def csv_source(ds):
+    return registry.staged_path(ds, os.path.join(CSV_DIR, f"{ds.name}.csv"), lambda path: _write_csv(ds, path))
+
+
+def _write_csv(ds, path):
+    writer, schema = None, None
+    try:
+        for f in ds.files:
+            for batch in pq.ParquetFile(f).iter_batches(batch_size=CHUNK_ROWS):
+                if writer is None:
+                    schema = batch.schema
+                    writer = pacsv.CSVWriter(path, schema)
+                # the monthly files do not all share one schema, write them all with the first file's
+                writer.write_batch(batch if batch.schema == schema else batch.cast(schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def parquet_target(ds, engine):
+    return os.path.join(CSV_DIR, f"{ds.name}_{engine}.parquet")
+
+
+@case(SUITE, "convert", "pandas", prepare=csv_source)
+def pandas_convert(ds):
+    writer = None
+    try:
+        for chunk in pd.read_csv(csv_source(ds), chunksize=CHUNK_ROWS, parse_dates=timestamp_columns(ds)):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(parquet_target(ds, "pandas"), table.schema)
+            # a chunk can infer narrower types than the first one (e.g. no nulls), keep the first chunk's schema
+            writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+@case(SUITE, "convert", "pyarrow", prepare=csv_source)
+def pyarrow_convert(ds):
+    reader = pacsv.open_csv(csv_source(ds), read_options=pacsv.ReadOptions(block_size=BLOCK_SIZE))
+    with pq.ParquetWriter(parquet_target(ds, "pyarrow"), reader.schema) as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+
+
+@case(SUITE, "convert", "polars_lazy", prepare=csv_source)
+def polars_convert(ds):
+    pl.scan_csv(csv_source(ds), try_parse_dates=True).sink_parquet(parquet_target(ds, "polars"))
+
+
+@case(SUITE, "convert", "duckdb", prepare=csv_source)
+def duckdb_convert(ds):
+    con.execute(f"""
+        COPY (SELECT * FROM read_csv('{csv_source(ds)}'))
+        TO '{parquet_target(ds, "duckdb")}' (FORMAT parquet)
+    """)
+
+
+# Throughput and peak memory per conversion, printed by `main.py run` after the timings
+def throughput(results):
+    rows = []
+    for result in results:
+        if result.timing is None:
+            continue
+        csv_mb = os.path.getsize(csv_source(result.dataset)) / bm.MB
+        memory = result.timing.memory.summary() if result.timing.memory else {}
+        rows.append({
+            "Dataset": result.dataset.name,
+            "Engine": result.label,
+            "CSV (MB)": csv_mb,
+            "Median (s)": result.timing.median,
+            "Throughput (MB/s)": csv_mb / result.timing.median,
+            "RSS Increase (MB)": memory.get("RSS Increase (MB)"),
+            "Peak RSS (MB)": memory.get("Peak RSS (MB)"),
+        })
+    return pd.DataFrame(rows)
+
+
+registry.register_report(SUITE, throughput)
+
+
+if __name__ == "__main__":
+    ### Run benchmarks
+    results = registry.run_cases(registry.select(suites=[SUITE]), registry.get_datasets(TITLES), runs=REPEAT_TIMES)
+    print(throughput(results))
+
+    ### Plotting time and memory for each dataset
+    for (_, _, dataset), timings in registry.group_results(results).items():
+        bm.plot_results(timings, f"{TITLES[dataset]}: Streaming CSV to Parquet", f"speed_csv_to_parquet_{dataset}.png")
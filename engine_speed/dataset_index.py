@@ -0,0 +1,190 @@
+import base64
+import glob
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+'''
+Dataset index: a catalog of a dataset's files and Parquet footers, so repeated queries skip the glob and the footer
+parsing.
+
+For every file the index keeps its size and mtime, row count, schema and, for every row group, its row count and
+the min/max statistics of the key columns (the time column by default). It is written as JSON to
+`INDEX_DIR/<dataset>.json` and kept in memory for the rest of the process. `refresh` brings it up to date
+incrementally:
+- the glob is only re-run when the mtime of the directory it matches in has changed (files added, removed or renamed)
+- a file's footer is only re-read when its size or mtime has changed; unchanged files cost one `os.stat`
+
+`matching` prunes with the index alone: the files, and row groups within them, whose statistics say they can hold rows
+after the dataset's cutoff. A row group without statistics is always kept. `footer` caches parsed `FileMetaData`
+objects in memory, keyed by path, size and mtime, so readers that take a `metadata=` argument do not parse the
+footer again.
+
+Variables:
+- `INDEX_DIR`: Where the index files are written.
+- `INDEX_VERSION`: Format version of the index files; an index with another version is rebuilt.
+'''
+
+INDEX_DIR = "data/index"
+INDEX_VERSION = 1
+
+_indexes = {}
+_footers = {}
+
+
+@dataclass
+class FileEntry:
+    path: str
+    size: int
+    mtime: float
+    num_rows: int
+    schema: str  # base64 of the serialized Arrow schema
+    row_groups: list  # [{"rows": n, "stats": {column: [min, max] or None}}]
+
+    @property
+    def arrow_schema(self):
+        return pa.ipc.read_schema(pa.py_buffer(base64.b64decode(self.schema)))
+
+
+@dataclass
+class DatasetIndex:
+    dataset: str
+    pattern: str
+    key_columns: list
+    directory_mtime: float = None
+    files: dict = field(default_factory=dict)  # path -> FileEntry
+
+    @property
+    def num_rows(self):
+        return sum(entry.num_rows for entry in self.files.values())
+
+
+def index_path(name):
+    return os.path.join(INDEX_DIR, f"{name}.json")
+
+
+# Statistics are stored as JSON: datetimes as ISO strings, everything else as is
+def _encode(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _decode(value, reference):
+    return datetime.fromisoformat(value) if isinstance(reference, datetime) and isinstance(value, str) else value
+
+
+def footer(path):
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime)
+    if key not in _footers:
+        _footers[key] = pq.read_metadata(path)
+    return _footers[key]
+
+
+def _entry(path, key_columns):
+    stat = os.stat(path)
+    metadata = footer(path)
+    names = [metadata.schema.column(i).name for i in range(metadata.num_columns)]
+    row_groups = []
+    for i in range(metadata.num_row_groups):
+        group = metadata.row_group(i)
+        stats = {}
+        for column in key_columns:
+            chunk_stats = group.column(names.index(column)).statistics if column in names else None
+            has_min_max = chunk_stats is not None and chunk_stats.has_min_max
+            stats[column] = [_encode(chunk_stats.min), _encode(chunk_stats.max)] if has_min_max else None
+        row_groups.append({"rows": group.num_rows, "stats": stats})
+    schema = base64.b64encode(metadata.schema.to_arrow_schema().serialize().to_pybytes()).decode()
+    return FileEntry(path, stat.st_size, stat.st_mtime, metadata.num_rows, schema, row_groups)
+
+
+def _directory(pattern):
+    directory = os.path.dirname(pattern) or "."
+    # a wildcard in the directory part means several directories, which are globbed every time
+    return None if glob.has_magic(directory) else directory
+
+
+def load(ds):
+    try:
+        with open(index_path(ds.name)) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != INDEX_VERSION or data.get("pattern") != ds.path:
+        return None
+    files = {entry["path"]: FileEntry(**entry) for entry in data["files"]}
+    return DatasetIndex(ds.name, ds.path, data["key_columns"], data["directory_mtime"], files)
+
+
+def save(index):
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    data = {
+        "version": INDEX_VERSION,
+        "dataset": index.dataset,
+        "pattern": index.pattern,
+        "key_columns": index.key_columns,
+        "directory_mtime": index.directory_mtime,
+        "files": [entry.__dict__ for entry in index.files.values()],
+    }
+    # written next to the index and renamed, so a reader never sees half an index
+    partial = f"{index_path(index.dataset)}.partial"
+    with open(partial, "w") as f:
+        json.dump(data, f)
+    os.replace(partial, index_path(index.dataset))
+
+
+# The dataset's index, loaded or built on first use and brought up to date; saved when anything changed
+def refresh(ds, key_columns=None):
+    key_columns = key_columns or [ds.time_column]
+    index = _indexes.get(ds.name) or load(ds)
+    if index is None or index.key_columns != key_columns:
+        index = DatasetIndex(ds.name, ds.path, key_columns)
+    changed = False
+
+    directory = _directory(ds.path)
+    directory_mtime = os.stat(directory).st_mtime if directory and os.path.isdir(directory) else None
+    if directory_mtime is None or directory_mtime != index.directory_mtime:
+        paths = sorted(glob.glob(ds.path))
+        if paths != list(index.files) or directory_mtime != index.directory_mtime:
+            # new files get None and are read below, removed files drop out
+            index.files = {path: index.files.get(path) for path in paths}
+            index.directory_mtime = directory_mtime
+            changed = True
+
+    for path, entry in list(index.files.items()):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            del index.files[path]
+            changed = True
+            continue
+        if entry is None or entry.size != stat.st_size or entry.mtime != stat.st_mtime:
+            index.files[path] = _entry(path, key_columns)
+            changed = True
+
+    if changed:
+        save(index)
+    _indexes[ds.name] = index
+    return index
+
+
+# {path: [row group ids]} of the row groups whose statistics allow rows with `column > value`
+def matching(index, column, value):
+    kept = {}
+    for path, entry in index.files.items():
+        groups = [
+            i for i, group in enumerate(entry.row_groups)
+            if group["stats"].get(column) is None or _decode(group["stats"][column][1], value) > value
+        ]
+        if groups:
+            kept[path] = groups
+    return kept
+
+
+# Forget the in-memory indexes and footers, so the next refresh starts from the index files
+def clear():
+    _indexes.clear()
+    _footers.clear()
@@ -1,89 +1,70 @@
-from warnings import filters
-import pandas as pd
-import polars as pl
 import duckdb
-from datetime import datetime
-import glob
 
 # Benchmark .py file
 import benchmark as bm
+import registry
 
+'''
+DuckDB query cost vs materialisation cost.
 
-# parameters
-SINGLE_FILE = 'data/taxi_2019_04.parquet'
-MULTI_FILE_PATH = "data/taxi/*01.parquet"
-MULTI_FILES = glob.glob(MULTI_FILE_PATH)
+Each query is registered unfetched (what the original benchmarks measured) and then under every output contract,
+so the cost of materialising the result is visible next to the query itself.
+'''
 
-FILTER = [("pickup_at", ">", datetime(2019, 6, 30))]
-COLUMNS = ["pickup_at"]
-SHOW_PLOTS = False
+# parameters
+SUITE = "duckdb_outputs"
 REPEAT_TIMES = 1
-READ_SINGLE_FILE = False
-if READ_SINGLE_FILE:
-    TITLE_START = "Single File Benchmarks"
-else:
-    TITLE_START = "Multiple File Benchmarks"
+TITLES = {"single": "Single File Benchmarks", "multi": "Multiple File Benchmarks"}
+IMAGES = {"single": "speed_duckdb_and_df.png", "multi": "speed_duckdb_and_df_multiple_files.png"}
 
 # init
 con = duckdb.connect()
 
-def duckdb_read_all():
-    return con.execute(f"SELECT * FROM '{SINGLE_FILE}'")
-def duckdb_filter_all():
+def duckdb_read_all(ds):
+    return con.execute(f"SELECT * FROM {ds.sql_source}")
+def duckdb_filter_all(ds):
     return con.execute(f"""
         SELECT *
-        FROM '{SINGLE_FILE}'
-        WHERE pickup_at > '2019-06-30'
+        FROM {ds.sql_source}
+        WHERE {ds.sql_filter}
     """)
-def duckdb_filter_one():
+def duckdb_filter_one(ds):
     return con.execute(f"""
-        SELECT pickup_at
-        FROM '{SINGLE_FILE}'
-        WHERE pickup_at > '2019-06-30'
+        SELECT {ds.time_column}
+        FROM {ds.sql_source}
+        WHERE {ds.sql_filter}
     """)
-def duckdb_filter_count():
+def duckdb_filter_count(ds):
     return con.execute(f"""
         SELECT count(*)
-        FROM '{SINGLE_FILE}'
-        WHERE pickup_at > '2019-06-30'
+        FROM {ds.sql_source}
+        WHERE {ds.sql_filter}
     """)
-def duckdb_read_multi():
-    return con.execute(f"SELECT * FROM '{MULTI_FILE_PATH}'")
 
-def duckdb_read_all_df():
-    return con.execute(f"SELECT * FROM '{SINGLE_FILE}'").fetchdf()
-def duckdb_filter_all_df():
-    return con.execute(f"""
-        SELECT *
-        FROM '{SINGLE_FILE}'
-        WHERE pickup_at > '2019-06-30'
-    """).fetchdf()
-def duckdb_filter_one_df():
-    return con.execute(f"""
-        SELECT pickup_at
-        FROM '{SINGLE_FILE}'
-        WHERE pickup_at > '2019-06-30'
-    """).fetchdf()
-def duckdb_filter_count_df():
-    return con.execute(f"""
-        SELECT count(*)
-        FROM '{SINGLE_FILE}'
-        WHERE pickup_at > '2019-06-30'
-    """).fetchdf()
-def duckdb_read_multi_df():
-    return con.execute(f"SELECT * FROM '{MULTI_FILE_PATH}'").fetchdf()
-
-results_all = {
-    "DuckDB Read All": bm.timing(duckdb_read_all, runs=REPEAT_TIMES, label="DuckDB Read All"),
-    "DuckDB Filter All": bm.timing(duckdb_filter_all, runs=REPEAT_TIMES, label="DuckDB Filter All"),
-    "DuckDB Filter One": bm.timing(duckdb_filter_one, runs=REPEAT_TIMES, label="DuckDB Filter One"),
-    "DuckDB Filter Count": bm.timing(duckdb_filter_count, runs=REPEAT_TIMES, label="DuckDB Filter Count"),
-    "DuckDB Read Multi": bm.timing(duckdb_read_multi, runs=REPEAT_TIMES, label="DuckDB Read Multi"),
-    "DuckDB Read All DF": bm.timing(duckdb_read_all_df, runs=REPEAT_TIMES, label="DuckDB Read All DF"),
-    "DuckDB Filter All DF": bm.timing(duckdb_filter_all_df, runs=REPEAT_TIMES, label="DuckDB Filter All DF"),
-    "DuckDB Filter One DF": bm.timing(duckdb_filter_one_df, runs=REPEAT_TIMES, label="DuckDB Filter One DF"),
-    "DuckDB Filter Count DF": bm.timing(duckdb_filter_count_df, runs=REPEAT_TIMES, label="DuckDB Filter Count DF"),
-    "DuckDB Read Multi DF": bm.timing(duckdb_read_multi_df, runs=REPEAT_TIMES, label="DuckDB Read Multi DF")
+queries = {
+    "read_all": duckdb_read_all,
+    "filter_all": duckdb_filter_all,
+    "filter_one": duckdb_filter_one,
+    "filter_count": duckdb_filter_count,
+}
+outputs = {
+    "Unfetched": None,
+    "Arrow": bm.ARROW,
+    "DF": bm.PANDAS,
+    "PL": bm.POLARS,
 }
 
-bm.plot_results(results_all, f"{TITLE_START}: Read All Data", "speed_duckdb_and_df.png")
+for workload, query in queries.items():
+    for variant, output in outputs.items():
+        registry.register(SUITE, workload, "duckdb", query, output, variant)
+
+
+if __name__ == "__main__":
+    results = registry.run_cases(registry.select(suites=[SUITE]), registry.get_datasets(TITLES), runs=REPEAT_TIMES)
+    for dataset in registry.get_datasets(TITLES):
+        results_all = {
+            f"{result.case.workload} {result.case.variant}": result.timing
+            for result in results if result.dataset is dataset
+        }
+        if results_all:
+            bm.plot_results(results_all, f"{TITLES[dataset.name]}: DuckDB Outputs", IMAGES[dataset.name], xtick_rotation=45)
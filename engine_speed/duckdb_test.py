@@ -66,9 +66,9 @@ con.execute("""
     SELECT passenger_count, count(*)
     FROM 'data/alltaxi.parquet'
     GROUP BY passenger_count""").df()
-con.from_parquet('data/alltaxi.parquet')
+(con.from_parquet('data/alltaxi.parquet')
    .aggregate('passenger_count, count(*)')
-   .df()
+   .df())
    
 # testing to see if df is returned without .df() after duckdb query
 SINGLE_FILE = 'data/taxi_2019_04.parquet'
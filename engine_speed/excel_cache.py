@@ -0,0 +1,66 @@
+import hashlib
+import os
+
+import polars as pl
+
+'''
+Excel to Parquet cache: every workbook sheet is converted to Parquet once, and later reads of an unchanged workbook
+are served from the Parquet file.
+
+The cache is keyed by the SHA-256 of the workbook's bytes, so a workbook that is copied, renamed or touched without
+changing still hits the cache, and any edit misses it. The hash is kept in memory per (path, size, mtime), so a
+process hashes each unchanged workbook once. Conversions are written to `CACHE_DIR/<hash>_<sheet>.parquet` under a
+`.partial` name and renamed, so an interrupted conversion is never served.
+
+    path = excel_cache.parquet_path("data/top2000-2023.xlsx")  # converts on the first call
+    df = pl.read_parquet(path)
+
+Variables:
+- `CACHE_DIR`: Where the converted sheets are written.
+- `CONVERT_ENGINE`: `pl.read_excel` engine used for the conversion.
+- `HASH_BLOCK`: Bytes read at a time when hashing a workbook.
+'''
+
+CACHE_DIR = "data/excel_cache"
+CONVERT_ENGINE = "calamine"
+HASH_BLOCK = 1024**2
+
+_hashes = {}
+
+
+def file_hash(path):
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    if key not in _hashes:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            while block := f.read(HASH_BLOCK):
+                digest.update(block)
+        _hashes[key] = digest.hexdigest()
+    return _hashes[key]
+
+
+# Cache file of a sheet (the first sheet for None), whether or not it has been converted yet
+def cached_path(path, sheet=None):
+    return os.path.join(CACHE_DIR, f"{file_hash(path)}_{sheet or 'first'}.parquet")
+
+
+# Convert a sheet to its cache file, whether or not it is already there
+def convert(path, sheet=None):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    target = cached_path(path, sheet)
+    partial = f"{target}.partial"
+    pl.read_excel(path, sheet_name=sheet, engine=CONVERT_ENGINE).write_parquet(partial)
+    os.replace(partial, target)
+    return target
+
+
+# Parquet file holding a sheet of the workbook, converted on the first call for this workbook content
+def parquet_path(path, sheet=None):
+    target = cached_path(path, sheet)
+    return target if os.path.exists(target) else convert(path, sheet)
+
+
+# Forget the in-memory hashes (the cache files stay)
+def clear():
+    _hashes.clear()
@@ -0,0 +1,166 @@
+import importlib.util
+import itertools
+import os
+from functools import cache
+
+import duckdb
+import pandas as pd
+import polars as pl
+
+import benchmark as bm
+import excel_cache
+import registry
+
+'''
+Excel ingestion: the Excel readers of Pandas, Polars and DuckDB on the bundled top2000 workbook, against reading
+the same sheet from the Parquet cache in `excel_cache`.
+
+Readers (variants in brackets):
+- Pandas `read_excel` with `[openpyxl]` and `[calamine]` (python-calamine)
+- Polars `read_excel` with `[calamine]` (fastexcel, the default), `[openpyxl]` and `[xlsx2csv]`
+- DuckDB `read_xlsx` from the `excel` extension, when it is installed locally (not downloaded)
+- `[cached]` for every engine: the Parquet file of the workbook's content hash, converted before the first run. The
+  timed runs include the cache lookup (the workbook's hash is kept in memory per path, size and mtime).
+- Polars `[convert]`: hashing (the in-memory hashes are cleared first) and converting the workbook to Parquet on every
+  run, the one-off cost of a cache miss
+
+A reader whose package (or DuckDB extension) is not installed has no cases (see `MISSING`). Pandas keeps the empty
+second row of the workbook, so its cases drop empty rows like the other readers.
+
+Workloads:
+- `sample`: the bundled workbook (2000 rows). It does not depend on the dataset, so it only runs on `SAMPLE_DATASET`.
+- `replicated`: its rows repeated to `<dataset rows> / TRIPS_PER_ROW` rows, up to Excel's row limit, written with
+  openpyxl once per dataset under `data/excel/<dataset>/` before the first run.
+
+Variables:
+- `SUITE`: Name of the suite in the registry.
+- `WORKBOOK`: The bundled workbook.
+- `SAMPLE_DATASET`: The only dataset the `sample` workload runs on.
+- `EXCEL_DIR`: Where the replicated workbooks are written.
+- `TRIPS_PER_ROW`: Taxi dataset rows per row of the replicated workbook.
+- `MAX_ROWS`: Data rows of the largest replicated workbook (Excel's sheet limit less the header).
+- `MISSING`: Readers without cases because their package or extension is not available.
+- `REPEAT_TIMES`: Number of times each function will be run when this file is run as a script.
+- `con`: DuckDB connection object for executing SQL queries.
+'''
+
+# parameters
+SUITE = "excel"
+WORKBOOK = "data/top2000-2023.xlsx"
+SAMPLE_DATASET = "single"
+EXCEL_DIR = "data/excel"
+TRIPS_PER_ROW = 30
+MAX_ROWS = 1_048_575
+MISSING = []
+REPEAT_TIMES = 5
+TITLES = {"single": "Single File", "multi": "Multiple Files"}
+
+# init
+con = duckdb.connect()
+try:
+    # only a locally installed extension, a benchmark should not download one
+    con.execute("SET autoinstall_known_extensions = false")
+    con.execute("LOAD excel")
+    EXCEL_EXTENSION = True
+except duckdb.Error:
+    EXCEL_EXTENSION = False
+
+
+### The workbooks
+def installed(module):
+    return importlib.util.find_spec(module) is not None
+
+
+def _write_replicated(ds, path):
+    import openpyxl
+
+    rows = min(MAX_ROWS, max(1, ds.num_rows // TRIPS_PER_ROW))
+    source = openpyxl.load_workbook(WORKBOOK, read_only=True)
+    header, *records = source.active.iter_rows(values_only=True)
+    records = [r for r in records if any(value is not None for value in r)]
+    title = source.active.title
+    source.close()
+    target = openpyxl.Workbook(write_only=True)
+    sheet = target.create_sheet(title)
+    sheet.append(header)
+    for record in itertools.islice(itertools.cycle(records), rows):
+        sheet.append(record)
+    target.save(path)
+
+
+# The bundled workbook's rows repeated to `<dataset rows> / TRIPS_PER_ROW` rows; rewritten when the sources are newer
+@cache
+def replicated_workbook(ds):
+    path = os.path.join(EXCEL_DIR, ds.name, "top2000_replicated.xlsx")
+    return registry.staged_path(ds, path, lambda staging: _write_replicated(ds, staging), sources=[WORKBOOK])
+
+
+# workload -> (workbook of a dataset, datasets it runs on)
+WORKBOOKS = {"sample": (lambda ds: WORKBOOK, [SAMPLE_DATASET]), "replicated": (replicated_workbook, None)}
+
+
+### Readers: (engine, variant, required package, read(path), output)
+def pandas_reader(engine):
+    return lambda path: pd.read_excel(path, engine=engine).dropna(how="all")
+
+
+def polars_reader(engine):
+    return lambda path: pl.read_excel(path, engine=engine)
+
+
+def duckdb_read_xlsx(path):
+    return con.execute(f"SELECT * FROM read_xlsx('{path}')")
+
+
+def duckdb_cached(path):
+    return con.execute(f"SELECT * FROM read_parquet('{excel_cache.parquet_path(path)}')")
+
+
+# A cache miss: the workbook is hashed again, not looked up in the in-memory hashes, and converted
+def polars_convert(path):
+    excel_cache.clear()
+    return pl.read_parquet(excel_cache.convert(path))
+
+
+READERS = [
+    ("pandas", "openpyxl", "openpyxl", pandas_reader("openpyxl"), bm.PANDAS),
+    ("pandas", "calamine", "python_calamine", pandas_reader("calamine"), bm.PANDAS),
+    ("polars", "calamine", "fastexcel", polars_reader("calamine"), bm.POLARS),
+    ("polars", "openpyxl", "openpyxl", polars_reader("openpyxl"), bm.POLARS),
+    ("polars", "xlsx2csv", "xlsx2csv", polars_reader("xlsx2csv"), bm.POLARS),
+    ("duckdb", "", None, duckdb_read_xlsx, bm.ARROW),
+    ("pandas", "cached", "fastexcel", lambda path: pd.read_parquet(excel_cache.parquet_path(path)), bm.PANDAS),
+    ("polars", "cached", "fastexcel", lambda path: pl.read_parquet(excel_cache.parquet_path(path)), bm.POLARS),
+    ("duckdb", "cached", "fastexcel", duckdb_cached, bm.ARROW),
+    ("polars", "convert", "fastexcel", polars_convert, bm.POLARS),
+]
+for engine, variant, package, read, output in READERS:
+    available = EXCEL_EXTENSION if package is None else installed(package)
+    if not available:
+        MISSING.append(f"{engine} {variant}".strip())
+        continue
+    for workload, (workbook, datasets) in WORKBOOKS.items():
+        if workload == "replicated" and not installed("openpyxl"):
+            continue
+        # the cached readers start from a converted workbook, their cache miss is the `convert` variant
+        if variant == "cached":
+            prepare = lambda ds, workbook=workbook: excel_cache.parquet_path(workbook(ds))
+        else:
+            prepare = workbook
+        registry.register(
+            SUITE, workload, engine, lambda ds, read=read, workbook=workbook: read(workbook(ds)), output, variant,
+            datasets=datasets, prepare=prepare,
+        )
+
+
+if __name__ == "__main__":
+    ### Run benchmarks
+    if MISSING:
+        print(f"Not installed, skipped: {', '.join(MISSING)}")
+    datasets = registry.get_datasets([SAMPLE_DATASET])
+    results = registry.run_cases(registry.select(suites=[SUITE]), datasets, runs=REPEAT_TIMES)
+
+    ### Plotting results for each workbook
+    for (_, workload, dataset), timings in registry.group_results(results).items():
+        bm.plot_results(timings, f"Excel Ingestion: {workload} ({dataset})", f"speed_excel_{workload}_{dataset}.png",
+                        xtick_rotation=30)
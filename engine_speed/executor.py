@@ -0,0 +1,168 @@
+import multiprocessing
+import os
+import re
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import benchmark as bm
+import page_cache
+import registry
+
+'''
+Process-isolated benchmark execution.
+
+Every (case, dataset) pair runs in a fresh subprocess (spawned, one task per child), so no case inherits the
+allocator state, thread pools, DuckDB connection or imported modules of the engine that ran before it. The child
+re-imports the suite module that declared the case and looks the case up by name, so only cases registered at
+import time can run isolated. Each child gets its own single-worker pool, so a crashed child (e.g. killed for
+running out of memory) only fails its own case. Results are streamed back to the parent as each case finishes.
+
+By default a single worker runs the cases one after another, so concurrent cases do not compete for cores and
+disk; raise `workers` only when the cases are known not to interfere.
+
+`threads` caps every engine's thread pools in the child: `POLARS_MAX_THREADS` is put in the environment the child
+is spawned with (Polars reads it once, when its pool starts, so it cannot be changed in a running process), and the
+child calls `pyarrow.set_cpu_count`/`set_io_thread_count` and runs `SET threads` on the case's DuckDB connection
+before timing. The thread counts the engines actually report are returned with the result.
+
+`memory_cap` (bytes) caps the child's data segment with `resource.setrlimit(RLIMIT_DATA)` after the suite module is
+imported, and sets the case's DuckDB `memory_limit` to `DUCKDB_MEMORY_SHARE` of the cap, so DuckDB spills to its
+temporary directory before the cap is hit. `RLIMIT_DATA` counts the private writable memory the process has mapped
+(heap, allocator arenas, thread stacks) rather than its whole address space (`RLIMIT_AS`), which also counts address
+space that is only reserved and failed every engine far below its actual memory use. The mapped memory is still above
+the RSS, so the cap is stricter than the same amount of RSS. Arrow's mimalloc pool maps 1GB arenas, so capped children
+start with `MIMALLOC_ARENA_RESERVE` set smaller. The imported engines alone map about 200MB: use a cap of at least
+`MIN_MEMORY_CAP`.
+
+An engine that cannot allocate under the cap raises (Python `MemoryError`, Arrow and DuckDB `bad_alloc`) or aborts
+its process, which fails only that case. Either way the error ends with `OOM_ERROR`, so out-of-memory failures can
+be told apart from other errors.
+'''
+
+DUCKDB_MEMORY_SHARE = 0.6
+MIMALLOC_ARENA_RESERVE = "64MiB"
+MIN_MEMORY_CAP = 300 * 2 ** 20
+OOM_ERROR = "OOM (cap)"
+# what the engines report when an allocation fails
+OOM_MESSAGES = ("MemoryError", "bad_alloc", "bad allocation", "Out of Memory", "Cannot allocate memory",
+                "memory allocation of")
+SIZE_UNITS = {"": 1, "B": 1, "KB": 2 ** 10, "MB": 2 ** 20, "GB": 2 ** 30, "TB": 2 ** 40}
+
+_spawn_lock = threading.Lock()
+
+
+# "16GB", "512MB" or a number of bytes
+def parse_size(text):
+    match = re.fullmatch(r"\s*([\d.]+)\s*([KMGT]?B?)\s*", str(text).upper())
+    if not match:
+        raise ValueError(f"Cannot parse size {text!r}, expected e.g. 16GB or 512MB")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+
+
+# Cap pyarrow's and DuckDB's thread pools in this process, returns the thread counts each engine reports
+def set_threads(threads, con=None):
+    import pyarrow as pa
+    pa.set_cpu_count(threads)
+    pa.set_io_thread_count(threads)
+    reported = {"pyarrow": pa.cpu_count()}
+    if con is not None:
+        con.execute(f"SET threads = {threads}")
+        reported["duckdb"] = con.execute("SELECT current_setting('threads')").fetchone()[0]
+    try:
+        import polars as pl
+        reported["polars"] = pl.thread_pool_size()
+    except ImportError:
+        pass
+    return reported
+
+
+# Cap this process's data segment at `limit` bytes, and DuckDB's memory below it
+def set_memory_cap(limit, con=None):
+    import resource
+    resource.setrlimit(resource.RLIMIT_DATA, (limit, limit))
+    if con is not None:
+        con.execute(f"SET memory_limit = '{duckdb_cap_limit()}B'")
+
+
+# DuckDB memory_limit under this process's data segment cap, in bytes; None when the process is not capped
+def duckdb_cap_limit():
+    try:
+        import resource
+    except ImportError:  # not a Unix system, never capped
+        return None
+    limit, _ = resource.getrlimit(resource.RLIMIT_DATA)
+    return None if limit == resource.RLIM_INFINITY else int(limit * DUCKDB_MEMORY_SHARE)
+
+
+def _run_case(module, name, dataset, runs, cache, timing_kwargs, threads=None, memory_cap=None):
+    try:
+        registry.load_suites([module])
+        case = registry.get_case(name)
+        if memory_cap:
+            set_memory_cap(memory_cap, case.connection)
+        if threads:
+            reported = set_threads(threads, case.connection)
+            engine_threads = reported.get("polars" if case.engine.startswith("polars") else case.engine)
+            if engine_threads is not None and engine_threads != threads:
+                raise RuntimeError(f"{case.engine} runs {engine_threads} threads, expected {threads}")
+        with page_cache.prepared(dataset, cache, case.prepare) as (run_dataset, setup):
+            timing = bm.timing(
+                case.bind(run_dataset), runs=runs, label=case.label, output=case.output, setup=setup,
+                con=case.connection, **timing_kwargs,
+            )
+        return timing, None
+    except BaseException:
+        # Polars panics raise pyo3's PanicException, a BaseException that could not be sent back to the parent
+        return None, traceback.format_exc()
+
+
+# Run one task in its own freshly spawned process, with `env` added to the environment it starts with
+def _in_fresh_process(func, *args, env=None):
+    context = multiprocessing.get_context("spawn")
+    # the child is spawned by submit() and copies os.environ then; the lock keeps concurrent spawns apart
+    with _spawn_lock:
+        saved = {key: os.environ.get(key) for key in env or {}}
+        os.environ.update(env or {})
+        try:
+            pool = ProcessPoolExecutor(max_workers=1, mp_context=context)
+            future = pool.submit(func, *args)
+        finally:
+            for key, value in saved.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+    with pool:
+        return future.result()
+
+
+# Generator of CaseResult, in completion order
+def run_isolated(cases, datasets, runs=5, cache=None, workers=1, threads=None, memory_cap=None, **timing_kwargs):
+    env = {}
+    if threads:
+        env["POLARS_MAX_THREADS"] = str(threads)
+    if memory_cap:
+        env["MIMALLOC_ARENA_RESERVE"] = MIMALLOC_ARENA_RESERVE
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for case, dataset in registry.plan(cases, datasets):
+            future = pool.submit(
+                _in_fresh_process, _run_case,
+                case.func.__module__, case.name, dataset, runs, cache, timing_kwargs, threads, memory_cap, env=env,
+            )
+            futures[future] = (case, dataset)
+
+        for future in as_completed(futures):
+            case, dataset = futures[future]
+            try:
+                timing, error = future.result()
+            except Exception as e:
+                # the worker died (e.g. killed for running out of memory)
+                timing, error, died = None, repr(e), True
+            else:
+                died = False
+            if error and memory_cap and (died or any(message in error for message in OOM_MESSAGES)):
+                # under a cap a process that died most likely aborted on a failed allocation
+                error = f"{error.rstrip()}\n{OOM_ERROR}"
+            yield registry.CaseResult(case, dataset, timing, cache, error, threads, memory_cap)
@@ -0,0 +1,230 @@
+import argparse
+import os
+from datetime import datetime
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+'''
+Synthetic, reproducible NYC-taxi-style data for the benchmarks.
+
+Rows are generated with vectorized NumPy in chunks and streamed into Parquet with a `ParquetWriter`, so memory
+stays bounded by `chunk_rows` whatever the scale (1M to 1B+ rows). Every chunk has its own generator seeded from
+(seed, file, chunk), so the same arguments always produce the same files. Pickup times increase through each file
+(like the real monthly files); the files split the time range evenly.
+
+Two schemas mirror the data the suites were written against:
+- `legacy`: the single 2019 file (`vendor_id`, `pickup_at`, `dropoff_at`, ...)
+- `yellow`: the 2022 yellow trip files (`VendorID`, `tpep_pickup_datetime`, `tpep_dropoff_datetime`, ...)
+
+Usage:
+    python generate_data.py --scale 10                       # both datasets, 10M rows each
+    python generate_data.py --dataset multi --scale 100 --files 24 --row-group-size 500000 --seed 7
+    python generate_data.py --scales 1 10 100                 # synthetic_1m, synthetic_10m, synthetic_100m
+
+`--scales` writes one yellow-schema dataset per scale to `SCALE_OUTPUT`, which `registry` registers as
+`synthetic_<N>m` for the suites that compare engines across data sizes.
+
+Variables:
+- `OUTPUTS`: Default output path per dataset, matching the `synthetic_*` datasets in `registry`.
+- `SCALE_OUTPUT`: Output directory of each `--scales` dataset.
+- `ZONES`: Number of taxi zones for the location ids.
+'''
+
+OUTPUTS = {
+    "single": "data/synthetic/taxi_2019_04.parquet",
+    "multi": "data/synthetic/taxi",
+}
+SCALE_OUTPUT = "data/synthetic/scale_{scale:g}m"
+SCHEMAS = {"single": "legacy", "multi": "yellow"}
+TIME_RANGES = {
+    "legacy": (datetime(2019, 4, 1), datetime(2019, 8, 1)),
+    "yellow": (datetime(2022, 1, 1), datetime(2023, 1, 1)),
+}
+ZONES = 265
+ROW_GROUP_SIZE = 1_000_000
+CHUNK_ROWS = 1_000_000
+
+COLUMN_NAMES = {
+    "legacy": {
+        "vendor_id": "vendor_id",
+        "pickup": "pickup_at",
+        "dropoff": "dropoff_at",
+        "pickup_location": "pickup_location_id",
+        "dropoff_location": "dropoff_location_id",
+        "rate_code": "rate_code_id",
+    },
+    "yellow": {
+        "vendor_id": "VendorID",
+        "pickup": "tpep_pickup_datetime",
+        "dropoff": "tpep_dropoff_datetime",
+        "pickup_location": "PULocationID",
+        "dropoff_location": "DOLocationID",
+        "rate_code": "RatecodeID",
+    },
+}
+
+
+# Skewed zone popularity (a few busy zones, a long tail), fixed by the seed so every chunk shares it
+def zone_probabilities(seed):
+    weights = 1.0 / np.arange(1, ZONES + 1) ** 1.1
+    np.random.default_rng(seed).shuffle(weights)
+    return weights / weights.sum()
+
+
+def taxi_chunk(rng, rows, start, end, schema="legacy", zone_p=None):
+    names = COLUMN_NAMES[schema]
+    zone_p = zone_probabilities(0) if zone_p is None else zone_p
+    start_s = int(np.datetime64(start, "s").astype(np.int64))
+    end_s = int(np.datetime64(end, "s").astype(np.int64))
+
+    pickup = np.sort(rng.integers(start_s, end_s, rows))
+    duration = np.clip(rng.gamma(2.0, 450.0, rows), 60, 4 * 3600).astype(np.int64)
+    speed_mph = np.clip(rng.normal(12.0, 4.0, rows), 2.0, 40.0)
+    trip_distance = np.round(duration / 3600 * speed_mph, 2)
+    passenger_count = rng.choice(7, size=rows, p=[0.02, 0.70, 0.14, 0.05, 0.03, 0.04, 0.02])
+    vendor = rng.choice([1, 2], size=rows, p=[0.35, 0.65])
+    payment_type = rng.choice([1, 2, 3, 4], size=rows, p=[0.70, 0.27, 0.02, 0.01])
+    rate_code = rng.choice([1, 2, 3, 4, 5], size=rows, p=[0.95, 0.03, 0.005, 0.005, 0.01])
+
+    fare_amount = np.round(3.0 + 2.5 * trip_distance + 0.5 * duration / 60, 2)
+    extra = rng.choice([0.0, 0.5, 1.0, 2.5], size=rows)
+    mta_tax = np.full(rows, 0.5)
+    tip_amount = np.round(np.where(payment_type == 1, fare_amount * rng.uniform(0.0, 0.3, rows), 0.0), 2)
+    tolls_amount = np.where(rng.random(rows) < 0.05, 6.55, 0.0)
+    improvement_surcharge = np.full(rows, 0.3)
+    congestion_surcharge = np.full(rows, 2.5)
+    total_amount = np.round(
+        fare_amount + extra + mta_tax + tip_amount + tolls_amount + improvement_surcharge + congestion_surcharge, 2
+    )
+
+    vendor_id = pa.array(vendor.astype(str)) if schema == "legacy" else pa.array(vendor)
+    return pa.table({
+        names["vendor_id"]: vendor_id,
+        names["pickup"]: pa.array(pickup.astype("datetime64[s]").astype("datetime64[us]")),
+        names["dropoff"]: pa.array((pickup + duration).astype("datetime64[s]").astype("datetime64[us]")),
+        "passenger_count": pa.array(passenger_count.astype(np.int64)),
+        "trip_distance": pa.array(trip_distance),
+        names["rate_code"]: pa.array(rate_code.astype(np.int64)),
+        names["pickup_location"]: pa.array(rng.choice(ZONES, size=rows, p=zone_p).astype(np.int64) + 1),
+        names["dropoff_location"]: pa.array(rng.choice(ZONES, size=rows, p=zone_p).astype(np.int64) + 1),
+        "payment_type": pa.array(payment_type.astype(np.int64)),
+        "fare_amount": pa.array(fare_amount),
+        "extra": pa.array(extra),
+        "mta_tax": pa.array(mta_tax),
+        "tip_amount": pa.array(tip_amount),
+        "tolls_amount": pa.array(tolls_amount),
+        "improvement_surcharge": pa.array(improvement_surcharge),
+        "total_amount": pa.array(total_amount),
+        "congestion_surcharge": pa.array(congestion_surcharge),
+    })
+
+
+# Yields (rows, start, end) per chunk so that chunk times increase and sum to `rows`
+def _chunk_plan(rows, start, end, chunk_rows):
+    chunks = max(1, -(-rows // chunk_rows))
+    bounds = np.linspace(
+        np.datetime64(start, "s").astype(np.int64), np.datetime64(end, "s").astype(np.int64), chunks + 1,
+    ).astype(np.int64)
+    for i in range(chunks):
+        chunk = min(chunk_rows, rows - i * chunk_rows)
+        yield i, chunk, bounds[i].astype("datetime64[s]").item(), bounds[i + 1].astype("datetime64[s]").item()
+
+
+def _file_ranges(start, end, files):
+    bounds = np.linspace(
+        np.datetime64(start, "s").astype(np.int64), np.datetime64(end, "s").astype(np.int64), files + 1,
+    ).astype(np.int64)
+    return [(bounds[i].astype("datetime64[s]").item(), bounds[i + 1].astype("datetime64[s]").item()) for i in range(files)]
+
+
+def write_file(path, rows, start, end, seed=0, file_index=0, schema="legacy", row_group_size=ROW_GROUP_SIZE,
+               chunk_rows=CHUNK_ROWS, compression="snappy"):
+    # whole row groups per chunk, so chunk boundaries do not leave small row groups behind
+    chunk_rows = max(row_group_size, chunk_rows // row_group_size * row_group_size)
+    zone_p = zone_probabilities(seed)
+    writer = None
+    try:
+        for chunk_index, chunk, chunk_start, chunk_end in _chunk_plan(rows, start, end, chunk_rows):
+            rng = np.random.default_rng([seed, file_index, chunk_index])
+            table = taxi_chunk(rng, chunk, chunk_start, chunk_end, schema, zone_p)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema, compression=compression)
+            writer.write_table(table, row_group_size=row_group_size)
+    finally:
+        if writer is not None:
+            writer.close()
+    return path
+
+
+def generate(dataset="single", scale=1.0, seed=0, files=None, row_group_size=ROW_GROUP_SIZE, chunk_rows=CHUNK_ROWS,
+             output=None, compression="snappy"):
+    schema = SCHEMAS[dataset]
+    output = output or OUTPUTS[dataset]
+    rows = int(scale * 1_000_000)
+    start, end = TIME_RANGES[schema]
+    files = files or (1 if dataset == "single" else 12)
+    if dataset == "single" and files != 1:
+        # the single dataset is one file at its output path, the benchmarks would glob a directory of that name
+        raise ValueError(f"The single dataset is one file, got files={files}; generate the multi dataset instead")
+
+    if dataset == "single":
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        paths = [write_file(output, rows, start, end, seed, 0, schema, row_group_size, chunk_rows, compression)]
+    else:
+        os.makedirs(output, exist_ok=True)
+        prefix = "taxi" if schema == "legacy" else "yellow_tripdata"
+        paths = []
+        for index, (file_start, file_end) in enumerate(_file_ranges(start, end, files)):
+            file_rows = rows // files + (1 if index < rows % files else 0)
+            path = os.path.join(output, f"{prefix}_{index:04d}.parquet")
+            paths.append(write_file(
+                path, file_rows, file_start, file_end, seed, index, schema, row_group_size, chunk_rows, compression,
+            ))
+    return paths
+
+
+# In-memory table for suites that generate their own input (kept small enough to hold in memory)
+def taxi_table(rows, seed=0, schema="legacy", start=None, end=None, chunk_rows=CHUNK_ROWS):
+    default_start, default_end = TIME_RANGES[schema]
+    start, end = start or default_start, end or default_end
+    zone_p = zone_probabilities(seed)
+    return pa.concat_tables([
+        taxi_chunk(np.random.default_rng([seed, 0, chunk_index]), chunk, chunk_start, chunk_end, schema, zone_p)
+        for chunk_index, chunk, chunk_start, chunk_end in _chunk_plan(rows, start, end, chunk_rows)
+    ])
+
+
+def add_arguments(parser):
+    parser.add_argument("--dataset", nargs="+", choices=list(OUTPUTS), default=list(OUTPUTS),
+                        help="Which dataset(s) to generate (default: both)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Millions of rows per dataset (1 to 1000+)")
+    parser.add_argument("--scales", nargs="+", type=float,
+                        help="Instead of --dataset, write one multi-file dataset per scale (millions of rows)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--files", type=int, help="Number of files of the multi dataset (default: 12)")
+    parser.add_argument("--row-group-size", type=int, default=ROW_GROUP_SIZE)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="Rows generated in memory at a time")
+    parser.add_argument("--compression", default="snappy")
+
+
+def run(args):
+    if args.scales:
+        jobs = [("multi", scale, SCALE_OUTPUT.format(scale=scale)) for scale in args.scales]
+    else:
+        jobs = [(dataset, args.scale, None) for dataset in args.dataset]
+    if args.files not in (None, 1) and any(dataset == "single" for dataset, _, _ in jobs):
+        raise SystemExit("--files only applies to the multi dataset, the single dataset is one file: add --dataset multi")
+    for dataset, scale, output in jobs:
+        paths = generate(dataset, scale, args.seed, args.files, args.row_group_size, args.chunk_rows, output,
+                         args.compression)
+        size = sum(os.path.getsize(path) for path in paths)
+        print(f"{dataset} ({scale:g}M rows): {len(paths)} file(s), {size / 1024 ** 2:.1f} MB under "
+              f"{os.path.dirname(paths[0])}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic taxi Parquet data")
+    add_arguments(parser)
+    run(parser.parse_args())
@@ -0,0 +1,252 @@
+import duckdb
+import matplotlib.pyplot as plt
+import pandas as pd
+import polars as pl
+import seaborn as sns
+
+import benchmark as bm
+import registry
+
+'''
+Group-by and aggregation comparisons for Pandas, Polars (eager and lazy) and DuckDB.
+
+Each workload groups the dataset by keys of increasing cardinality and computes the same aggregates in every engine:
+- `groupby_passenger_count`: ~7 groups
+- `groupby_vendor`: 2-3 groups
+- `groupby_pickup_hour`: 24 groups, derived from the time column
+- `groupby_location_pairs`: pickup x dropoff location, up to ~70k groups
+with count, sum and mean of total_amount, mean trip_distance and max tip_amount, plus
+- `quantiles_pickup_hour`: median and 90th percentile of total_amount and trip_distance per pickup hour
+- `approx_distinct_pickup_location`: distinct dropoff locations and fares per pickup location, approximate in
+  Polars (`approx_n_unique`) and DuckDB (`approx_count_distinct`, HyperLogLog); Pandas has no approximate count,
+  so it runs the exact `nunique`.
+
+Pandas and eager Polars read only the columns the workload needs; the lazy engines get that from projection
+pushdown. The 2019 and 2022 schemas name the vendor and location columns differently, they are looked up in the
+file schema (`Dataset.column`).
+
+Peak memory is recorded with every case (second panel of the plots). For the 1M to 100M+ row scaling, generate the
+`synthetic_<N>m` datasets first (`python main.py generate --scales 1 10 100`) and run
+`python main.py run --suite groupby --dataset synthetic_1m synthetic_10m synthetic_100m --isolate`.
+
+Variables:
+- `SUITE`: Name of the suite in the registry.
+- `GROUP_KEYS`: Group keys (roles) of each group-by workload.
+- `REPEAT_TIMES`: Number of times each function will be run when this file is run as a script.
+- `con`: DuckDB connection object for executing SQL queries.
+'''
+
+# parameters
+SUITE = "groupby"
+GROUP_KEYS = {
+    "groupby_passenger_count": ["passenger_count"],
+    "groupby_vendor": ["vendor"],
+    "groupby_pickup_hour": ["pickup_hour"],
+    "groupby_location_pairs": ["pickup_location", "dropoff_location"],
+}
+VALUE_COLUMNS = ["total_amount", "trip_distance", "tip_amount"]
+REPEAT_TIMES = 3
+TITLES = {"single": "Single File", "multi": "Multiple Files"}
+
+# init
+con = duckdb.connect()
+
+
+# The pickup hour is derived from the time column, every other key is a column role of the dataset
+def source_columns(ds, keys, values):
+    columns = [ds.time_column if key == "pickup_hour" else ds.column(key) for key in keys]
+    return list(dict.fromkeys(columns + values))
+
+
+def sql_key(ds, key):
+    return f"hour({ds.time_column}) AS pickup_hour" if key == "pickup_hour" else ds.column(key)
+
+
+def key_names(ds, keys):
+    return ["pickup_hour" if key == "pickup_hour" else ds.column(key) for key in keys]
+
+
+### Pandas
+def pandas_frame(ds, keys, values):
+    df = pd.read_parquet(ds.source, columns=source_columns(ds, keys, values))
+    if "pickup_hour" in keys:
+        df["pickup_hour"] = df[ds.time_column].dt.hour
+    return df
+
+
+def pandas_groupby(ds, keys):
+    df = pandas_frame(ds, keys, VALUE_COLUMNS)
+    return df.groupby(key_names(ds, keys), observed=True).agg(
+        trips=("total_amount", "size"),
+        total_amount_sum=("total_amount", "sum"),
+        total_amount_mean=("total_amount", "mean"),
+        trip_distance_mean=("trip_distance", "mean"),
+        tip_amount_max=("tip_amount", "max"),
+    ).reset_index()
+
+
+def pandas_quantiles(ds):
+    grouped = pandas_frame(ds, ["pickup_hour"], ["total_amount", "trip_distance"]).groupby("pickup_hour")[
+        ["total_amount", "trip_distance"]
+    ]
+    medians = grouped.median().add_suffix("_median")
+    p90 = grouped.quantile(0.9).add_suffix("_p90")
+    return pd.concat([medians, p90], axis=1).reset_index()
+
+
+def pandas_distinct(ds):
+    df = pandas_frame(ds, ["pickup_location"], [ds.column("dropoff_location"), "total_amount"])
+    return df.groupby(ds.column("pickup_location")).agg(
+        dropoff_locations=(ds.column("dropoff_location"), "nunique"),
+        fares=("total_amount", "nunique"),
+    ).reset_index()
+
+
+### Polars
+def polars_keys(ds, keys):
+    return [
+        pl.col(ds.time_column).dt.hour().alias("pickup_hour") if key == "pickup_hour" else pl.col(ds.column(key))
+        for key in keys
+    ]
+
+
+def polars_aggregates():
+    return [
+        pl.len().alias("trips"),
+        pl.col("total_amount").sum().alias("total_amount_sum"),
+        pl.col("total_amount").mean().alias("total_amount_mean"),
+        pl.col("trip_distance").mean().alias("trip_distance_mean"),
+        pl.col("tip_amount").max().alias("tip_amount_max"),
+    ]
+
+
+def polars_quantile_aggregates():
+    return [
+        expr
+        for name in ["total_amount", "trip_distance"]
+        for expr in (pl.col(name).median().alias(f"{name}_median"),
+                     pl.col(name).quantile(0.9, interpolation="linear").alias(f"{name}_p90"))
+    ]
+
+
+def polars_distinct_aggregates(ds):
+    return [
+        pl.col(ds.column("dropoff_location")).approx_n_unique().alias("dropoff_locations"),
+        pl.col("total_amount").approx_n_unique().alias("fares"),
+    ]
+
+
+def polars_eager(ds, keys, values, aggregates):
+    df = pl.read_parquet(ds.source, columns=source_columns(ds, keys, values))
+    return df.group_by(polars_keys(ds, keys)).agg(aggregates)
+
+
+def polars_lazy(ds, keys, aggregates):
+    return pl.scan_parquet(ds.source).group_by(polars_keys(ds, keys)).agg(aggregates).collect()
+
+
+### DuckDB
+SQL_AGGREGATES = """
+    count(*) AS trips,
+    sum(total_amount) AS total_amount_sum,
+    avg(total_amount) AS total_amount_mean,
+    avg(trip_distance) AS trip_distance_mean,
+    max(tip_amount) AS tip_amount_max
+"""
+SQL_QUANTILES = """
+    median(total_amount) AS total_amount_median,
+    quantile_cont(total_amount, 0.9) AS total_amount_p90,
+    median(trip_distance) AS trip_distance_median,
+    quantile_cont(trip_distance, 0.9) AS trip_distance_p90
+"""
+
+
+def sql_distinct(ds):
+    return f"""
+    approx_count_distinct({ds.column("dropoff_location")}) AS dropoff_locations,
+    approx_count_distinct(total_amount) AS fares
+"""
+
+
+def duckdb_groupby(ds, keys, aggregates):
+    return con.execute(f"""
+        SELECT {", ".join(sql_key(ds, key) for key in keys)}, {aggregates}
+        FROM {ds.sql_source}
+        GROUP BY ALL
+    """)
+
+
+### Registering every (workload, engine) pair
+for workload, keys in GROUP_KEYS.items():
+    registry.register(SUITE, workload, "pandas", lambda ds, keys=keys: pandas_groupby(ds, keys), bm.PANDAS)
+    registry.register(SUITE, workload, "polars",
+                      lambda ds, keys=keys: polars_eager(ds, keys, VALUE_COLUMNS, polars_aggregates()), bm.POLARS)
+    registry.register(SUITE, workload, "polars_lazy",
+                      lambda ds, keys=keys: polars_lazy(ds, keys, polars_aggregates()), bm.POLARS)
+    registry.register(SUITE, workload, "duckdb",
+                      lambda ds, keys=keys: duckdb_groupby(ds, keys, SQL_AGGREGATES), bm.ARROW)
+
+registry.register(SUITE, "quantiles_pickup_hour", "pandas", pandas_quantiles, bm.PANDAS)
+registry.register(SUITE, "quantiles_pickup_hour", "polars", lambda ds: polars_eager(
+    ds, ["pickup_hour"], ["total_amount", "trip_distance"], polars_quantile_aggregates()), bm.POLARS)
+registry.register(SUITE, "quantiles_pickup_hour", "polars_lazy",
+                  lambda ds: polars_lazy(ds, ["pickup_hour"], polars_quantile_aggregates()), bm.POLARS)
+registry.register(SUITE, "quantiles_pickup_hour", "duckdb",
+                  lambda ds: duckdb_groupby(ds, ["pickup_hour"], SQL_QUANTILES), bm.ARROW)
+
+registry.register(SUITE, "approx_distinct_pickup_location", "pandas", pandas_distinct, bm.PANDAS)
+registry.register(SUITE, "approx_distinct_pickup_location", "polars", lambda ds: polars_eager(
+    ds, ["pickup_location"], [ds.column("dropoff_location"), "total_amount"], polars_distinct_aggregates(ds),
+), bm.POLARS)
+registry.register(SUITE, "approx_distinct_pickup_location", "polars_lazy",
+                  lambda ds: polars_lazy(ds, ["pickup_location"], polars_distinct_aggregates(ds)), bm.POLARS)
+registry.register(SUITE, "approx_distinct_pickup_location", "duckdb",
+                  lambda ds: duckdb_groupby(ds, ["pickup_location"], sql_distinct(ds)), bm.ARROW)
+
+
+# Median time and peak memory against the number of rows, one line per engine (for the synthetic_<N>m datasets)
+def plot_by_rows(results, workload, filename=None, show=False, title="Aggregation Scaling"):
+    rows = []
+    for result in results:
+        if result.case.workload != workload or result.timing is None:
+            continue
+        memory = result.timing.memory.summary() if result.timing.memory else {}
+        rows.append({
+            "Rows": result.dataset.num_rows,
+            "Engine": result.label,
+            "Time (s)": result.timing.median,
+            "RSS Increase (MB)": memory.get("RSS Increase (MB)"),
+            "Peak RSS (MB)": memory.get("Peak RSS (MB)"),
+        })
+    df = pd.DataFrame(rows)
+    # one metric for every line, named on the axis: the lifetime peak only when no run has a resettable peak
+    memory_column = "RSS Increase (MB)"
+    if df[memory_column].isna().all():
+        memory_column = "Peak RSS (MB)"
+    fig, (ax_time, ax_memory) = plt.subplots(1, 2, figsize=(14, 6))
+    for ax, column in ((ax_time, "Time (s)"), (ax_memory, memory_column)):
+        sns.lineplot(df, x="Rows", y=column, hue="Engine", marker="o", ax=ax)
+        ax.set_xscale("log")
+        ax.set_yscale("log")
+    fig.suptitle(f"{title}: {workload}")
+    fig.tight_layout()
+    if filename:
+        fig.savefig(f"images/{filename}")
+    if show:
+        plt.show()
+    plt.close(fig)
+
+
+if __name__ == "__main__":
+    ### Run benchmarks on the taxi files and on any generated scale datasets
+    scaled = [ds.name for ds in registry.get_datasets() if ds.name.startswith("synthetic_") and ds.name.endswith("m")]
+    datasets = registry.get_datasets(list(TITLES) + scaled)
+    results = registry.run_cases(registry.select(suites=[SUITE]), datasets, runs=REPEAT_TIMES)
+
+    ### Plotting results for each benchmark group
+    for (_, workload, dataset), timings in registry.group_results(results).items():
+        title = TITLES.get(dataset, dataset)
+        bm.plot_results(timings, f"{title}: {workload}", f"speed_{workload}_{dataset}.png")
+    if scaled:
+        for workload in registry.workloads(SUITE):
+            plot_by_rows([r for r in results if r.dataset.name in scaled], workload, f"scaling_rows_{workload}.png")
@@ -0,0 +1,154 @@
+import duckdb
+import pandas as pd
+import polars as pl
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import benchmark as bm
+import dataset_index
+import registry
+from registry import case
+
+'''
+Dataset index against the raw glob: what the footer catalog in `dataset_index` saves on repeated filter queries.
+
+Every baseline query globs the dataset's files and has the engine open every footer before it can prune. The indexed
+queries refresh the index instead (one `os.stat` per file and directory, see `dataset_index`), take the files and
+row groups whose statistics can match the filter from it, and hand only those to the engine:
+- Pandas, Polars Lazy and DuckDB get the matching files (they prune row groups within them themselves)
+- PyArrow reads just the matching row groups with `ParquetFile.read_row_groups`, reusing the cached footers
+
+The index is built before the first run and then kept up to date by every run, so the timed runs include checking
+it but not building it. The difference grows with the number of files: generate a dataset with many small
+files (`python main.py generate --files 1000`) to see footer parsing dominate short queries.
+
+Workloads:
+- `plan`: only find the files and row groups that can match (glob and parse every footer, or refresh the index)
+- `glob_filter`: the filter (time column > cutoff, all columns) on the globbed files
+- `indexed_filter`: the same filter on what the index says can match, an empty result with the dataset's schema when
+  nothing can
+
+Variables:
+- `SUITE`: Name of the suite in the registry.
+- `REPEAT_TIMES`: Number of times each function will be run when this file is run as a script.
+- `con`: DuckDB connection object for executing SQL queries.
+'''
+
+# parameters
+SUITE = "dataset_index"
+REPEAT_TIMES = 5
+TITLES = {"single": "Single File", "multi": "Multiple Files"}
+
+# init
+con = duckdb.connect()
+
+
+def indexed(ds):
+    return dataset_index.matching(dataset_index.refresh(ds), ds.time_column, ds.cutoff)
+
+
+# No rows with the dataset's schema (from the index), for a filter no file can match
+def empty_table(index):
+    schemas = [entry.arrow_schema for entry in index.files.values()]
+    return pa.unify_schemas(schemas, promote_options="permissive").empty_table()
+
+
+### Planning: which files and row groups can match
+@case(SUITE, "plan", "pyarrow", bm.COUNT, variant="glob")
+def glob_plan(ds):
+    kept = {}
+    for path in ds.files:
+        metadata = pq.read_metadata(path)
+        time_index = metadata.schema.names.index(ds.time_column)
+        groups = []
+        for i in range(metadata.num_row_groups):
+            stats = metadata.row_group(i).column(time_index).statistics
+            if stats is None or not stats.has_min_max or stats.max > ds.cutoff:
+                groups.append(i)
+        if groups:
+            kept[path] = groups
+    return kept
+
+@case(SUITE, "plan", "pyarrow", bm.COUNT, variant="index", prepare=dataset_index.refresh)
+def index_plan(ds):
+    return indexed(ds)
+
+
+### Baseline: glob and let the engine read every footer
+@case(SUITE, "glob_filter", "pandas", bm.PANDAS)
+def pandas_glob_filter(ds):
+    return pd.read_parquet(ds.source, filters=ds.filters)
+
+@case(SUITE, "glob_filter", "pyarrow", bm.ARROW)
+def pyarrow_glob_filter(ds):
+    return ds.arrow_dataset.to_table(filter=ds.arrow_filter)
+
+@case(SUITE, "glob_filter", "polars_lazy", bm.POLARS)
+def polars_glob_filter(ds):
+    return pl.scan_parquet(ds.source).filter(pl.col(ds.time_column) > ds.cutoff).collect()
+
+@case(SUITE, "glob_filter", "duckdb", bm.ARROW)
+def duckdb_glob_filter(ds):
+    return con.execute(f"""
+        SELECT *
+        FROM {ds.sql_source}
+        WHERE {ds.sql_filter}
+    """)
+
+
+### Only the files and row groups the index says can match
+@case(SUITE, "indexed_filter", "pandas", bm.PANDAS, prepare=dataset_index.refresh)
+def pandas_indexed_filter(ds):
+    kept = indexed(ds)
+    if not kept:
+        return empty_table(dataset_index.refresh(ds)).to_pandas()
+    return pd.read_parquet(list(kept), filters=ds.filters)
+
+@case(SUITE, "indexed_filter", "pyarrow", bm.ARROW, prepare=dataset_index.refresh)
+def pyarrow_indexed_filter(ds):
+    index = dataset_index.refresh(ds)
+    kept = dataset_index.matching(index, ds.time_column, ds.cutoff)
+    if not kept:
+        return empty_table(index)
+    schema = pa.unify_schemas([index.files[path].arrow_schema for path in kept], promote_options="permissive")
+    tables = [
+        pq.ParquetFile(path, metadata=dataset_index.footer(path)).read_row_groups(groups).cast(schema)
+        for path, groups in kept.items()
+    ]
+    table = pa.concat_tables(tables)
+    return table.filter(pc.greater(table[ds.time_column], pa.scalar(ds.cutoff, type=pa.timestamp("us"))))
+
+@case(SUITE, "indexed_filter", "polars_lazy", bm.POLARS, prepare=dataset_index.refresh)
+def polars_indexed_filter(ds):
+    kept = indexed(ds)
+    if not kept:
+        return pl.from_arrow(empty_table(dataset_index.refresh(ds)))
+    return pl.scan_parquet(list(kept)).filter(pl.col(ds.time_column) > ds.cutoff).collect()
+
+@case(SUITE, "indexed_filter", "duckdb", bm.ARROW, prepare=dataset_index.refresh)
+def duckdb_indexed_filter(ds):
+    kept = indexed(ds)
+    if not kept:
+        return con.from_arrow(empty_table(dataset_index.refresh(ds)))
+    files = ", ".join(f"'{path}'" for path in kept)
+    return con.execute(f"""
+        SELECT *
+        FROM read_parquet([{files}])
+        WHERE {ds.sql_filter}
+    """)
+
+
+if __name__ == "__main__":
+    ### Run benchmarks
+    results = registry.run_cases(registry.select(suites=[SUITE]), registry.get_datasets(TITLES), runs=REPEAT_TIMES)
+
+    ### Glob vs index side by side for each dataset
+    for dataset in TITLES:
+        timings = {
+            f"{r.case.label} ({'Index' if r.case.workload == 'indexed_filter' else 'Glob'})": r.timing
+            for r in results if r.dataset.name == dataset and r.case.workload != "plan"
+        }
+        plans = {r.case.label: r.timing for r in results if r.dataset.name == dataset and r.case.workload == "plan"}
+        bm.plot_results(timings, f"{TITLES[dataset]}: Glob vs Dataset Index", f"speed_index_filter_{dataset}.png", xtick_rotation=30)
+        bm.plot_results(plans, f"{TITLES[dataset]}: Planning the Scan", f"speed_index_plan_{dataset}.png")
@@ -0,0 +1,245 @@
+from functools import cache
+
+import duckdb
+import numpy as np
+import pandas as pd
+import polars as pl
+import pyarrow as pa
+
+import benchmark as bm
+import registry
+
+'''
+Interop comparisons: the cost of handing a dataset from one engine to another.
+
+The dataset is loaded once per process as an Arrow table, a NumPy-backed Pandas DataFrame and a Polars DataFrame,
+before each case is timed, so every case times only the conversion, query or fetch.
+The numeric-only workload converts the float columns of the Arrow table, combined into one chunk.
+
+Workloads (`<source>_to_<target>`, variants in brackets):
+- `pandas_to_polars`: `pl.from_pandas`
+- `polars_to_pandas`: `to_pandas()` (NumPy-backed) and `[arrow_ext]` `to_pandas(use_pyarrow_extension_array=True)`
+- `arrow_to_pandas`: `to_pandas()` and `[arrow_dtypes]` `to_pandas(types_mapper=pd.ArrowDtype)`
+- `arrow_numeric_to_pandas`: `to_pandas()` and `[zero_copy]` `to_pandas(zero_copy_only=True, split_blocks=True)`,
+  which raises instead of copying
+- `arrow_to_polars`: `pl.from_arrow` (rechunks by default) and `[no_rechunk]` `pl.from_arrow(rechunk=False)`
+- `polars_to_arrow`: `to_arrow()`
+- `duckdb_scan`: `SELECT ... FROM df` replacement scans `[pandas]`, `[polars]` and `[arrow]`, aggregating every
+  numeric column so the whole object is scanned and only a single row comes back
+- `duckdb_fetch`: `SELECT *` over the Arrow table, fetched as Arrow (`fetch_record_batch().read_all()`), `.pl()` and
+  `.df()`
+
+Peak memory is recorded with every case. After the timings `copies` compares the buffers of each conversion's output
+with those of its source: the share of the output's bytes that point into the source's memory, and how many MB had to
+be copied. A path is zero copy when all of the output points into the source. Polars buffers are found by exporting
+each chunk to Arrow, which shares Polars' memory. The scans return one row, so they only have the memory statistics.
+
+Variables:
+- `SUITE`: Name of the suite in the registry.
+- `SOURCES`: Source object of each conversion case, by case name.
+- `REPEAT_TIMES`: Number of times each function will be run when this file is run as a script.
+- `con`: DuckDB connection object for executing SQL queries.
+'''
+
+# parameters
+SUITE = "interop"
+SOURCES = {}
+REPEAT_TIMES = 5
+TITLES = {"single": "Single File", "multi": "Multiple Files"}
+
+# init
+con = duckdb.connect()
+
+
+### Source objects, loaded once per dataset
+@cache
+def arrow_table(ds):
+    return ds.arrow_dataset.to_table()
+
+
+@cache
+def arrow_numeric(ds):
+    table = arrow_table(ds)
+    return table.select([name for name in table.column_names if pa.types.is_floating(table[name].type)]).combine_chunks()
+
+
+@cache
+def pandas_frame(ds):
+    return arrow_table(ds).to_pandas()
+
+
+@cache
+def polars_frame(ds):
+    return pl.from_arrow(arrow_table(ds))
+
+
+# Register `func(source object)` as a case, and remember the source for `copies`
+def conversion(workload, engine, source, output, variant=""):
+    def decorator(func):
+        new_case = registry.register(
+            SUITE, workload, engine, lambda ds: func(source(ds)), output, variant, prepare=source,
+        )
+        SOURCES[new_case.name] = source
+        return func
+    return decorator
+
+
+### Conversions
+@conversion("pandas_to_polars", "polars", pandas_frame, bm.POLARS)
+def pandas_to_polars(df):
+    return pl.from_pandas(df)
+
+@conversion("polars_to_pandas", "polars", polars_frame, bm.PANDAS)
+def polars_to_pandas(df):
+    return df.to_pandas()
+
+@conversion("polars_to_pandas", "polars", polars_frame, bm.PANDAS, "arrow_ext")
+def polars_to_pandas_arrow(df):
+    return df.to_pandas(use_pyarrow_extension_array=True)
+
+@conversion("arrow_to_pandas", "pyarrow", arrow_table, bm.PANDAS)
+def arrow_to_pandas(table):
+    return table.to_pandas()
+
+@conversion("arrow_to_pandas", "pyarrow", arrow_table, bm.PANDAS, "arrow_dtypes")
+def arrow_to_pandas_arrow_dtypes(table):
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+@conversion("arrow_numeric_to_pandas", "pyarrow", arrow_numeric, bm.PANDAS)
+def arrow_numeric_to_pandas(table):
+    return table.to_pandas()
+
+@conversion("arrow_numeric_to_pandas", "pyarrow", arrow_numeric, bm.PANDAS, "zero_copy")
+def arrow_numeric_to_pandas_zero_copy(table):
+    # one block per column: a consolidated 2D block always needs a copy
+    return table.to_pandas(zero_copy_only=True, split_blocks=True)
+
+@conversion("arrow_to_polars", "polars", arrow_table, bm.POLARS)
+def arrow_to_polars(table):
+    return pl.from_arrow(table)
+
+@conversion("arrow_to_polars", "polars", arrow_table, bm.POLARS, "no_rechunk")
+def arrow_to_polars_no_rechunk(table):
+    return pl.from_arrow(table, rechunk=False)
+
+@conversion("polars_to_arrow", "polars", polars_frame, bm.ARROW)
+def polars_to_arrow(df):
+    return df.to_arrow()
+
+
+### DuckDB replacement scans over the in-memory objects
+def scan_aggregates(columns):
+    return ", ".join(f"sum({name}) AS {name}" for name in columns)
+
+
+def numeric_columns(ds):
+    return arrow_numeric(ds).column_names
+
+
+# `df` is found by name in the calling frame (replacement scan), whatever kind of object it is
+def duckdb_scan(ds, df):
+    return con.execute(f"SELECT count(*) AS rows, {scan_aggregates(numeric_columns(ds))} FROM df")
+
+
+for variant, source in {"pandas": pandas_frame, "polars": polars_frame, "arrow": arrow_table}.items():
+    registry.register(
+        SUITE, "duckdb_scan", "duckdb", lambda ds, source=source: duckdb_scan(ds, source(ds)), bm.ARROW, variant,
+        prepare=source,
+    )
+
+
+### DuckDB result fetches
+@conversion("duckdb_fetch", "duckdb", arrow_table, bm.ARROW, "arrow")
+def duckdb_fetch_arrow(trips):
+    # .arrow() returns a Table or a RecordBatchReader depending on the DuckDB release, this is the same in both
+    return con.execute("SELECT * FROM trips").fetch_record_batch().read_all()
+
+@conversion("duckdb_fetch", "duckdb", arrow_table, bm.POLARS, "polars")
+def duckdb_fetch_polars(trips):
+    return con.execute("SELECT * FROM trips").pl()
+
+@conversion("duckdb_fetch", "duckdb", arrow_table, bm.PANDAS, "pandas")
+def duckdb_fetch_pandas(trips):
+    return con.execute("SELECT * FROM trips").df()
+
+
+### Which conversions copy
+def _arrow_ranges(data):
+    chunks = data.chunks if isinstance(data, pa.ChunkedArray) else [data]
+    return [(b.address, b.size) for chunk in chunks for b in chunk.buffers() if b is not None]
+
+
+# (address, size) of every memory buffer behind a DataFrame or table
+def buffer_ranges(obj):
+    if isinstance(obj, pl.DataFrame):
+        # exported chunk by chunk: exporting a multi-chunk column rechunks it into new memory
+        return [
+            r for series in obj.get_columns() for chunk in series.get_chunks()
+            for r in _arrow_ranges(chunk.to_arrow(compat_level=pl.CompatLevel.newest()))
+        ]
+    if isinstance(obj, pa.Table):
+        return [r for column in obj.columns for r in _arrow_ranges(column)]
+    ranges = []
+    for _, series in obj.items():
+        values = series.array
+        if hasattr(values, "__arrow_array__"):
+            ranges += _arrow_ranges(pa.array(values))
+        else:
+            array = series.to_numpy(copy=False)
+            if array.dtype != object:
+                ranges.append((array.__array_interface__["data"][0], array.nbytes))
+    return ranges
+
+
+# Bytes of `output` that lie inside the buffers of `source`
+def shared_bytes(output, source):
+    source_ranges = sorted((start, start + size) for start, size in buffer_ranges(source))
+    starts = np.array([start for start, _ in source_ranges], dtype=np.uint64)
+    shared = 0
+    for start, size in buffer_ranges(output):
+        i = int(np.searchsorted(starts, np.uint64(start), side="right")) - 1
+        if i >= 0 and start + size <= source_ranges[i][1]:
+            shared += size
+    return shared
+
+
+# Share of each conversion's output that points into its source, printed by `main.py run` after the timings
+def copies(results):
+    rows = []
+    for result in results:
+        if result.timing is None:
+            continue
+        memory = result.timing.memory.summary() if result.timing.memory else {}
+        row = {
+            "Workload": result.case.workload,
+            "Dataset": result.dataset.name,
+            "Engine": result.label,
+            "Median (s)": result.timing.median,
+            "RSS Increase (MB)": memory.get("RSS Increase (MB)"),
+            "Arrow Allocated (MB)": memory.get("Arrow Allocated (MB)"),
+        }
+        source = SOURCES.get(result.case.name)
+        if source is not None:
+            output = result.case.bind(result.dataset)()
+            total = sum(size for _, size in buffer_ranges(output))
+            shared = shared_bytes(output, source(result.dataset))
+            row.update({
+                "Shared (%)": 100 * shared / total if total else None,
+                "Copied (MB)": (total - shared) / bm.MB,
+                "Zero Copy": total > 0 and shared == total,
+            })
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+registry.register_report(SUITE, copies)
+
+
+if __name__ == "__main__":
+    ### Run benchmarks
+    results = registry.run_cases(registry.select(suites=[SUITE]), registry.get_datasets(TITLES), runs=REPEAT_TIMES)
+    print(copies(results))
+
+    ### Plotting results for each conversion
+    for (_, workload, dataset), timings in registry.group_results(results).items():
+        bm.plot_results(timings, f"{TITLES[dataset]}: {workload}", f"speed_interop_{workload}_{dataset}.png")
@@ -0,0 +1,473 @@
+import math
+import os
+from functools import cache
+
+import duckdb
+import numpy as np
+import pandas as pd
+import polars as pl
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import benchmark as bm
+import executor
+import registry
+from registry import case
+
+'''
+Join comparisons for Pandas, Polars (eager and lazy) and DuckDB: the taxi trips (the fact table) joined to
+dimension tables and to a second fact table.
+
+The join inputs are generated once per dataset under `data/joins/<dataset>/` before the first run, and regenerated
+when the source files change:
+- `zones`: the 265 taxi zones, with borough and service zone (`Yellow Zone` for Manhattan, `Airports`, `Boro Zone`)
+- `vendors`: the vendor ids, deliberately missing some ids that occur in the trips so left joins produce nulls
+- `calendar`: one row per day from 2000 to 2030, with day of week, weekend and holiday flags
+- `zone_events`: events per pickup zone, more for busier zones (`HOT_ZONE_EVENTS` for the busiest, at least one for
+  every zone), so the join output is dominated by a few hot keys
+- `trips` and `payments`: the trips with a `trip_id`, and one payment per trip in shuffled order
+
+Workloads:
+- `inner_zones`: trips inner join zones on the pickup zone
+- `left_dimensions`: trips left join pickup zone, dropoff zone, vendor and calendar (star join)
+- `semi_manhattan`: trips with a pickup zone in Manhattan (`isin` in Pandas)
+- `anti_yellow_zone`: trips whose dropoff zone is not in the Yellow Zone
+- `skewed_keys`: trips join zone_events, aggregated per event type
+- `fact_to_fact`: trips join payments on `trip_id`, aggregated per payment method. The hash table is built over a
+  table as long as the trips. DuckDB runs it under a memory limit of `FACT_TO_FACT_BYTES_PER_ROW` per trip, but no
+  less than `FACT_TO_FACT_MIN_LIMIT`, and spills to `TEMP_DIRECTORY` when the hash table does not fit (the spilled
+  bytes are recorded with the memory statistics). Below about 2M trips the floor holds most or all of the hash
+  table, so whether it spills depends on the DuckDB release and thread count: on 0.5M trips DuckDB 1.3 did not spill
+  and 1.5 spilled 6MB, on 1M trips both spilled about 30MB. From 2M trips, where the per-trip limit takes over, it
+  spills 30 to 40 bytes per trip. On the `synthetic_<N>m` datasets the join stops fitting in memory for the other
+  engines too, where Polars Lazy runs it on the streaming engine. Pandas has no out-of-core join, run the suite with
+  `--isolate` so running out of memory only fails its own case.
+
+Fact rows joined per second and DuckDB's spill are printed after the timings (`throughput`).
+
+Variables:
+- `SUITE`: Name of the suite in the registry.
+- `JOIN_DIR`: Where the generated join inputs are written.
+- `TEMP_DIRECTORY`: Where DuckDB spills when a join does not fit in `MEMORY_LIMIT`.
+- `MEMORY_LIMIT`: DuckDB memory limit of the other workloads, None for DuckDB's default (80% of RAM). Under
+  `--memory-cap` every DuckDB case runs under the lower of its own limit and the one derived from the cap.
+- `FACT_TO_FACT_BYTES_PER_ROW`: DuckDB memory limit of the fact-to-fact join per trip, about a quarter of what its
+  hash table needs.
+- `FACT_TO_FACT_MIN_LIMIT`: Lowest memory limit of the fact-to-fact join (bytes), below which DuckDB cannot run it.
+- `HOT_ZONE_EVENTS`: Number of zone_events rows of the busiest pickup zone.
+- `REPEAT_TIMES`: Number of times each function will be run when this file is run as a script.
+- `con`: DuckDB connection object for executing SQL queries.
+'''
+
+# parameters
+SUITE = "joins"
+JOIN_DIR = "data/joins"
+TEMP_DIRECTORY = "data/joins/spill"
+MEMORY_LIMIT = None
+FACT_TO_FACT_BYTES_PER_ROW = 16
+FACT_TO_FACT_MIN_LIMIT = 32 * 2 ** 20
+ZONES = 265
+BOROUGHS = ["Manhattan", "Brooklyn", "Queens", "Bronx", "Staten Island"]
+AIRPORTS = [1, 132, 138]
+VENDORS = {1: "Creative Mobile Technologies", 2: "Curb Mobility", 6: "Myle Technologies"}
+HOLIDAYS = [(1, 1), (7, 4), (12, 25)]
+EVENT_TYPES = ["concert", "game", "conference", "parade", "market"]
+HOT_ZONE_EVENTS = 20
+PAYMENT_METHODS = 4
+REPEAT_TIMES = 3
+TITLES = {"single": "Single File", "multi": "Multiple Files"}
+
+# init
+con = duckdb.connect()
+con.execute(f"SET temp_directory = '{TEMP_DIRECTORY}'")
+con.execute("SET preserve_insertion_order = false")
+
+
+def fact_columns(ds):
+    return [ds.time_column, ds.column("vendor"), ds.column("pickup_location"), ds.column("dropoff_location"),
+            "trip_distance", "total_amount"]
+
+
+### Generating the join inputs
+# Key columns take the type of the trips column they join to, so no engine has to cast during the join
+def _key(values, ds, role):
+    return pc.cast(pa.array(values, type=pa.int64()), pq.read_schema(ds.files[0]).field(ds.column(role)).type)
+
+
+def _zones(ds):
+    ids = np.arange(1, ZONES + 1)
+    boroughs = [BOROUGHS[i % len(BOROUGHS)] for i in ids]
+    service = [
+        "Airports" if i in AIRPORTS else "Yellow Zone" if borough == "Manhattan" else "Boro Zone"
+        for i, borough in zip(ids, boroughs)
+    ]
+    return pa.table({
+        "zone_id": _key(ids, ds, "pickup_location"),
+        "zone": [f"Zone {i}" for i in ids],
+        "borough": boroughs,
+        "service_zone": service,
+    })
+
+
+def _vendors(ds):
+    return pa.table({"vendor_id": _key(list(VENDORS), ds, "vendor"), "vendor_name": list(VENDORS.values())})
+
+
+def _calendar():
+    days = pd.date_range("2000-01-01", "2030-12-31", freq="D")
+    return pa.table({
+        "date": pa.array(days.date, type=pa.date32()),
+        "day_of_week": np.asarray(days.dayofweek),
+        "is_weekend": np.asarray(days.dayofweek >= 5),
+        "is_holiday": np.isin(days.month * 100 + days.day, [m * 100 + d for m, d in HOLIDAYS]),
+    })
+
+
+# Events per pickup zone in proportion to the zone's trips, at least one per zone
+def _zone_events(ds):
+    location = ds.column("pickup_location")
+    counts = con.execute(f"""
+        SELECT {location} AS zone_id, count(*) AS trips
+        FROM {ds.sql_source}
+        WHERE {location} IS NOT NULL
+        GROUP BY ALL
+    """).df()
+    hottest = counts["trips"].max()
+    zone_ids, event_types, weights = [], [], []
+    for zone_id, trips in zip(counts["zone_id"], counts["trips"]):
+        for i in range(max(1, math.ceil(HOT_ZONE_EVENTS * trips / hottest))):
+            zone_ids.append(zone_id)
+            event_types.append(EVENT_TYPES[i % len(EVENT_TYPES)])
+            weights.append(1.0 / (i + 1))
+    return pa.table({
+        "zone_id": _key(zone_ids, ds, "pickup_location"),
+        "event_type": event_types,
+        "weight": weights,
+    })
+
+
+# The trips with a running trip_id, and one payment per trip, shuffled within each file
+def _facts(ds, directory):
+    os.makedirs(os.path.join(directory, "trips"))
+    os.makedirs(os.path.join(directory, "payments"))
+    rng = np.random.default_rng(0)
+    offset = 0
+    for i, file in enumerate(ds.files):
+        table = pq.read_table(file)
+        trip_ids = np.arange(offset, offset + table.num_rows)
+        offset += table.num_rows
+        pq.write_table(table.append_column("trip_id", pa.array(trip_ids)),
+                       os.path.join(directory, "trips", f"part-{i:04d}.parquet"))
+        order = rng.permutation(table.num_rows)
+        amount = table["total_amount"].to_numpy(zero_copy_only=False)[order]
+        pq.write_table(pa.table({
+            "trip_id": trip_ids[order],
+            "payment_method": rng.integers(1, PAYMENT_METHODS + 1, table.num_rows),
+            "amount": np.round(amount * rng.uniform(0.95, 1.05, table.num_rows), 2),
+        }), os.path.join(directory, "payments", f"part-{i:04d}.parquet"))
+        del table
+
+
+def _write_inputs(ds, directory):
+    pq.write_table(_zones(ds), os.path.join(directory, "zones.parquet"))
+    pq.write_table(_vendors(ds), os.path.join(directory, "vendors.parquet"))
+    pq.write_table(_calendar(), os.path.join(directory, "calendar.parquet"))
+    pq.write_table(_zone_events(ds), os.path.join(directory, "zone_events.parquet"))
+    _facts(ds, directory)
+
+
+# Directory of the join inputs of a dataset; regenerated when the source files are newer
+@cache
+def join_inputs(ds):
+    return registry.staged_path(
+        ds, os.path.join(JOIN_DIR, ds.name), lambda directory: _write_inputs(ds, directory), directory=True,
+    )
+
+
+# Path of a join input: a file for the dimension tables, a directory for trips and payments
+def table_path(ds, name):
+    path = os.path.join(join_inputs(ds), name)
+    return path if name in ("trips", "payments") else f"{path}.parquet"
+
+
+def sql_table(ds, name):
+    path = table_path(ds, name)
+    return f"'{path}/*.parquet'" if name in ("trips", "payments") else f"'{path}'"
+
+
+### Pandas
+def pandas_trips(ds, columns=None):
+    return pd.read_parquet(ds.source, columns=columns or fact_columns(ds))
+
+
+@case(SUITE, "inner_zones", "pandas", bm.PANDAS, prepare=join_inputs)
+def pandas_inner_zones(ds):
+    zones = pd.read_parquet(table_path(ds, "zones"))
+    return pandas_trips(ds).merge(zones, left_on=ds.column("pickup_location"), right_on="zone_id")
+
+
+@case(SUITE, "left_dimensions", "pandas", bm.PANDAS, prepare=join_inputs)
+def pandas_left_dimensions(ds):
+    zones = pd.read_parquet(table_path(ds, "zones"), columns=["zone_id", "zone", "borough"])
+    calendar = pd.read_parquet(table_path(ds, "calendar"))
+    df = pandas_trips(ds)
+    calendar["date"] = pd.to_datetime(calendar["date"]).astype(df[ds.time_column].dtype)
+    df["date"] = df[ds.time_column].dt.normalize()
+    return (
+        df.merge(zones.add_prefix("pickup_"), how="left", left_on=ds.column("pickup_location"), right_on="pickup_zone_id")
+        .merge(zones.add_prefix("dropoff_"), how="left", left_on=ds.column("dropoff_location"), right_on="dropoff_zone_id")
+        .merge(pd.read_parquet(table_path(ds, "vendors")), how="left", left_on=ds.column("vendor"), right_on="vendor_id",
+               suffixes=("", "_dim"))
+        .merge(calendar, how="left", on="date")
+    )
+
+
+@case(SUITE, "semi_manhattan", "pandas", bm.PANDAS, prepare=join_inputs)
+def pandas_semi_manhattan(ds):
+    zones = pd.read_parquet(table_path(ds, "zones"))
+    df = pandas_trips(ds)
+    return df[df[ds.column("pickup_location")].isin(zones.loc[zones["borough"] == "Manhattan", "zone_id"])]
+
+
+@case(SUITE, "anti_yellow_zone", "pandas", bm.PANDAS, prepare=join_inputs)
+def pandas_anti_yellow_zone(ds):
+    zones = pd.read_parquet(table_path(ds, "zones"))
+    df = pandas_trips(ds)
+    yellow = zones.loc[zones["service_zone"] == "Yellow Zone", "zone_id"]
+    return df[~df[ds.column("dropoff_location")].isin(yellow)]
+
+
+@case(SUITE, "skewed_keys", "pandas", bm.PANDAS, prepare=join_inputs)
+def pandas_skewed_keys(ds):
+    location = ds.column("pickup_location")
+    events = pd.read_parquet(table_path(ds, "zone_events"))
+    df = pandas_trips(ds, [location, "total_amount"]).merge(events, left_on=location, right_on="zone_id")
+    df["weighted_amount"] = df["total_amount"] * df["weight"]
+    return df.groupby("event_type").agg(
+        trips=("total_amount", "size"), weighted_amount=("weighted_amount", "sum"),
+    ).reset_index()
+
+
+@case(SUITE, "fact_to_fact", "pandas", bm.PANDAS, prepare=join_inputs)
+def pandas_fact_to_fact(ds):
+    trips = pd.read_parquet(table_path(ds, "trips"), columns=["trip_id", "total_amount", "trip_distance"])
+    df = trips.merge(pd.read_parquet(table_path(ds, "payments")), on="trip_id")
+    df["difference"] = df["amount"] - df["total_amount"]
+    return df.groupby("payment_method").agg(
+        trips=("trip_id", "size"), difference=("difference", "sum"), trip_distance=("trip_distance", "mean"),
+    ).reset_index()
+
+
+### Polars (eager reads the join inputs, lazy scans them and lets the optimizer push projections and filters down)
+def polars_frames(ds, lazy):
+    read = pl.scan_parquet if lazy else pl.read_parquet
+    trips = pl.scan_parquet(ds.source).select(fact_columns(ds))
+    return (trips if lazy else trips.collect()), lambda name: read(table_path(ds, name))
+
+
+def polars_collect(frame, engine="auto"):
+    return frame.collect(engine=engine) if isinstance(frame, pl.LazyFrame) else frame
+
+
+def polars_inner_zones(ds, lazy):
+    trips, table = polars_frames(ds, lazy)
+    return polars_collect(trips.join(table("zones"), left_on=ds.column("pickup_location"), right_on="zone_id"))
+
+
+def polars_left_dimensions(ds, lazy):
+    trips, table = polars_frames(ds, lazy)
+    zones = table("zones").select("zone_id", "zone", "borough")
+    pickup = zones.select(pl.all().name.prefix("pickup_"))
+    dropoff = zones.select(pl.all().name.prefix("dropoff_"))
+    return polars_collect(
+        trips.with_columns(pl.col(ds.time_column).dt.date().alias("date"))
+        .join(pickup, how="left", left_on=ds.column("pickup_location"), right_on="pickup_zone_id")
+        .join(dropoff, how="left", left_on=ds.column("dropoff_location"), right_on="dropoff_zone_id")
+        .join(table("vendors"), how="left", left_on=ds.column("vendor"), right_on="vendor_id", coalesce=False,
+              suffix="_dim")
+        .join(table("calendar"), how="left", on="date")
+    )
+
+
+def polars_semi_manhattan(ds, lazy):
+    trips, table = polars_frames(ds, lazy)
+    manhattan = table("zones").filter(pl.col("borough") == "Manhattan")
+    return polars_collect(
+        trips.join(manhattan, how="semi", left_on=ds.column("pickup_location"), right_on="zone_id")
+    )
+
+
+def polars_anti_yellow_zone(ds, lazy):
+    trips, table = polars_frames(ds, lazy)
+    yellow = table("zones").filter(pl.col("service_zone") == "Yellow Zone")
+    return polars_collect(
+        trips.join(yellow, how="anti", left_on=ds.column("dropoff_location"), right_on="zone_id")
+    )
+
+
+def polars_skewed_keys(ds, lazy):
+    trips, table = polars_frames(ds, lazy)
+    return polars_collect(
+        trips.join(table("zone_events"), left_on=ds.column("pickup_location"), right_on="zone_id")
+        .group_by("event_type")
+        .agg(pl.len().alias("trips"), (pl.col("total_amount") * pl.col("weight")).sum().alias("weighted_amount"))
+    )
+
+
+def polars_fact_to_fact(ds, lazy):
+    read = pl.scan_parquet if lazy else pl.read_parquet
+    trips = read(table_path(ds, "trips")).select("trip_id", "total_amount", "trip_distance")
+    return polars_collect(
+        trips.join(read(table_path(ds, "payments")), on="trip_id")
+        .group_by("payment_method")
+        .agg(
+            pl.len().alias("trips"),
+            (pl.col("amount") - pl.col("total_amount")).sum().alias("difference"),
+            pl.col("trip_distance").mean(),
+        ),
+        engine="streaming",
+    )
+
+
+### DuckDB
+def sql_fact(ds):
+    return f"(SELECT {', '.join(fact_columns(ds))} FROM {ds.sql_source})"
+
+
+def duckdb_inner_zones(ds):
+    return con.execute(f"""
+        SELECT *
+        FROM {sql_fact(ds)} t
+        JOIN {sql_table(ds, "zones")} z ON t.{ds.column("pickup_location")} = z.zone_id
+    """)
+
+
+def duckdb_left_dimensions(ds):
+    return con.execute(f"""
+        SELECT t.*, pu.zone AS pickup_zone, pu.borough AS pickup_borough,
+               dz.zone AS dropoff_zone, dz.borough AS dropoff_borough, v.vendor_name, c.*
+        FROM {sql_fact(ds)} t
+        LEFT JOIN {sql_table(ds, "zones")} pu ON t.{ds.column("pickup_location")} = pu.zone_id
+        LEFT JOIN {sql_table(ds, "zones")} dz ON t.{ds.column("dropoff_location")} = dz.zone_id
+        LEFT JOIN {sql_table(ds, "vendors")} v ON t.{ds.column("vendor")} = v.vendor_id
+        LEFT JOIN {sql_table(ds, "calendar")} c ON CAST(t.{ds.time_column} AS DATE) = c.date
+    """)
+
+
+def duckdb_semi_manhattan(ds):
+    return con.execute(f"""
+        SELECT t.*
+        FROM {sql_fact(ds)} t
+        SEMI JOIN (SELECT zone_id FROM {sql_table(ds, "zones")} WHERE borough = 'Manhattan') z
+            ON t.{ds.column("pickup_location")} = z.zone_id
+    """)
+
+
+def duckdb_anti_yellow_zone(ds):
+    return con.execute(f"""
+        SELECT t.*
+        FROM {sql_fact(ds)} t
+        ANTI JOIN (SELECT zone_id FROM {sql_table(ds, "zones")} WHERE service_zone = 'Yellow Zone') z
+            ON t.{ds.column("dropoff_location")} = z.zone_id
+    """)
+
+
+def duckdb_skewed_keys(ds):
+    return con.execute(f"""
+        SELECT e.event_type, count(*) AS trips, sum(t.total_amount * e.weight) AS weighted_amount
+        FROM {ds.sql_source} t
+        JOIN {sql_table(ds, "zone_events")} e ON t.{ds.column("pickup_location")} = e.zone_id
+        GROUP BY ALL
+    """)
+
+
+def duckdb_fact_to_fact(ds):
+    return con.execute(f"""
+        SELECT p.payment_method, count(*) AS trips, sum(p.amount - t.total_amount) AS difference,
+               avg(t.trip_distance) AS trip_distance
+        FROM {sql_table(ds, "trips")} t
+        JOIN {sql_table(ds, "payments")} p USING (trip_id)
+        GROUP BY ALL
+    """)
+
+
+### Registering the Polars and DuckDB cases of every workload
+POLARS_WORKLOADS = {
+    "inner_zones": polars_inner_zones,
+    "left_dimensions": polars_left_dimensions,
+    "semi_manhattan": polars_semi_manhattan,
+    "anti_yellow_zone": polars_anti_yellow_zone,
+    "skewed_keys": polars_skewed_keys,
+    "fact_to_fact": polars_fact_to_fact,
+}
+DUCKDB_WORKLOADS = {
+    "inner_zones": duckdb_inner_zones,
+    "left_dimensions": duckdb_left_dimensions,
+    "semi_manhattan": duckdb_semi_manhattan,
+    "anti_yellow_zone": duckdb_anti_yellow_zone,
+    "skewed_keys": duckdb_skewed_keys,
+    "fact_to_fact": duckdb_fact_to_fact,
+}
+for workload, func in POLARS_WORKLOADS.items():
+    registry.register(SUITE, workload, "polars", lambda ds, func=func: func(ds, lazy=False), bm.POLARS,
+                      prepare=join_inputs)
+    registry.register(SUITE, workload, "polars_lazy", lambda ds, func=func: func(ds, lazy=True), bm.POLARS,
+                      prepare=join_inputs)
+
+
+def fact_to_fact_memory_limit(ds):
+    return max(FACT_TO_FACT_MIN_LIMIT, ds.num_rows * FACT_TO_FACT_BYTES_PER_ROW)
+
+
+def suite_memory_limit(ds):
+    return executor.parse_size(MEMORY_LIMIT) if MEMORY_LIMIT else None
+
+
+# The cases share `con`, so each one sets its own memory limit (`memory_limit(ds)`, bytes) before its query. Under
+# `--memory-cap` the limit `executor.set_memory_cap` derived from the cap is kept when it is lower.
+def with_memory_limit(func, memory_limit):
+    def run(ds):
+        limits = [limit for limit in (memory_limit(ds), executor.duckdb_cap_limit()) if limit]
+        con.execute(f"SET memory_limit = '{min(limits)}B'" if limits else "RESET memory_limit")
+        return func(ds)
+    return run
+
+
+for workload, func in DUCKDB_WORKLOADS.items():
+    memory_limit = fact_to_fact_memory_limit if workload == "fact_to_fact" else suite_memory_limit
+    registry.register(SUITE, workload, "duckdb", with_memory_limit(func, memory_limit), bm.ARROW,
+                      prepare=join_inputs)
+
+
+# Fact rows joined per second and DuckDB's spill, printed by `main.py run` after the timings
+def throughput(results):
+    rows = []
+    for result in results:
+        if result.timing is None:
+            continue
+        memory = result.timing.memory.summary() if result.timing.memory else {}
+        rows.append({
+            "Workload": result.case.workload,
+            "Dataset": result.dataset.name,
+            "Engine": result.label,
+            "Fact Rows (M)": result.dataset.num_rows / 1e6,
+            "Median (s)": result.timing.median,
+            "Throughput (M rows/s)": result.dataset.num_rows / 1e6 / result.timing.median,
+            "Peak RSS (MB)": memory.get("Peak RSS (MB)"),
+            "DuckDB Spill (MB)": memory.get("DuckDB Spill (MB)"),
+        })
+    return pd.DataFrame(rows)
+
+
+registry.register_report(SUITE, throughput)
+
+
+if __name__ == "__main__":
+    ### Run benchmarks
+    results = registry.run_cases(registry.select(suites=[SUITE]), registry.get_datasets(TITLES), runs=REPEAT_TIMES)
+    print(throughput(results))
+
+    ### Plotting results for each join
+    for (_, workload, dataset), timings in registry.group_results(results).items():
+        bm.plot_results(timings, f"{TITLES[dataset]}: {workload}", f"speed_join_{workload}_{dataset}.png")
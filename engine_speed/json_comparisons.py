@@ -0,0 +1,323 @@
+import json
+import os
+from functools import cache
+
+import duckdb
+import pandas as pd
+import polars as pl
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.json as pj
+
+import benchmark as bm
+import registry
+from registry import case
+
+'''
+Semi-structured ingestion: reading nested JSON with Pandas, Polars (eager and lazy), PyArrow and DuckDB.
+
+The inputs are the two samples in `data/`, replicated to `<dataset rows> / TRIPS_PER_RECORD` records each, so the
+JSON inputs grow with the taxi dataset they are run on (about 1GB of events per 1M records, so the `synthetic_<N>m`
+datasets give multi-GB inputs). They are written once per dataset under `data/json/<dataset>/` before the first run,
+and rewritten when the samples or the source files change:
+- `wikimedia.ndjson`: recentchange events, one per line, with the nested `meta`, `length` and `revision` objects
+- `pokedex.ndjson`: one pokemon per line, with list fields (`type`, `weaknesses`, `next_evolution`, ...)
+- `pokedex.json`: the same pokemon as one document, a top-level `pokemon` array like the sample
+
+Every engine infers the schema itself, so the column types differ slightly (e.g. Pandas and PyArrow parse
+timestamps that Polars and DuckDB keep as strings or integers).
+
+Workloads:
+- `events_read`: every event into a DataFrame, nested objects kept as structs (dicts in Pandas). Pandas reads with
+  `read_json(lines=True, chunksize=CHUNK_ROWS)`.
+- `events_flatten`: struct flattening, every nested field as a `<object>_<field>` column
+- `events_project`: a few nested fields only (`meta.domain`, `meta.dt`, `length.new`) and the title
+- `pokedex_explode`: list explode, one row per pokemon and weakness
+- `pokedex_document`: the pokemon array of the document form as rows (PyArrow reads only newline-delimited JSON)
+
+Peak memory is recorded with every case; MB and records read per second are printed after the timings
+(`throughput`).
+
+Variables:
+- `SUITE`: Name of the suite in the registry.
+- `JSON_DIR`: Where the replicated inputs are written.
+- `SAMPLES`: The bundled samples the inputs are replicated from.
+- `TRIPS_PER_RECORD`: Taxi dataset rows per replicated JSON record.
+- `CHUNK_ROWS`: Lines per chunk of Pandas' chunked reader.
+- `INPUTS`: Input file of each workload.
+- `REPEAT_TIMES`: Number of times each function will be run when this file is run as a script.
+- `con`: DuckDB connection object for executing SQL queries.
+'''
+
+# parameters
+SUITE = "json"
+JSON_DIR = "data/json"
+SAMPLES = {"wikimedia": "data/wikimedia.ndjson", "pokedex": "data/pokedex.json"}
+TRIPS_PER_RECORD = 10
+CHUNK_ROWS = 100_000
+INPUTS = {
+    "events_read": "wikimedia.ndjson",
+    "events_flatten": "wikimedia.ndjson",
+    "events_project": "wikimedia.ndjson",
+    "pokedex_explode": "pokedex.ndjson",
+    "pokedex_document": "pokedex.json",
+}
+REPEAT_TIMES = 3
+TITLES = {"single": "Single File", "multi": "Multiple Files"}
+
+# init
+con = duckdb.connect()
+
+
+### Generating the inputs
+# One JSON string per record of each sample
+@cache
+def sample_records():
+    with open(SAMPLES["wikimedia"]) as f:
+        events = [line.strip() for line in f if line.strip()]
+    with open(SAMPLES["pokedex"]) as f:
+        pokemon = [json.dumps(p) for p in json.load(f)["pokemon"]]
+    return {"wikimedia": events, "pokedex": pokemon}
+
+
+def record_count(ds):
+    return max(1, ds.num_rows // TRIPS_PER_RECORD)
+
+
+# `count` records, cycling through `records`, joined by `separator`
+def _write_replicated(f, records, count, separator):
+    copies, rest = divmod(count, len(records))
+    block = separator.join(records)
+    for i in range(copies):
+        f.write(block if i == 0 else separator + block)
+    if rest:
+        f.write((separator if copies else "") + separator.join(records[:rest]))
+
+
+def _write_inputs(ds, directory):
+    records, count = sample_records(), record_count(ds)
+    with open(os.path.join(directory, "wikimedia.ndjson"), "w") as f:
+        _write_replicated(f, records["wikimedia"], count, "\n")
+        f.write("\n")
+    with open(os.path.join(directory, "pokedex.ndjson"), "w") as f:
+        _write_replicated(f, records["pokedex"], count, "\n")
+        f.write("\n")
+    with open(os.path.join(directory, "pokedex.json"), "w") as f:
+        f.write('{"pokemon": [')
+        _write_replicated(f, records["pokedex"], count, ", ")
+        f.write("]}\n")
+
+
+# Directory of the JSON inputs of a dataset; rewritten when the samples or the source files are newer
+@cache
+def json_inputs(ds):
+    return registry.staged_path(
+        ds, os.path.join(JSON_DIR, ds.name), lambda directory: _write_inputs(ds, directory),
+        sources=SAMPLES.values(), directory=True,
+    )
+
+
+def input_path(ds, name):
+    return os.path.join(json_inputs(ds), name)
+
+
+# {object: [field, ...]} of the nested objects of the events
+@cache
+def event_structs():
+    event = json.loads(sample_records()["wikimedia"][0])
+    return {key: list(value) for key, value in event.items() if isinstance(value, dict)}
+
+
+### Reading every event
+def pandas_events(ds):
+    with pd.read_json(input_path(ds, "wikimedia.ndjson"), lines=True, chunksize=CHUNK_ROWS) as reader:
+        return pd.concat(reader, ignore_index=True)
+
+@case(SUITE, "events_read", "pandas", bm.PANDAS, prepare=json_inputs)
+def pandas_events_read(ds):
+    return pandas_events(ds)
+
+@case(SUITE, "events_read", "polars", bm.POLARS, prepare=json_inputs)
+def polars_events_read(ds):
+    return pl.read_ndjson(input_path(ds, "wikimedia.ndjson"))
+
+@case(SUITE, "events_read", "polars_lazy", bm.POLARS, prepare=json_inputs)
+def polars_lazy_events_read(ds):
+    return pl.scan_ndjson(input_path(ds, "wikimedia.ndjson")).collect()
+
+@case(SUITE, "events_read", "pyarrow", bm.ARROW, prepare=json_inputs)
+def pyarrow_events_read(ds):
+    return pj.read_json(input_path(ds, "wikimedia.ndjson"))
+
+@case(SUITE, "events_read", "duckdb", bm.ARROW, prepare=json_inputs)
+def duckdb_events_read(ds):
+    return con.execute(f"SELECT * FROM read_json_auto('{input_path(ds, 'wikimedia.ndjson')}')")
+
+
+### Struct flattening: <object>_<field> columns
+@case(SUITE, "events_flatten", "pandas", bm.PANDAS, prepare=json_inputs)
+def pandas_events_flatten(ds):
+    with pd.read_json(input_path(ds, "wikimedia.ndjson"), lines=True, chunksize=CHUNK_ROWS) as reader:
+        return pd.concat([pd.json_normalize(chunk.to_dict("records"), sep="_") for chunk in reader], ignore_index=True)
+
+def polars_flatten(lf):
+    structs = list(event_structs())
+    return lf.select(
+        pl.exclude(structs), *[pl.col(name).name.prefix_fields(f"{name}_").struct.unnest() for name in structs],
+    )
+
+@case(SUITE, "events_flatten", "polars", bm.POLARS, prepare=json_inputs)
+def polars_events_flatten(ds):
+    return polars_flatten(pl.read_ndjson(input_path(ds, "wikimedia.ndjson")).lazy()).collect()
+
+@case(SUITE, "events_flatten", "polars_lazy", bm.POLARS, prepare=json_inputs)
+def polars_lazy_events_flatten(ds):
+    return polars_flatten(pl.scan_ndjson(input_path(ds, "wikimedia.ndjson"))).collect()
+
+@case(SUITE, "events_flatten", "pyarrow", bm.ARROW, prepare=json_inputs)
+def pyarrow_events_flatten(ds):
+    table = pj.read_json(input_path(ds, "wikimedia.ndjson")).flatten()
+    return table.rename_columns([name.replace(".", "_") for name in table.column_names])
+
+@case(SUITE, "events_flatten", "duckdb", bm.ARROW, prepare=json_inputs)
+def duckdb_events_flatten(ds):
+    structs = event_structs()
+    fields = ", ".join(f'"{name}"."{field}" AS "{name}_{field}"' for name, names in structs.items() for field in names)
+    return con.execute(f"""
+        SELECT * EXCLUDE ({", ".join(structs)}), {fields}
+        FROM read_json_auto('{input_path(ds, "wikimedia.ndjson")}')
+    """)
+
+
+### Projection of nested fields
+@case(SUITE, "events_project", "pandas", bm.PANDAS, prepare=json_inputs)
+def pandas_events_project(ds):
+    chunks = []
+    with pd.read_json(input_path(ds, "wikimedia.ndjson"), lines=True, chunksize=CHUNK_ROWS) as reader:
+        for chunk in reader:
+            chunks.append(pd.DataFrame({
+                "title": chunk["title"],
+                "domain": chunk["meta"].str["domain"],
+                "dt": chunk["meta"].str["dt"],
+                "length_new": chunk["length"].str["new"],
+            }))
+    return pd.concat(chunks, ignore_index=True)
+
+def polars_projection():
+    return [
+        pl.col("title"),
+        pl.col("meta").struct.field("domain"),
+        pl.col("meta").struct.field("dt"),
+        pl.col("length").struct.field("new").alias("length_new"),
+    ]
+
+@case(SUITE, "events_project", "polars", bm.POLARS, prepare=json_inputs)
+def polars_events_project(ds):
+    return pl.read_ndjson(input_path(ds, "wikimedia.ndjson")).select(polars_projection())
+
+@case(SUITE, "events_project", "polars_lazy", bm.POLARS, prepare=json_inputs)
+def polars_lazy_events_project(ds):
+    return pl.scan_ndjson(input_path(ds, "wikimedia.ndjson")).select(polars_projection()).collect()
+
+@case(SUITE, "events_project", "pyarrow", bm.ARROW, prepare=json_inputs)
+def pyarrow_events_project(ds):
+    table = pj.read_json(input_path(ds, "wikimedia.ndjson"))
+    return pa.table({
+        "title": table["title"],
+        "domain": pc.struct_field(table["meta"], "domain"),
+        "dt": pc.struct_field(table["meta"], "dt"),
+        "length_new": pc.struct_field(table["length"], "new"),
+    })
+
+@case(SUITE, "events_project", "duckdb", bm.ARROW, prepare=json_inputs)
+def duckdb_events_project(ds):
+    return con.execute(f"""
+        SELECT title, meta.domain AS domain, meta.dt AS dt, length.new AS length_new
+        FROM read_json_auto('{input_path(ds, "wikimedia.ndjson")}')
+    """)
+
+
+### List explode: one row per pokemon and weakness
+@case(SUITE, "pokedex_explode", "pandas", bm.PANDAS, prepare=json_inputs)
+def pandas_pokedex_explode(ds):
+    with pd.read_json(input_path(ds, "pokedex.ndjson"), lines=True, chunksize=CHUNK_ROWS) as reader:
+        return pd.concat([chunk[["name", "weaknesses"]].explode("weaknesses") for chunk in reader], ignore_index=True)
+
+@case(SUITE, "pokedex_explode", "polars", bm.POLARS, prepare=json_inputs)
+def polars_pokedex_explode(ds):
+    return pl.read_ndjson(input_path(ds, "pokedex.ndjson")).select("name", "weaknesses").explode("weaknesses")
+
+@case(SUITE, "pokedex_explode", "polars_lazy", bm.POLARS, prepare=json_inputs)
+def polars_lazy_pokedex_explode(ds):
+    return pl.scan_ndjson(input_path(ds, "pokedex.ndjson")).select("name", "weaknesses").explode("weaknesses").collect()
+
+@case(SUITE, "pokedex_explode", "pyarrow", bm.ARROW, prepare=json_inputs)
+def pyarrow_pokedex_explode(ds):
+    table = pj.read_json(input_path(ds, "pokedex.ndjson"))
+    weaknesses = table["weaknesses"]
+    return pa.table({
+        "name": pc.take(table["name"], pc.list_parent_indices(weaknesses)),
+        "weaknesses": pc.list_flatten(weaknesses),
+    })
+
+@case(SUITE, "pokedex_explode", "duckdb", bm.ARROW, prepare=json_inputs)
+def duckdb_pokedex_explode(ds):
+    return con.execute(f"""
+        SELECT name, unnest(weaknesses) AS weaknesses
+        FROM read_json_auto('{input_path(ds, "pokedex.ndjson")}')
+    """)
+
+
+### The document form: a top-level pokemon array
+@case(SUITE, "pokedex_document", "pandas", bm.PANDAS, prepare=json_inputs)
+def pandas_pokedex_document(ds):
+    with open(input_path(ds, "pokedex.json")) as f:
+        return pd.DataFrame.from_records(json.load(f)["pokemon"])
+
+@case(SUITE, "pokedex_document", "polars", bm.POLARS, prepare=json_inputs)
+def polars_pokedex_document(ds):
+    return pl.read_json(input_path(ds, "pokedex.json")).explode("pokemon").unnest("pokemon")
+
+@case(SUITE, "pokedex_document", "duckdb", bm.ARROW, prepare=json_inputs)
+def duckdb_pokedex_document(ds):
+    path = input_path(ds, "pokedex.json")
+    # the whole document is one JSON object, larger than DuckDB's default 16MB object limit
+    return con.execute(f"""
+        SELECT unnest(pokemon, max_depth := 2)
+        FROM read_json_auto('{path}', maximum_object_size = {os.path.getsize(path) + 1})
+    """)
+
+
+# MB and records read per second of every case, printed by `main.py run` after the timings
+def throughput(results):
+    rows = []
+    for result in results:
+        if result.timing is None:
+            continue
+        memory = result.timing.memory.summary() if result.timing.memory else {}
+        input_mb = os.path.getsize(input_path(result.dataset, INPUTS[result.case.workload])) / bm.MB
+        rows.append({
+            "Workload": result.case.workload,
+            "Dataset": result.dataset.name,
+            "Engine": result.label,
+            "Input (MB)": input_mb,
+            "Records (M)": record_count(result.dataset) / 1e6,
+            "Median (s)": result.timing.median,
+            "Throughput (MB/s)": input_mb / result.timing.median,
+            "Throughput (M records/s)": record_count(result.dataset) / 1e6 / result.timing.median,
+            "Peak RSS (MB)": memory.get("Peak RSS (MB)"),
+        })
+    return pd.DataFrame(rows)
+
+
+registry.register_report(SUITE, throughput)
+
+
+if __name__ == "__main__":
+    ### Run benchmarks
+    results = registry.run_cases(registry.select(suites=[SUITE]), registry.get_datasets(TITLES), runs=REPEAT_TIMES)
+    print(throughput(results))
+
+    ### Plotting results for each workload
+    for (_, workload, dataset), timings in registry.group_results(results).items():
+        bm.plot_results(timings, f"{TITLES[dataset]}: {workload}", f"speed_json_{workload}_{dataset}.png")
@@ -0,0 +1,202 @@
+import itertools
+import os
+from dataclasses import dataclass, replace
+
+import duckdb
+import matplotlib.pyplot as plt
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import seaborn as sns
+
+import registry
+
+'''
+Parquet layout sweep: how row group size, compression, dictionary encoding, statistics and sort order change the
+read and filter benchmarks downstream.
+
+Each layout rewrites every file of a source dataset (file by file, so multi-file datasets keep their files) into
+`data/layouts/<dataset>/<layout tag>/` and registers the copy as a dataset, then the selected cases (by default the filter
+workloads of `read_filter` and the `pushdown` suite) run on every variant. Rewrites are cached: a variant directory
+that already exists is reused, delete it (or pass `overwrite`) after changing the source.
+
+By default the sweep changes one setting at a time from `BASELINE`; `full_grid` runs the whole cartesian product
+(3 x 4 x 2 x 2 x 3 = 144 variants with the default values, so narrow the values down first).
+
+Sort orders:
+- `source`: rows in the order of the source file (the taxi files are already roughly sorted by pickup time)
+- `sorted`: sorted by the dataset's time column, so min/max statistics of consecutive row groups do not overlap
+- `random`: deterministically shuffled, so every row group spans the whole time range
+
+Usage:
+    python main.py layout-sweep --source synthetic_single
+    python main.py layout-sweep --source synthetic_multi --compression zstd none --order source sorted --full-grid
+
+Variables:
+- `OUTPUT_DIR`: Where the rewritten variants are written.
+- `ROW_GROUP_SIZES`, `COMPRESSIONS`, `DICTIONARY`, `STATISTICS`, `ORDERS`: Default values of each layout setting.
+- `BASELINE`: Layout the one-at-a-time sweep starts from (the pyarrow defaults with 1M row groups).
+- `DEFAULT_WORKLOADS`: Workloads rerun on every variant when none are selected.
+- `BATCH_ROWS`: Rows per batch streamed from the source into the writer.
+'''
+
+OUTPUT_DIR = "data/layouts"
+ROW_GROUP_SIZES = [10_000, 100_000, 1_000_000]
+COMPRESSIONS = ["snappy", "zstd", "lz4", "none"]
+DICTIONARY = [True, False]
+STATISTICS = [True, False]
+ORDERS = ["source", "sorted", "random"]
+DEFAULT_WORKLOADS = ["filter_all", "filter_one", "filter_count", "full_scan", "projection_pushdown",
+                     "filter_pushdown", "filter_and_projection_pushdown"]
+BATCH_ROWS = 250_000
+
+
+@dataclass(frozen=True)
+class Layout:
+    row_group_size: int = 1_000_000
+    compression: str = "snappy"
+    dictionary: bool = True
+    statistics: bool = True
+    order: str = "source"
+
+    @property
+    def tag(self):
+        return (
+            f"rg{self.row_group_size}_{self.compression}"
+            f"_{'dict' if self.dictionary else 'nodict'}"
+            f"_{'stats' if self.statistics else 'nostats'}"
+            f"_{self.order}"
+        )
+
+
+BASELINE = Layout()
+
+
+def layouts(full_grid=False, row_group_sizes=None, compressions=None, dictionary=None, statistics=None, orders=None):
+    values = {
+        "row_group_size": row_group_sizes or ROW_GROUP_SIZES,
+        "compression": compressions or COMPRESSIONS,
+        "dictionary": dictionary or DICTIONARY,
+        "statistics": statistics or STATISTICS,
+        "order": orders or ORDERS,
+    }
+    if full_grid:
+        return [Layout(*combination) for combination in itertools.product(*values.values())]
+    # one setting at a time from the baseline
+    variants = [BASELINE]
+    for name, options in values.items():
+        for option in options:
+            variant = replace(BASELINE, **{name: option})
+            if variant not in variants:
+                variants.append(variant)
+    return variants
+
+
+def _batches(path, time_column, order):
+    if order == "source":
+        parquet_file = pq.ParquetFile(path)
+        return parquet_file.schema_arrow, parquet_file.iter_batches(batch_size=BATCH_ROWS)
+    if order == "sorted":
+        order_by = time_column
+    elif order == "random":
+        order_by = f"hash({time_column}, total_amount)"
+    else:
+        raise ValueError(f"Unknown order {order!r}, expected one of {ORDERS}")
+    # DuckDB sorts out of core, and the batches are written by pyarrow with the layout's settings
+    con = duckdb.connect()
+    reader = con.execute(f"SELECT * FROM read_parquet('{path}') ORDER BY {order_by}").fetch_record_batch(BATCH_ROWS)
+    return reader.schema, reader
+
+
+# Stream batches into a ParquetWriter, buffering so every row group (but the last) has exactly row_group_size rows;
+# `writer_options` go to the ParquetWriter (compression, dictionary, statistics)
+def write_row_groups(target, schema, batches, row_group_size, **writer_options):
+    buffered, buffered_rows = [], 0
+    with pq.ParquetWriter(target, schema, **writer_options) as writer:
+        for batch in batches:
+            buffered.append(batch)
+            buffered_rows += batch.num_rows
+            if buffered_rows >= row_group_size:
+                table = pa.Table.from_batches(buffered, schema)
+                full = buffered_rows // row_group_size * row_group_size
+                writer.write_table(table.slice(0, full), row_group_size=row_group_size)
+                rest = table.slice(full)
+                buffered, buffered_rows = rest.to_batches(), rest.num_rows
+        if buffered_rows:
+            writer.write_table(pa.Table.from_batches(buffered, schema), row_group_size=row_group_size)
+
+
+def write_variant(dataset, layout, output_dir=OUTPUT_DIR, overwrite=False):
+    directory = os.path.join(output_dir, dataset.name, layout.tag)
+    os.makedirs(directory, exist_ok=True)
+    for path in dataset.files:
+        target = os.path.join(directory, os.path.basename(path))
+        if os.path.exists(target) and not overwrite:
+            continue
+        # written under a `.partial` name and renamed, so an interrupted rewrite is never reused
+        partial = f"{target}.partial"
+        schema, batches = _batches(path, dataset.time_column, layout.order)
+        write_row_groups(
+            partial, schema, batches, layout.row_group_size, compression=layout.compression,
+            use_dictionary=layout.dictionary, write_statistics=layout.statistics,
+        )
+        os.replace(partial, target)
+    return registry.register_dataset(
+        f"{dataset.name}_{layout.tag}", os.path.join(directory, "*.parquet"), dataset.time_column, dataset.cutoff,
+        f"{dataset.name} rewritten as {layout.tag}",
+    )
+
+
+def dataset_size(dataset):
+    return sum(os.path.getsize(path) for path in dataset.files)
+
+
+# Rewrite `source` in every layout and run `cases` on each variant; returns the results and a layout table
+def run_sweep(source, cases, variants, run=None, output_dir=OUTPUT_DIR, overwrite=False, **run_kwargs):
+    run = run or registry.run_cases
+    results, rows = [], []
+    for layout in variants:
+        print(f"\nLayout {layout.tag}")
+        variant = write_variant(source, layout, output_dir, overwrite)
+        rows.append({"Dataset": variant.name, **layout.__dict__, "Size (MB)": dataset_size(variant) / 1024 ** 2})
+        results.extend(run(cases, [variant], **run_kwargs))
+    return results, pd.DataFrame(rows)
+
+
+# Median per layout (rows) and engine (columns) for each workload
+def summary(results, layout_table):
+    records = [
+        {"Dataset": r.dataset.name, "Workload": r.case.workload, "Suite": r.case.suite, "Engine": r.label,
+         "Median (s)": r.timing.median}
+        for r in results if r.timing is not None
+    ]
+    if not records:
+        return pd.DataFrame()
+    df = pd.DataFrame(records).merge(layout_table, on="Dataset")
+    layout_columns = ["row_group_size", "compression", "dictionary", "statistics", "order", "Size (MB)"]
+    return df.pivot_table(
+        index=["Suite", "Workload", *layout_columns], columns="Engine", values="Median (s)",
+    ).reset_index()
+
+
+def plot_sweep(results, layout_table, filename_prefix="speed_layout_sweep", show=False):
+    df = summary(results, layout_table)
+    engines = [column for column in df.columns if column not in
+               ("Suite", "Workload", "row_group_size", "compression", "dictionary", "statistics", "order", "Size (MB)")]
+    for (suite, workload), group in df.groupby(["Suite", "Workload"]):
+        long = group.assign(
+            Layout=group.apply(
+                lambda r: Layout(r.row_group_size, r.compression, r.dictionary, r.statistics, r.order).tag, axis=1,
+            )
+        ).melt(id_vars=["Layout"], value_vars=engines, var_name="Engine", value_name="Time (s)").dropna()
+        plt.figure(figsize=(14, 8))
+        ax = sns.barplot(long, x="Layout", y="Time (s)", hue="Engine", palette="pastel")
+        ax.tick_params(axis="x", labelrotation=45)
+        for tick in ax.get_xticklabels():
+            tick.set_horizontalalignment("right")
+        plt.title(f"Parquet Layout Sweep: {suite} / {workload}")
+        plt.tight_layout()
+        plt.savefig(f"images/{filename_prefix}_{suite}_{workload}.png")
+        if show:
+            plt.show()
+        plt.close()
@@ -0,0 +1,188 @@
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import duckdb
+import matplotlib.pyplot as plt
+import numpy as np
+import polars as pl
+import seaborn as sns
+
+import benchmark as bm
+
+'''
+Concurrent query load: queries per second and latency percentiles as the number of concurrent clients grows.
+
+Each client is a closed loop: it sends a query, waits for the whole result, and sends the next one until `duration`
+seconds have passed. Every query's latency is recorded, and the clients of one level all start together. The queries
+are the dashboard-style workloads of the read_filter and groupby suites, run straight on the dataset's Parquet files:
+- `filter_count`: rows after the time column cutoff
+- `filter_one`: the time column of the rows after the cutoff
+- `aggregate`: trips and mean total_amount per passenger_count
+
+How the clients share the engine (`MODES`):
+- `duckdb_shared`: one connection for every thread. A DuckDB connection holds one pending result, so each query and
+  its fetch run under a lock, as an application sharing one connection has to.
+- `duckdb_cursor`: one `con.cursor()` per thread, all on the same database
+- `duckdb_pool`: a pool of `pool_size` cursors, checked out for each query
+- `polars_threads`: Polars lazy queries collected from every thread, all sharing Polars' global thread pool
+- `duckdb_processes` and `polars_processes`: one spawned process per client, each with its own connection or Polars
+  pool, for comparison with the thread modes (e.g. API workers as separate processes)
+
+Variables:
+- `QUERIES`: Query names.
+- `MODES`: Ways of sharing the engine between clients.
+- `DEFAULT_CONCURRENCY`: Client counts of the default sweep.
+- `DEFAULT_DURATION`: Seconds each client keeps sending queries at each level.
+'''
+
+QUERIES = ["filter_count", "filter_one", "aggregate"]
+MODES = ["duckdb_shared", "duckdb_cursor", "duckdb_pool", "polars_threads", "duckdb_processes", "polars_processes"]
+DEFAULT_CONCURRENCY = [1, 2, 4, 8, 16]
+DEFAULT_DURATION = 10.0
+
+
+def sql(query, ds):
+    if query == "filter_count":
+        return f"SELECT count(*) FROM {ds.sql_source} WHERE {ds.sql_filter}"
+    if query == "filter_one":
+        return f"SELECT {ds.time_column} FROM {ds.sql_source} WHERE {ds.sql_filter}"
+    return f"""
+        SELECT passenger_count, count(*) AS trips, avg(total_amount) AS total_amount_mean
+        FROM {ds.sql_source}
+        GROUP BY ALL
+    """
+
+
+def polars_plan(query, ds):
+    lf = pl.scan_parquet(ds.source)
+    if query == "filter_count":
+        return lf.filter(pl.col(ds.time_column) > ds.cutoff).select(pl.len())
+    if query == "filter_one":
+        return lf.select(ds.time_column).filter(pl.col(ds.time_column) > ds.cutoff)
+    return lf.group_by("passenger_count").agg(
+        pl.len().alias("trips"), pl.col("total_amount").mean().alias("total_amount_mean"),
+    )
+
+
+# A factory of per-client query functions for a thread mode; each call to the factory is one client
+def client_factory(mode, query, ds, pool_size=None):
+    statement = sql(query, ds)
+    if mode == "polars_threads":
+        plan = polars_plan(query, ds)
+        return lambda: plan.collect
+    con = duckdb.connect()
+    if mode == "duckdb_shared":
+        lock = threading.Lock()
+
+        def shared():
+            with lock:
+                return bm.materialize(con.execute(statement), bm.ARROW)
+        return lambda: shared
+    if mode == "duckdb_cursor":
+        def client():
+            cursor = con.cursor()
+            return lambda: bm.materialize(cursor.execute(statement), bm.ARROW)
+        return client
+    if mode == "duckdb_pool":
+        pool = queue.Queue()
+        for _ in range(pool_size or 4):
+            pool.put(con.cursor())
+
+        def pooled():
+            cursor = pool.get()
+            try:
+                return bm.materialize(cursor.execute(statement), bm.ARROW)
+            finally:
+                pool.put(cursor)
+        return lambda: pooled
+    raise ValueError(f"Unknown mode {mode!r}, expected one of {MODES}")
+
+
+# Send queries until `deadline`, returns the latencies in seconds
+def _client_loop(run_query, start, deadline):
+    while time.perf_counter() < start:
+        time.sleep(0.001)
+    latencies = []
+    while time.perf_counter() < deadline:
+        began = time.perf_counter()
+        run_query()
+        latencies.append(time.perf_counter() - began)
+    return latencies
+
+
+# One client in its own process: its own connection or Polars pool, one warmup query, then the loop
+def _process_client(mode, query, ds, start_in, duration):
+    if mode == "duckdb_processes":
+        con = duckdb.connect()
+        statement = sql(query, ds)
+        run_query = lambda: bm.materialize(con.execute(statement), bm.ARROW)
+    else:
+        run_query = polars_plan(query, ds).collect
+    run_query()
+    # perf_counter is not shared between processes, the start is agreed on the wall clock
+    start = time.perf_counter() + (start_in - time.time())
+    return _client_loop(run_query, start, start + duration)
+
+
+# Latencies of `concurrency` clients running `query` for `duration` seconds
+def run_level(mode, query, ds, concurrency, duration=DEFAULT_DURATION, pool_size=None):
+    if mode.endswith("_processes"):
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=concurrency, mp_context=context) as pool:
+            # the processes need time to start and import the engines before the common start
+            start_at = time.time() + 5 + concurrency
+            futures = [pool.submit(_process_client, mode, query, ds, start_at, duration) for _ in range(concurrency)]
+            return [latency for future in futures for latency in future.result()]
+    factory = client_factory(mode, query, ds, pool_size)
+    clients = [factory() for _ in range(concurrency)]
+    clients[0]()  # warmup: metadata and file cache
+    start = time.perf_counter() + 0.1
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(_client_loop, client, start, start + duration) for client in clients]
+        return [latency for future in futures for latency in future.result()]
+
+
+def summarize(latencies, duration):
+    latencies = np.asarray(latencies)
+    if not len(latencies):
+        return {"Queries": 0, "QPS": 0.0, "p50 (ms)": None, "p95 (ms)": None, "p99 (ms)": None}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {"Queries": len(latencies), "QPS": len(latencies) / duration, "p50 (ms)": p50, "p95 (ms)": p95,
+            "p99 (ms)": p99}
+
+
+# Every (mode, query, dataset) at every concurrency level; yields one summary row per level as it finishes
+def run_load(modes, queries, datasets, concurrency=DEFAULT_CONCURRENCY, duration=DEFAULT_DURATION, pool_size=None):
+    for ds in datasets:
+        for query in queries:
+            for mode in modes:
+                for clients in concurrency:
+                    row = {"Mode": mode, "Query": query, "Dataset": ds.name, "Concurrency": clients}
+                    try:
+                        row.update(summarize(run_level(mode, query, ds, clients, duration, pool_size), duration))
+                    except Exception as e:
+                        row["Error"] = repr(e)
+                    yield row
+
+
+def plot_load(df, filename_prefix="load", show=False):
+    for (query, dataset), group in df.groupby(["Query", "Dataset"]):
+        fig, (ax_qps, ax_p99) = plt.subplots(1, 2, figsize=(14, 6))
+        sns.lineplot(group, x="Concurrency", y="QPS", hue="Mode", marker="o", ax=ax_qps)
+        ax_qps.set_title("Throughput (queries/s)")
+        sns.lineplot(group, x="Concurrency", y="p99 (ms)", hue="Mode", marker="o", ax=ax_p99)
+        ax_p99.set_yscale("log")
+        ax_p99.set_title("p99 Latency (ms)")
+        for ax in (ax_qps, ax_p99):
+            ax.set_xscale("log", base=2)
+            levels = sorted(group["Concurrency"].unique())
+            ax.set_xticks(levels, [str(level) for level in levels])
+        fig.suptitle(f"Concurrent Load: {query} ({dataset})")
+        fig.tight_layout()
+        fig.savefig(f"images/{filename_prefix}_{query}_{dataset}.png")
+        if show:
+            plt.show()
+        plt.close(fig)
@@ -1,5 +1,344 @@
-def main():
-    print("Hello from hello!")
+import argparse
+import pandas as pd
+
+import benchmark as bm
+import executor
+import generate_data
+import layout_sweep
+import load_test
+import page_cache
+import pruning
+import registry
+import results_store
+import thread_scaling
+
+'''
+Command line runner for the benchmark suites declared in `registry`.
+
+Selects suites, workloads, engines and datasets from the command line and runs the whole matrix in one process,
+so a scheduled run does not need any source edits.
+
+Examples:
+    python main.py list
+    python main.py run
+    python main.py run --suite read_filter pushdown --engine polars_lazy duckdb --dataset single multi --runs 10
+    python main.py run --suite read_filter --target-ci 0.02 --plot
+    python main.py run --suite read_filter --isolate --cache cold warm
+    python main.py run --suite pushdown --pruning
+    python main.py run --suite out_of_core --dataset synthetic_single --memory-cap 1GB
+    python main.py run --suite out_of_core --dataset synthetic_100m --memory-cap 4GB   # after generate --scales 100
+    python main.py generate --scale 10 --seed 42
+    python main.py run --dataset synthetic_single synthetic_multi
+    python main.py layout-sweep --source synthetic_single --engine polars_lazy duckdb
+    python main.py scaling --threads 1 2 4 8 --dataset synthetic_multi --plot
+    python main.py load --mode duckdb_cursor duckdb_pool polars_threads --concurrency 1 4 16 --duration 10
+    python main.py history
+    python main.py compare                      # latest run vs the one before it
+    python main.py compare --rolling 5          # latest run vs the previous 5 runs pooled
+    python main.py compare --candidate RUN_ID --baseline RUN_ID
+'''
+
+
+def list_cases(args):
+    registry.load_suites()
+    print("Datasets:")
+    for dataset in registry.get_datasets():
+        print(f"  {dataset.name:<10} {len(dataset.files):>4} files  {dataset.path}  {dataset.description}")
+    print("\nEngines:", ", ".join(registry.ENGINES))
+    for suite in registry.suites():
+        if args.suite and suite not in args.suite:
+            continue
+        print(f"\nSuite {suite}:")
+        for workload in registry.workloads(suite):
+            labels = [c.label for c in registry.select(suites=[suite], workloads=[workload])]
+            print(f"  {workload:<32} {', '.join(labels)}")
+
+
+def report(results, plot=False, show=False):
+    tables = []
+    for (suite, workload, dataset), timings in registry.group_results(results).items():
+        if plot or show:
+            filename = f"speed_{suite}_{workload}_{dataset}.png" if plot else None
+            bm.plot_results(timings, f"{suite}: {workload} ({dataset})", filename, show=show)
+        table = bm.results_table(timings)
+        table.insert(0, "Dataset", dataset)
+        table.insert(0, "Workload", workload)
+        table.insert(0, "Suite", suite)
+        tables.append(table)
+    if tables:
+        with pd.option_context("display.max_rows", None, "display.max_columns", None, "display.width", 200):
+            print(pd.concat(tables, ignore_index=True))
+    for suite, suite_report in registry.REPORTS.items():
+        # failed cases are passed too, so a report can show which engines did not finish
+        suite_results = [result for result in results if result.case.suite == suite]
+        if suite_results:
+            with pd.option_context("display.max_rows", None, "display.max_columns", None, "display.width", 200):
+                print(f"\n{suite}:")
+                print(suite_report(suite_results))
+
+
+def print_pruning(datasets, engines=None):
+    print("\nRow groups and bytes read for the filter and projection of the pushdown workloads:")
+    with pd.option_context("display.max_rows", None, "display.max_columns", None, "display.width", 200):
+        print(pruning.reports(datasets, engines))
+
+
+def run(args):
+    registry.load_suites()
+    cases = registry.select(args.suite, args.workload, args.engine)
+    if not cases:
+        raise SystemExit("No cases match the selected suites, workloads and engines (see `python main.py list`)")
+    datasets = registry.get_datasets(args.dataset)
+    timing_kwargs = dict(
+        runs=args.runs, warmup=args.warmup, target_ci=args.target_ci, max_runs=args.max_runs, memory=args.memory,
+    )
+
+    memory_cap = executor.parse_size(args.memory_cap) if args.memory_cap else None
+    if memory_cap and memory_cap < executor.MIN_MEMORY_CAP:
+        raise SystemExit(f"--memory-cap must be at least {executor.MIN_MEMORY_CAP // bm.MB}MB, the imported engines "
+                         "alone need about 200MB")
+
+    results = []
+    for cache in args.cache or [None]:
+        if args.isolate or memory_cap:
+            for result in executor.run_isolated(
+                cases, datasets, cache=cache, workers=args.workers, memory_cap=memory_cap, **timing_kwargs,
+            ):
+                if result.error:
+                    print(f"FAILED {result.case.name} on {result.dataset.name}:\n{result.error}")
+                else:
+                    print(f"Finished {result.case.name} on {result.dataset.name} ({cache or 'no cache control'}): "
+                          f"median {result.timing.median:.6f}s")
+                results.append(result)
+        else:
+            results.extend(registry.run_cases(cases, datasets, cache=cache, **timing_kwargs))
+    report(results, plot=args.plot, show=args.show)
+    if args.pruning:
+        print_pruning(datasets, args.engine)
+    if args.save:
+        run_id = results_store.save(results, args.db)
+        print(f"\nSaved run {run_id} to {args.db}")
+    return results
+
+
+def sweep(args):
+    registry.load_suites()
+    workloads = args.workload or (None if args.suite else layout_sweep.DEFAULT_WORKLOADS)
+    cases = registry.select(args.suite, workloads, args.engine)
+    if not cases:
+        raise SystemExit("No cases match the selected suites, workloads and engines (see `python main.py list`)")
+    [source] = registry.get_datasets([args.source])
+    variants = layout_sweep.layouts(
+        args.full_grid, args.row_group_size, args.compression, args.dictionary, args.statistics, args.order,
+    )
+    results, layout_table = layout_sweep.run_sweep(
+        source, cases, variants, overwrite=args.overwrite, runs=args.runs, warmup=args.warmup,
+        target_ci=args.target_ci, max_runs=args.max_runs, memory=args.memory,
+    )
+    with pd.option_context("display.max_rows", None, "display.max_columns", None, "display.width", 200):
+        print(layout_sweep.summary(results, layout_table))
+    if args.pruning:
+        print_pruning(registry.get_datasets(list(layout_table["Dataset"])), args.engine)
+    if args.plot or args.show:
+        layout_sweep.plot_sweep(results, layout_table, show=args.show)
+    if args.save:
+        run_id = results_store.save(results, args.db)
+        print(f"\nSaved run {run_id} to {args.db}")
+    return results
+
+
+def scaling(args):
+    registry.load_suites()
+    cases = registry.select(args.suite or thread_scaling.DEFAULT_SUITES, args.workload, args.engine)
+    if not cases:
+        raise SystemExit("No cases match the selected suites, workloads and engines (see `python main.py list`)")
+    datasets = registry.get_datasets(args.dataset)
+    threads = args.threads or thread_scaling.thread_counts(args.max_threads)
+    timing_kwargs = dict(
+        runs=args.runs, warmup=args.warmup, target_ci=args.target_ci, max_runs=args.max_runs, memory=args.memory,
+    )
+
+    results = []
+    for result in thread_scaling.run_scaling(cases, datasets, threads, cache=args.cache, **timing_kwargs):
+        if result.error:
+            print(f"FAILED {result.case.name} on {result.dataset.name} at {result.threads} threads:\n{result.error}")
+        else:
+            print(f"Finished {result.case.name} on {result.dataset.name} at {result.threads} threads: "
+                  f"median {result.timing.median:.6f}s")
+        results.append(result)
+    df = thread_scaling.scaling_table(results)
+    with pd.option_context("display.max_rows", None, "display.max_columns", None, "display.width", 200):
+        print(df)
+    if (args.plot or args.show) and not df.empty:
+        thread_scaling.plot_scaling(df, show=args.show)
+    if args.save:
+        run_id = results_store.save(results, args.db)
+        print(f"\nSaved run {run_id} to {args.db}")
+    return results
+
+
+def load(args):
+    datasets = registry.get_datasets(args.dataset or ["single"])
+    rows = []
+    for row in load_test.run_load(args.mode, args.query, datasets, args.concurrency, args.duration, args.pool_size):
+        if "Error" in row:
+            print(f"FAILED {row['Mode']} {row['Query']} on {row['Dataset']} with {row['Concurrency']} clients: {row['Error']}")
+        else:
+            print(f"{row['Mode']} {row['Query']} on {row['Dataset']} with {row['Concurrency']} clients: "
+                  f"{row['QPS']:.1f} queries/s, p99 {row['p99 (ms)']:.1f} ms")
+        rows.append(row)
+    df = pd.DataFrame(rows)
+    with pd.option_context("display.max_rows", None, "display.max_columns", None, "display.width", 200):
+        print(df)
+    if args.plot or args.show:
+        load_test.plot_load(df.dropna(subset=["QPS"]), show=args.show)
+    return df
+
+
+def show_history(args):
+    with pd.option_context("display.max_rows", None, "display.max_columns", None, "display.width", 200):
+        print(results_store.history(args.db, args.limit))
+
+
+def compare(args):
+    candidate, baseline_ids, df = results_store.compare(
+        args.candidate, args.baseline, args.rolling, args.threshold, db_path=args.db,
+    )
+    print(f"Candidate run {candidate} vs baseline {', '.join(baseline_ids)}")
+    with pd.option_context("display.max_rows", None, "display.max_columns", None, "display.width", 200):
+        print(df)
+    regressions = int((df["Verdict"] == "REGRESSION").sum()) if not df.empty else 0
+    print(f"\n{regressions} significant regression(s)")
+    if regressions:
+        raise SystemExit(1)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="engine_speed", description="Pandas vs Polars vs DuckDB benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = subparsers.add_parser("list", help="List datasets, suites, workloads and engines")
+    list_parser.add_argument("--suite", nargs="+", help="Only list these suites")
+    list_parser.set_defaults(func=list_cases)
+
+    run_parser = subparsers.add_parser("run", help="Run the selected benchmarks")
+    run_parser.add_argument("--suite", nargs="+", help="Suites to run (default: all)")
+    run_parser.add_argument("--workload", nargs="+", help="Workloads to run (default: all)")
+    run_parser.add_argument("--engine", nargs="+", choices=list(registry.ENGINES), help="Engines to run (default: all)")
+    run_parser.add_argument("--dataset", nargs="+", help="Datasets to run on (default: all)")
+    run_parser.add_argument("--runs", type=int, default=5, help="Minimum timed runs per case")
+    run_parser.add_argument("--warmup", type=int, default=bm.WARMUP_RUNS, help="Untimed warmup runs per case")
+    run_parser.add_argument("--target-ci", type=float, default=None,
+                            help="Repeat until the median's CI half-width is within this fraction of the median")
+    run_parser.add_argument("--max-runs", type=int, default=bm.MAX_RUNS, help="Upper bound on adaptive runs")
+    run_parser.add_argument("--no-memory", dest="memory", action="store_false",
+                            help="Skip the untimed memory profiling runs (peak RSS, Arrow, DuckDB, tracemalloc)")
+    run_parser.add_argument("--isolate", action="store_true", help="Run every case in a fresh subprocess")
+    run_parser.add_argument("--workers", type=int, default=1, help="Concurrent subprocesses with --isolate")
+    run_parser.add_argument("--memory-cap", help="Cap every case's data segment, e.g. 4GB (implies --isolate); "
+                                                 "DuckDB's memory_limit is set below the cap")
+    run_parser.add_argument("--cache", nargs="+", choices=page_cache.CACHE_MODES,
+                            help="Page cache mode(s): cold drops the files from the OS cache before every run, "
+                                 "warm pre-reads them (default: no cache control)")
+    run_parser.add_argument("--pruning", action="store_true",
+                            help="Report the row groups and bytes each engine skips (footer statistics, explain plans)")
+    run_parser.add_argument("--plot", action="store_true", help="Save a bar chart per workload to images/")
+    run_parser.add_argument("--show", action="store_true", help="Show the plots")
+    run_parser.add_argument("--no-save", dest="save", action="store_false", help="Do not append the run to the history")
+    run_parser.add_argument("--db", default=results_store.DB_PATH, help="Results database")
+    run_parser.set_defaults(func=run)
+
+    generate_parser = subparsers.add_parser("generate", help="Generate the synthetic taxi datasets")
+    generate_data.add_arguments(generate_parser)
+    generate_parser.set_defaults(func=generate_data.run)
+
+    sweep_parser = subparsers.add_parser(
+        "layout-sweep", help="Rewrite a dataset in several Parquet layouts and rerun the filter workloads on each",
+    )
+    sweep_parser.add_argument("--source", default="synthetic_single", help="Dataset to rewrite")
+    sweep_parser.add_argument("--suite", nargs="+", help="Suites to run (default: the filter and pushdown workloads)")
+    sweep_parser.add_argument("--workload", nargs="+", help="Workloads to run")
+    sweep_parser.add_argument("--engine", nargs="+", choices=list(registry.ENGINES), help="Engines to run")
+    sweep_parser.add_argument("--row-group-size", nargs="+", type=int, help="Row group sizes to try")
+    sweep_parser.add_argument("--compression", nargs="+", choices=layout_sweep.COMPRESSIONS, help="Codecs to try")
+    sweep_parser.add_argument("--dictionary", nargs="+", type=lambda v: v == "on", choices=[True, False],
+                              metavar="{on,off}", help="Dictionary encoding settings to try")
+    sweep_parser.add_argument("--statistics", nargs="+", type=lambda v: v == "on", choices=[True, False],
+                              metavar="{on,off}", help="Column statistics settings to try")
+    sweep_parser.add_argument("--order", nargs="+", choices=layout_sweep.ORDERS, help="Row orders to try")
+    sweep_parser.add_argument("--full-grid", action="store_true",
+                              help="Run every combination instead of one setting at a time from the baseline")
+    sweep_parser.add_argument("--overwrite", action="store_true", help="Rewrite variants that already exist")
+    sweep_parser.add_argument("--runs", type=int, default=5, help="Minimum timed runs per case")
+    sweep_parser.add_argument("--warmup", type=int, default=bm.WARMUP_RUNS, help="Untimed warmup runs per case")
+    sweep_parser.add_argument("--target-ci", type=float, default=None)
+    sweep_parser.add_argument("--max-runs", type=int, default=bm.MAX_RUNS)
+    sweep_parser.add_argument("--no-memory", dest="memory", action="store_false")
+    sweep_parser.add_argument("--pruning", action="store_true",
+                              help="Report the row groups and bytes each engine skips on every variant")
+    sweep_parser.add_argument("--plot", action="store_true", help="Save a chart per workload to images/")
+    sweep_parser.add_argument("--show", action="store_true", help="Show the plots")
+    sweep_parser.add_argument("--no-save", dest="save", action="store_false", help="Do not append the run to the history")
+    sweep_parser.add_argument("--db", default=results_store.DB_PATH, help="Results database")
+    sweep_parser.set_defaults(func=sweep)
+
+    scaling_parser = subparsers.add_parser(
+        "scaling", help="Rerun cases at 1, 2, 4, ... threads in fresh processes and report speedup and efficiency",
+    )
+    scaling_parser.add_argument("--suite", nargs="+", help="Suites to run (default: read_filter)")
+    scaling_parser.add_argument("--workload", nargs="+", help="Workloads to run (default: all)")
+    scaling_parser.add_argument("--engine", nargs="+", choices=list(registry.ENGINES), help="Engines to run")
+    scaling_parser.add_argument("--dataset", nargs="+", help="Datasets to run on (default: all)")
+    scaling_parser.add_argument("--threads", nargs="+", type=int, help="Thread counts (default: powers of 2 up to the cores)")
+    scaling_parser.add_argument("--max-threads", type=int, help="Largest thread count of the default sweep")
+    scaling_parser.add_argument("--runs", type=int, default=5, help="Minimum timed runs per case")
+    scaling_parser.add_argument("--warmup", type=int, default=bm.WARMUP_RUNS, help="Untimed warmup runs per case")
+    scaling_parser.add_argument("--target-ci", type=float, default=None)
+    scaling_parser.add_argument("--max-runs", type=int, default=bm.MAX_RUNS)
+    scaling_parser.add_argument("--no-memory", dest="memory", action="store_false")
+    scaling_parser.add_argument("--cache", choices=page_cache.CACHE_MODES, help="Page cache mode (default: no cache control)")
+    scaling_parser.add_argument("--plot", action="store_true", help="Save speedup and efficiency curves to images/")
+    scaling_parser.add_argument("--show", action="store_true", help="Show the plots")
+    scaling_parser.add_argument("--no-save", dest="save", action="store_false", help="Do not append the run to the history")
+    scaling_parser.add_argument("--db", default=results_store.DB_PATH, help="Results database")
+    scaling_parser.set_defaults(func=scaling)
+
+    load_parser = subparsers.add_parser(
+        "load", help="Send queries from concurrent clients and report queries/s and latency percentiles",
+    )
+    load_parser.add_argument("--mode", nargs="+", choices=load_test.MODES, default=load_test.MODES,
+                             help="How the clients share the engine (default: all)")
+    load_parser.add_argument("--query", nargs="+", choices=load_test.QUERIES, default=load_test.QUERIES,
+                             help="Queries to send (default: all)")
+    load_parser.add_argument("--dataset", nargs="+", help="Datasets to query (default: single)")
+    load_parser.add_argument("--concurrency", nargs="+", type=int, default=load_test.DEFAULT_CONCURRENCY,
+                             help="Numbers of concurrent clients")
+    load_parser.add_argument("--duration", type=float, default=load_test.DEFAULT_DURATION,
+                             help="Seconds of load at each concurrency level")
+    load_parser.add_argument("--pool-size", type=int, default=4, help="Cursors in the duckdb_pool connection pool")
+    load_parser.add_argument("--plot", action="store_true", help="Save queries/s and p99 curves to images/")
+    load_parser.add_argument("--show", action="store_true", help="Show the plots")
+    load_parser.set_defaults(func=load)
+
+    history_parser = subparsers.add_parser("history", help="List stored runs")
+    history_parser.add_argument("--limit", type=int, default=20)
+    history_parser.add_argument("--db", default=results_store.DB_PATH, help="Results database")
+    history_parser.set_defaults(func=show_history)
+
+    compare_parser = subparsers.add_parser("compare", help="Flag significant regressions between stored runs")
+    compare_parser.add_argument("--candidate", help="Run to check (default: latest)")
+    compare_parser.add_argument("--baseline", help="Run to compare against (default: the run before the candidate)")
+    compare_parser.add_argument("--rolling", type=int, help="Pool the N runs before the candidate as the baseline")
+    compare_parser.add_argument("--threshold", type=float, default=0.05,
+                                help="Minimum relative change of the median to flag")
+    compare_parser.add_argument("--db", default=results_store.DB_PATH, help="Results database")
+    compare_parser.set_defaults(func=compare)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,208 @@
+import os
+
+import duckdb
+import pandas as pd
+import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import benchmark as bm
+import registry
+from registry import case
+
+'''
+Out-of-core comparisons: the lazy workloads run the way they would on data larger than memory.
+
+Every engine runs in its streaming mode:
+- Polars Lazy collects with the streaming engine (`collect(engine="streaming")`) and writes with `sink_parquet`,
+  which also streams
+- DuckDB runs with `preserve_insertion_order = false` and spills to `TEMP_DIRECTORY` once the query reaches its
+  `memory_limit`
+- Pandas reads every file in `BATCH_ROWS` batches with pyarrow `iter_batches` and reduces (or writes) each batch
+  before reading the next one, so only one batch and the running result are in memory. Pandas has no out-of-core
+  sort, so it has no `sort_sink` case.
+
+Workloads:
+- `filter_count`: count the rows after the time column cutoff
+- `groupby`: trips, total and mean total_amount per passenger_count
+- `filter_sink`: write the rows after the cutoff (all columns) to Parquet under `OUTPUT_DIR`
+- `sort_sink`: write the whole dataset sorted by total_amount to Parquet, the workload that has to spill
+
+Run the suite under a memory cap well below the dataset size, e.g. generate the 100M row dataset
+(`python main.py generate --scales 100`) and run
+`python main.py run --suite out_of_core --dataset synthetic_100m --memory-cap 4GB`. Every case runs in its own
+process whose data segment is capped with `resource.setrlimit` (see `executor`, which also gives the smallest usable
+cap), and DuckDB's `memory_limit` is set below the cap. The table printed after the timings (`outcomes`) shows which
+engines finished under the cap, their median time, peak RSS and how much DuckDB spilled, and `OOM (cap)` for the
+cases that ran out of memory. Polars does not report how much it spills.
+
+Variables:
+- `SUITE`: Name of the suite in the registry.
+- `OUTPUT_DIR`: Where the sink workloads write.
+- `TEMP_DIRECTORY`: Where DuckDB spills.
+- `BATCH_ROWS`: Rows per batch of the Pandas `iter_batches` reads.
+- `GROUP_KEY`: Group key of the `groupby` workload.
+- `REPEAT_TIMES`: Number of times each function will be run when this file is run as a script.
+- `con`: DuckDB connection object for executing SQL queries.
+'''
+
+# parameters
+SUITE = "out_of_core"
+OUTPUT_DIR = "data/out_of_core"
+TEMP_DIRECTORY = "data/out_of_core/spill"
+BATCH_ROWS = 1_000_000
+GROUP_KEY = "passenger_count"
+REPEAT_TIMES = 3
+TITLES = {"single": "Single File", "multi": "Multiple Files"}
+
+# init
+con = duckdb.connect()
+con.execute(f"SET temp_directory = '{TEMP_DIRECTORY}'")
+con.execute("SET preserve_insertion_order = false")
+
+
+def output_path(ds, workload, engine):
+    directory = os.path.join(OUTPUT_DIR, ds.name)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{workload}_{engine}.parquet")
+
+
+### Pandas: one iter_batches batch at a time
+def pandas_batches(ds, columns=None):
+    for file in ds.files:
+        for batch in pq.ParquetFile(file).iter_batches(batch_size=BATCH_ROWS, columns=columns):
+            yield batch.to_pandas()
+
+
+def pandas_filtered_batches(ds, columns=None):
+    cutoff = pd.Timestamp(ds.cutoff)
+    for df in pandas_batches(ds, columns):
+        yield df[df[ds.time_column] > cutoff]
+
+
+@case(SUITE, "filter_count", "pandas", bm.COUNT)
+def pandas_filter_count(ds):
+    return sum(len(df) for df in pandas_filtered_batches(ds, [ds.time_column]))
+
+
+@case(SUITE, "groupby", "pandas", bm.PANDAS)
+def pandas_groupby(ds):
+    partials = [
+        df.groupby(GROUP_KEY).agg(trips=("total_amount", "size"), total_amount_sum=("total_amount", "sum"))
+        for df in pandas_batches(ds, [GROUP_KEY, "total_amount"])
+    ]
+    result = pd.concat(partials).groupby(level=0).sum()
+    result["total_amount_mean"] = result["total_amount_sum"] / result["trips"]
+    return result.reset_index()
+
+
+@case(SUITE, "filter_sink", "pandas")
+def pandas_filter_sink(ds):
+    # the monthly files differ in column types, every batch is written with the schema they can all be cast to
+    schema = ds.arrow_schema
+    with pq.ParquetWriter(output_path(ds, "filter_sink", "pandas"), schema) as writer:
+        for df in pandas_filtered_batches(ds):
+            writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False))
+
+
+### Polars Lazy: streaming engine
+def polars_filtered(ds):
+    return pl.scan_parquet(ds.source).filter(pl.col(ds.time_column) > ds.cutoff)
+
+
+@case(SUITE, "filter_count", "polars_lazy", bm.COUNT)
+def polars_filter_count(ds):
+    return polars_filtered(ds).select(pl.len()).collect(engine="streaming").item()
+
+
+@case(SUITE, "groupby", "polars_lazy", bm.POLARS)
+def polars_groupby(ds):
+    return (
+        pl.scan_parquet(ds.source)
+        .group_by(GROUP_KEY)
+        .agg(
+            pl.len().alias("trips"),
+            pl.col("total_amount").sum().alias("total_amount_sum"),
+            pl.col("total_amount").mean().alias("total_amount_mean"),
+        )
+        .collect(engine="streaming")
+    )
+
+
+@case(SUITE, "filter_sink", "polars_lazy")
+def polars_filter_sink(ds):
+    polars_filtered(ds).sink_parquet(output_path(ds, "filter_sink", "polars"))
+
+
+@case(SUITE, "sort_sink", "polars_lazy")
+def polars_sort_sink(ds):
+    pl.scan_parquet(ds.source).sort("total_amount").sink_parquet(output_path(ds, "sort_sink", "polars"))
+
+
+### DuckDB: memory_limit (set by the memory cap) and temp_directory
+@case(SUITE, "filter_count", "duckdb", bm.COUNT)
+def duckdb_filter_count(ds):
+    return con.execute(f"""
+        SELECT count(*)
+        FROM {ds.sql_source}
+        WHERE {ds.sql_filter}
+    """)
+
+
+@case(SUITE, "groupby", "duckdb", bm.ARROW)
+def duckdb_groupby(ds):
+    return con.execute(f"""
+        SELECT {GROUP_KEY}, count(*) AS trips, sum(total_amount) AS total_amount_sum,
+               avg(total_amount) AS total_amount_mean
+        FROM {ds.sql_source}
+        GROUP BY ALL
+    """)
+
+
+@case(SUITE, "filter_sink", "duckdb")
+def duckdb_filter_sink(ds):
+    con.execute(f"""
+        COPY (SELECT * FROM {ds.sql_source} WHERE {ds.sql_filter})
+        TO '{output_path(ds, "filter_sink", "duckdb")}' (FORMAT parquet)
+    """)
+
+
+@case(SUITE, "sort_sink", "duckdb")
+def duckdb_sort_sink(ds):
+    con.execute(f"""
+        COPY (SELECT * FROM {ds.sql_source} ORDER BY total_amount)
+        TO '{output_path(ds, "sort_sink", "duckdb")}' (FORMAT parquet)
+    """)
+
+
+# Which cases finished under the memory cap, how long they took and how much DuckDB spilled
+def outcomes(results):
+    rows = []
+    for result in results:
+        timing = result.timing
+        memory = timing.memory.summary() if timing is not None and timing.memory else {}
+        rows.append({
+            "Workload": result.case.workload,
+            "Dataset": result.dataset.name,
+            "Engine": result.label,
+            "Memory Cap (MB)": result.memory_cap / bm.MB if result.memory_cap else None,
+            "Finished": timing is not None,
+            "Median (s)": timing.median if timing is not None else None,
+            "Peak RSS (MB)": memory.get("Peak RSS (MB)"),
+            "DuckDB Spill (MB)": memory.get("DuckDB Spill (MB)"),
+            "Error": result.error.strip().splitlines()[-1] if result.error else None,
+        })
+    return pd.DataFrame(rows)
+
+
+registry.register_report(SUITE, outcomes)
+
+
+if __name__ == "__main__":
+    ### Run benchmarks
+    results = registry.run_cases(registry.select(suites=[SUITE]), registry.get_datasets(TITLES), runs=REPEAT_TIMES)
+    print(outcomes(results))
+
+    ### Plotting results for each workload
+    for (_, workload, dataset), timings in registry.group_results(results).items():
+        bm.plot_results(timings, f"{TITLES[dataset]}: Out-of-Core {workload}", f"speed_out_of_core_{workload}_{dataset}.png")
@@ -0,0 +1,92 @@
+import dataclasses
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+'''
+OS page-cache control for the benchmark runs.
+
+- `COLD`: before every run the dataset's files are dropped from the page cache with
+  `posix_fadvise(POSIX_FADV_DONTNEED)`. Where that is not available (macOS, Windows) the files are copied to a
+  fresh temporary location and re-copied before every run, so each run reads a new file. That bypasses the
+  engines' own file and metadata caches, but the freshly written pages can still be in the OS cache.
+- `WARM`: the files are read once end-to-end before every run, so every run reads from memory.
+- `None`: leave the cache alone (what the in-process runs did originally).
+
+A case's inputs staged on disk by its `prepare` (a CSV copy, a partitioned copy, generated tables) get the same
+treatment as the dataset's files: `prepare` returns their path, a file or a directory, and every file under it is
+evicted or read with them. They are read by path, so they cannot be swapped for fresh copies: where the files cannot
+be evicted, `COLD` refuses such cases.
+'''
+
+COLD = "cold"
+WARM = "warm"
+CACHE_MODES = (COLD, WARM)
+
+READ_CHUNK = 16 * 1024 * 1024
+
+
+def can_evict():
+    return hasattr(os, "posix_fadvise") and hasattr(os, "POSIX_FADV_DONTNEED")
+
+
+def evict(paths):
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def prewarm(paths):
+    for path in paths:
+        with open(path, "rb", buffering=0) as f:
+            while f.read(READ_CHUNK):
+                pass
+
+
+# The files of a path returned by a case's `prepare`: itself, every file under it, or none when it is not a path
+def staged_files(staged):
+    if not isinstance(staged, (str, os.PathLike)) or not os.path.exists(staged):
+        return []
+    if not os.path.isdir(staged):
+        return [staged]
+    return sorted(os.path.join(root, name) for root, _, names in os.walk(staged) for name in names)
+
+
+def _copy_files(paths, directory):
+    for path in paths:
+        target = os.path.join(directory, os.path.basename(path))
+        if os.path.exists(target):
+            os.remove(target)
+        shutil.copyfile(path, target)
+
+
+# Yields (dataset, setup): the dataset to run against and a callable to run before every run, outside the timer.
+# `prepare(dataset)`, the case's, is called once on the dataset to run against before anything is yielded.
+@contextmanager
+def prepared(dataset, mode, prepare=None):
+    if mode is not None and mode not in CACHE_MODES:
+        raise ValueError(f"Unknown cache mode {mode!r}, expected one of {CACHE_MODES}")
+    if mode is None:
+        if prepare:
+            prepare(dataset)
+        yield dataset, None
+        return
+
+    if mode == WARM or can_evict():
+        files = dataset.files + (staged_files(prepare(dataset)) if prepare else [])
+        yield dataset, (lambda: prewarm(files)) if mode == WARM else (lambda: evict(files))
+        return
+    directory = tempfile.mkdtemp(prefix=f"engine_speed_{dataset.name}_")
+    try:
+        copy = dataclasses.replace(dataset, path=os.path.join(directory, os.path.basename(dataset.path)))
+        files = dataset.files
+        _copy_files(files, directory)
+        if prepare and staged_files(prepare(copy)):
+            raise ValueError(f"Cache mode {mode!r} needs posix_fadvise to evict the inputs staged by the case")
+        yield copy, lambda: _copy_files(files, directory)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,202 @@
+import os
+import shutil
+from functools import cache
+
+import duckdb
+import pandas as pd
+import polars as pl
+import pyarrow.compute as pc
+import pyarrow.dataset as pads
+
+import benchmark as bm
+import registry
+from registry import case
+
+'''
+Hive-partitioned datasets: partition pruning against the flat file glob.
+
+The flat datasets make every engine open every file (and read its footer) before it can skip anything. Here the
+dataset is rewritten into Hive-style `year=YYYY/month=M/` directories derived from its time column, and the same
+filter (time column > cutoff) is read from both layouts. On the partitioned copy the filter also names the
+partitions that can hold matching rows (`year > Y OR (year = Y AND month >= M)` for the cutoff's year and month),
+so engines drop whole directories from the directory names alone, before opening any file.
+
+Workloads:
+- `write_partitions`: rewrite the dataset into partitions with pyarrow `write_dataset`, Polars
+  `sink_parquet(pl.PartitionByKey(...))` (`pl.PartitionBy` on Polars releases that no longer have `PartitionByKey`)
+  and DuckDB `COPY ... (PARTITION_BY (year, month))`. Each run starts from an empty directory, and deleting the
+  previous output is part of the timed run for every engine.
+- `flat_filter`: filter the original files (the baseline).
+- `partitioned_filter`: filter the partitioned copy, written once by pyarrow to `data/hive/<dataset>/` before the
+  first run and rewritten when the source files change. The partition keys are only used to filter, the results
+  have the same columns as `flat_filter`.
+
+Variables:
+- `SUITE`: Name of the suite in the registry.
+- `HIVE_DIR`: Where the partitioned copies are written.
+- `PARTITION_COLUMNS`: Partition keys, derived from the dataset's time column.
+- `REPEAT_TIMES`: Number of times each function will be run when this file is run as a script.
+'''
+
+# parameters
+SUITE = "hive_partitions"
+HIVE_DIR = "data/hive"
+PARTITION_COLUMNS = ["year", "month"]
+REPEAT_TIMES = 5
+TITLES = {"single": "Single File", "multi": "Multiple Files"}
+
+# init
+con = duckdb.connect()
+
+
+def output_dir(ds, writer):
+    return os.path.join(HIVE_DIR, f"{ds.name}_{writer}")
+
+
+def _empty(directory):
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(os.path.dirname(directory) or ".", exist_ok=True)
+
+
+### Writing the partitions
+def pyarrow_write(ds, directory):
+    dataset = ds.arrow_dataset
+    time = pads.field(ds.time_column)
+    projection = {name: pads.field(name) for name in dataset.schema.names}
+    projection.update({"year": pc.year(time), "month": pc.month(time)})
+    pads.write_dataset(
+        dataset.scanner(columns=projection), directory, format="parquet",
+        partitioning=PARTITION_COLUMNS, partitioning_flavor="hive",
+    )
+
+
+@case(SUITE, "write_partitions", "pyarrow")
+def pyarrow_write_partitions(ds):
+    directory = output_dir(ds, "pyarrow")
+    _empty(directory)
+    pyarrow_write(ds, directory)
+
+@case(SUITE, "write_partitions", "polars_lazy")
+def polars_write_partitions(ds):
+    directory = output_dir(ds, "polars")
+    _empty(directory)
+    time = pl.col(ds.time_column)
+    keys = {"year": time.dt.year(), "month": time.dt.month()}
+    # PartitionByKey in the pinned Polars, replaced by PartitionBy in later releases
+    if hasattr(pl, "PartitionByKey"):
+        target = pl.PartitionByKey(directory, by=keys)
+    else:
+        target = pl.PartitionBy(directory, key=keys)
+    pl.scan_parquet(ds.source).sink_parquet(target, mkdir=True)
+
+@case(SUITE, "write_partitions", "duckdb")
+def duckdb_write_partitions(ds):
+    directory = output_dir(ds, "duckdb")
+    _empty(directory)
+    con.execute(f"""
+        COPY (
+            SELECT *, year({ds.time_column}) AS year, month({ds.time_column}) AS month
+            FROM {ds.sql_source}
+        )
+        TO '{directory}' (FORMAT parquet, PARTITION_BY (year, month))
+    """)
+
+
+# Partitioned copy read by the partitioned_filter cases; rewritten when the source files are newer
+@cache
+def partitioned(ds):
+    return registry.staged_path(
+        ds, os.path.join(HIVE_DIR, ds.name), lambda directory: pyarrow_write(ds, directory), directory=True,
+    )
+
+
+### Partition predicates: the partitions that can hold rows after the cutoff
+def pandas_partition_filters(ds):
+    year, month = ds.cutoff.year, ds.cutoff.month
+    time = (ds.time_column, ">", ds.cutoff)
+    return [[("year", ">", year), time], [("year", "=", year), ("month", ">=", month), time]]
+
+
+def arrow_partition_predicate(ds):
+    year, month = ds.cutoff.year, ds.cutoff.month
+    partitions = (pads.field("year") > year) | ((pads.field("year") == year) & (pads.field("month") >= month))
+    return partitions & ds.arrow_filter
+
+
+def polars_partition_predicate(ds):
+    year, month = ds.cutoff.year, ds.cutoff.month
+    partitions = (pl.col("year") > year) | ((pl.col("year") == year) & (pl.col("month") >= month))
+    return partitions & (pl.col(ds.time_column) > ds.cutoff)
+
+
+def sql_partition_filter(ds):
+    year, month = ds.cutoff.year, ds.cutoff.month
+    return f"(year > {year} OR (year = {year} AND month >= {month})) AND {ds.sql_filter}"
+
+
+### Baseline: the flat files
+@case(SUITE, "flat_filter", "pandas", bm.PANDAS)
+def pandas_flat_filter(ds):
+    return pd.read_parquet(ds.source, filters=ds.filters)
+
+@case(SUITE, "flat_filter", "pyarrow", bm.ARROW)
+def pyarrow_flat_filter(ds):
+    return ds.arrow_dataset.to_table(filter=ds.arrow_filter)
+
+@case(SUITE, "flat_filter", "polars_lazy", bm.POLARS)
+def polars_flat_filter(ds):
+    return pl.scan_parquet(ds.source).filter(pl.col(ds.time_column) > ds.cutoff).collect()
+
+@case(SUITE, "flat_filter", "duckdb", bm.ARROW)
+def duckdb_flat_filter(ds):
+    return con.execute(f"""
+        SELECT *
+        FROM {ds.sql_source}
+        WHERE {ds.sql_filter}
+    """)
+
+
+### Partition-pruned reads of the Hive copy
+@case(SUITE, "partitioned_filter", "pandas", bm.PANDAS, prepare=partitioned)
+def pandas_partitioned_filter(ds):
+    return pd.read_parquet(partitioned(ds), columns=ds.arrow_schema.names, filters=pandas_partition_filters(ds))
+
+@case(SUITE, "partitioned_filter", "pyarrow", bm.ARROW, prepare=partitioned)
+def pyarrow_partitioned_filter(ds):
+    dataset = pads.dataset(partitioned(ds), format="parquet", partitioning="hive")
+    return dataset.to_table(columns=ds.arrow_schema.names, filter=arrow_partition_predicate(ds))
+
+@case(SUITE, "partitioned_filter", "polars_lazy", bm.POLARS, prepare=partitioned)
+def polars_partitioned_filter(ds):
+    return (
+        pl.scan_parquet(partitioned(ds), hive_partitioning=True)
+        .filter(polars_partition_predicate(ds))
+        .drop(PARTITION_COLUMNS)
+        .collect()
+    )
+
+@case(SUITE, "partitioned_filter", "duckdb", bm.ARROW, prepare=partitioned)
+def duckdb_partitioned_filter(ds):
+    return con.execute(f"""
+        SELECT * EXCLUDE ({", ".join(PARTITION_COLUMNS)})
+        FROM read_parquet('{partitioned(ds)}/**/*.parquet', hive_partitioning = true)
+        WHERE {sql_partition_filter(ds)}
+    """)
+
+
+if __name__ == "__main__":
+    ### Run benchmarks
+    results = registry.run_cases(registry.select(suites=[SUITE]), registry.get_datasets(TITLES), runs=REPEAT_TIMES)
+
+    ### Flat vs partitioned reads side by side, and the partition writers
+    for dataset in TITLES:
+        reads = {
+            f"{r.case.label} ({'Flat' if r.case.workload == 'flat_filter' else 'Hive'})": r.timing
+            for r in results if r.dataset.name == dataset and r.case.workload != "write_partitions"
+        }
+        writes = {r.case.label: r.timing for r in results if r.dataset.name == dataset and r.case.workload == "write_partitions"}
+        # a dataset that is not on disk has no results
+        if reads:
+            bm.plot_results(reads, f"{TITLES[dataset]}: Flat vs Hive Partitioned Filter", f"speed_hive_filter_{dataset}.png", xtick_rotation=30)
+        if writes:
+            bm.plot_results(writes, f"{TITLES[dataset]}: Writing Hive Partitions", f"speed_hive_write_{dataset}.png")
@@ -1,47 +1,167 @@
-from datetime import datetime
-import pandas as pd
-import polars as pl
-import benchmark as bm
+import os
 
-from datetime import datetime
+import duckdb
 import pandas as pd
 import polars as pl
+import pyarrow.parquet as pq
+
 import benchmark as bm
+import registry
+from layout_sweep import write_row_groups
+
+'''
+Parquet write paths, timed end-to-end: every case reads the source files, applies the workload and writes the result,
+so the cases differ only in how the data gets from the source to the output file.
+
+Write paths:
+- Polars: `read_parquet` -> `write_parquet` (the whole result in memory before the write starts)
+- Polars Lazy `sink`: `scan_parquet` -> `sink_parquet` (streamed, never fully in memory)
+- Polars Lazy `collect_write`: `scan_parquet` -> `collect` -> `write_parquet` (pushdown on the read, then in memory)
+- PyArrow: dataset scanner batches -> `ParquetWriter`, buffered into `ROW_GROUP_SIZE` row groups (streamed)
+- DuckDB: `COPY (SELECT ...) TO ... (FORMAT parquet)`
+
+Every path writes with the same `COMPRESSION` and `ROW_GROUP_SIZE`, to `OUTPUT_DIR/<dataset>/<workload>_<case>.parquet`.
+DuckDB rounds the row group size up to a multiple of its 2048-row vectors, so its row groups are slightly larger.
 
-FILE = "data/taxi_2019_04.parquet"
-FILTER = [("pickup_at", ">", datetime(2019, 6, 30))]
-COLUMNS = ["pickup_at", "total_amount"]
+Workloads:
+- `copy`: rewrite every row and column
+- `filter_write`: rewrite the rows after the time column cutoff, every column
+
+After the timings, `verify` reads back each output's footer and checks the row count against the source (the filtered
+count for `filter_write`), the compression and the largest row group, and reports the output bytes written per second.
+
+Variables:
+- `SUITE`: Name of the suite in the registry.
+- `OUTPUT_DIR`: Where the outputs are written.
+- `COMPRESSION`: Parquet codec of every write path.
+- `ROW_GROUP_SIZE`: Rows per row group of every write path.
+- `WORKLOADS`: Whether each workload filters on the time column.
+- `REPEAT_TIMES`: Number of times each function will be run when this file is run as a script.
+- `con`: DuckDB connection object for executing SQL queries.
+'''
+
+# parameters
+SUITE = "sink_write"
+DATASET = "single"
+OUTPUT_DIR = "data/sink_write"
+COMPRESSION = "zstd"
+ROW_GROUP_SIZE = 100_000
+WORKLOADS = {"copy": False, "filter_write": True}
 TITLE_START = "1 File Read Benchmark"
 SHOW_PLOTS = False
 REPEAT_TIMES = 5
 
-df = pl.read_parquet(FILE).filter(pl.col("pickup_at") > datetime(2019, 6, 30)).select(COLUMNS)
-lf = pl.scan_parquet(FILE).filter(pl.col("pickup_at") > datetime(2019, 6, 30)).select(COLUMNS)
+# init
+con = duckdb.connect()
+
+
+def output_path(ds, workload, case):
+    directory = os.path.join(OUTPUT_DIR, ds.name)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{workload}_{case}.parquet")
+
+
+# The rows after the cutoff for the filtered workloads, every row (no filter at all) otherwise
+def polars_filtered(df, ds, filtered):
+    return df.filter(pl.col(ds.time_column) > ds.cutoff) if filtered else df
+
+
+# Polars read -> write_parquet
+def pl_read_write(ds, workload, filtered):
+    df = polars_filtered(pl.read_parquet(ds.source), ds, filtered)
+    df.write_parquet(output_path(ds, workload, "polars"), compression=COMPRESSION, row_group_size=ROW_GROUP_SIZE)
+
+
+# Polars scan -> sink_parquet
+def pl_scan_sink(ds, workload, filtered):
+    polars_filtered(pl.scan_parquet(ds.source), ds, filtered).sink_parquet(
+        output_path(ds, workload, "polars_lazy_sink"), compression=COMPRESSION, row_group_size=ROW_GROUP_SIZE,
+    )
+
+
+# Polars scan -> collect -> write_parquet
+def pl_scan_collect_write(ds, workload, filtered):
+    df = polars_filtered(pl.scan_parquet(ds.source), ds, filtered).collect()
+    df.write_parquet(
+        output_path(ds, workload, "polars_lazy_collect_write"), compression=COMPRESSION, row_group_size=ROW_GROUP_SIZE,
+    )
+
+
+# PyArrow scanner batches -> ParquetWriter, buffered so every row group but the last has ROW_GROUP_SIZE rows
+def pyarrow_stream_write(ds, workload, filtered):
+    batches = ds.arrow_dataset.to_batches(filter=ds.arrow_filter if filtered else None)
+    write_row_groups(output_path(ds, workload, "pyarrow"), ds.arrow_schema, batches, ROW_GROUP_SIZE,
+                     compression=COMPRESSION)
+
+
+# DuckDB COPY
+def duckdb_copy(ds, workload, filtered):
+    con.execute(f"""
+        COPY (SELECT * FROM {ds.sql_source} {f"WHERE {ds.sql_filter}" if filtered else ""})
+        TO '{output_path(ds, workload, "duckdb")}'
+        (FORMAT parquet, COMPRESSION {COMPRESSION}, ROW_GROUP_SIZE {ROW_GROUP_SIZE})
+    """)
+
+
+# (engine, variant, write path, output file name)
+WRITE_PATHS = [
+    ("polars", "", pl_read_write, "polars"),
+    ("polars_lazy", "sink", pl_scan_sink, "polars_lazy_sink"),
+    ("polars_lazy", "collect_write", pl_scan_collect_write, "polars_lazy_collect_write"),
+    ("pyarrow", "", pyarrow_stream_write, "pyarrow"),
+    ("duckdb", "", duckdb_copy, "duckdb"),
+]
+for workload, filtered in WORKLOADS.items():
+    for engine, variant, func, _ in WRITE_PATHS:
+        registry.register(
+            SUITE, workload, engine,
+            lambda ds, func=func, workload=workload, filtered=filtered: func(ds, workload, filtered),
+            variant=variant,
+        )
+
+
+def expected_rows(ds, filtered):
+    if filtered:
+        return con.execute(f"SELECT count(*) FROM {ds.sql_source} WHERE {ds.sql_filter}").fetchone()[0]
+    return ds.num_rows
 
-# Polars sink vs write parquet
-def pl_read():
-    df = pl.read_parquet(FILE).filter(pl.col("pickup_at") > datetime(2019, 6, 30)).select(COLUMNS)
-    return df
 
-def pl_scan():
-    lf = pl.scan_parquet(FILE).filter(pl.col("pickup_at") > datetime(2019, 6, 30)).select(COLUMNS)
-    return lf
+# Output checks and write throughput of every case, printed by `main.py run` after the timings
+def verify(results):
+    rows = []
+    for result in results:
+        if result.timing is None:
+            continue
+        ds, workload = result.dataset, result.case.workload
+        name = next(n for e, v, _, n in WRITE_PATHS if (e, v) == (result.case.engine, result.case.variant))
+        metadata = pq.ParquetFile(output_path(ds, workload, name)).metadata
+        row_groups = [metadata.row_group(i) for i in range(metadata.num_row_groups)]
+        codecs = {rg.column(j).compression for rg in row_groups for j in range(rg.num_columns)}
+        output_mb = os.path.getsize(output_path(ds, workload, name)) / bm.MB
+        rows.append({
+            "Workload": workload,
+            "Dataset": ds.name,
+            "Engine": result.label,
+            "Rows OK": metadata.num_rows == expected_rows(ds, WORKLOADS[workload]),
+            "Compression": ", ".join(sorted(codecs)),
+            "Row Groups": metadata.num_row_groups,
+            "Largest Row Group": max((rg.num_rows for rg in row_groups), default=0),
+            "Output (MB)": output_mb,
+            "Median (s)": result.timing.median,
+            "Output (MB/s)": output_mb / result.timing.median,
+        })
+    return pd.DataFrame(rows)
 
-def pl_write():
-    df.write_parquet("data/test.parquet")
 
-def pl_sink():
-    lf.sink_parquet("data/test.parquet")
+registry.register_report(SUITE, verify)
 
-# Benchmarks
-methods_sink_write = {
-    "Read": pl_read,
-    "Scan": pl_scan,
-    "Write": pl_write,
-    "Sink": pl_sink
-}
 
-results_sink_write = bm.run_benchmark(methods_sink_write, runs=REPEAT_TIMES)
+if __name__ == "__main__":
+    # Benchmarks
+    results = registry.run_cases(registry.select(suites=[SUITE]), [registry.DATASETS[DATASET]], runs=REPEAT_TIMES)
+    print(verify(results))
 
-# Plotting the results
-bm.plot_results(results_sink_write, f"{TITLE_START}: Polars Sink vs Write Methods (With Filters)", "speed_polars_sink_write_with_filters.png")
\ No newline at end of file
+    # Plotting the results
+    for (_, workload, _), timings in registry.group_results(results).items():
+        bm.plot_results(timings, f"{TITLE_START}: Parquet Write Paths ({workload})",
+                        f"speed_parquet_write_paths_{workload}.png", xtick_rotation=30)
@@ -0,0 +1,209 @@
+import json
+import os
+import re
+import sys
+import tempfile
+from contextlib import contextmanager
+
+import duckdb
+import pandas as pd
+import polars as pl
+import pyarrow.dataset as pads
+import pyarrow.parquet as pq
+
+import registry
+
+'''
+Row-group pruning and pushdown verification.
+
+The timings only show that a pushed-down read is fast, not why. This report reads the Parquet footers of a dataset
+and, for the filter (time column > cutoff) and projection (time column and total_amount) used by the pushdown
+workloads, shows how many row groups and bytes each engine is expected to read and, where it can be measured, reads:
+
+- Footer: row groups whose min/max statistics cannot match the predicate. This is the best any engine can do with
+  min/max pruning, and row groups without statistics can never be skipped.
+- Pandas and Pandas (Tuned): `pd.read_parquet(filters=...)` and the tuned reader both scan through
+  `pyarrow.dataset`, so the row groups they read are exactly the fragments left by `split_by_row_group(filter)`.
+- Polars (eager): `read_parquet` has no predicate, every row group is decoded and filtered afterwards.
+- Polars Lazy: `explain()` shows whether the filter and projection reached the Parquet scan, and the verbose log of
+  the collect (`Predicate pushdown: reading N / M row groups`) gives the number of row groups read, but not which
+  ones, so its MB Read stays empty.
+- DuckDB: `EXPLAIN ANALYZE` with JSON profiling shows the filters and projections pushed into the Parquet scan and
+  the files read. Its row counter includes row groups it skipped and the profile has no row group count, so only
+  the expected columns are filled.
+
+The expected columns are the footer figure when the engine pushed the filter down and every row group when it did
+not. The read columns are left empty when the engine gives no measure of them. MB counts the compressed size of the
+projected column chunks in the row groups, from the footer.
+
+Variables:
+- `ROW_GROUPS_READ`: Pattern of the Polars verbose log line with the row groups read per file.
+'''
+
+ROW_GROUPS_READ = re.compile(r"reading (\d+) / (\d+) row groups")
+
+
+def columns(ds):
+    return [ds.time_column, "total_amount"]
+
+
+# One row per row group: file, index, rows, compressed bytes (all and projected columns) and min/max of the time column
+def row_groups(ds, projection=None):
+    projection = projection or columns(ds)
+    rows = []
+    for path in ds.files:
+        metadata = pq.ParquetFile(path).metadata
+        names = [metadata.schema.column(i).name for i in range(metadata.num_columns)]
+        time_index = names.index(ds.time_column)
+        for i in range(metadata.num_row_groups):
+            group = metadata.row_group(i)
+            chunks = [group.column(j) for j in range(group.num_columns)]
+            projected = [chunk for chunk in chunks if chunk.path_in_schema in projection]
+            stats = chunks[time_index].statistics
+            has_stats = stats is not None and stats.has_min_max
+            rows.append({
+                "file": path,
+                "row_group": i,
+                "rows": group.num_rows,
+                "bytes": sum(chunk.total_compressed_size for chunk in chunks),
+                "projected_bytes": sum(chunk.total_compressed_size for chunk in projected),
+                "min": stats.min if has_stats else None,
+                "max": stats.max if has_stats else None,
+                "has_stats": has_stats,
+            })
+    return pd.DataFrame(rows)
+
+
+def footer_kept(groups, ds):
+    # a row group can only be skipped when its statistics prove max <= cutoff
+    return ~groups["has_stats"] | (groups["max"].where(groups["has_stats"], ds.cutoff) > ds.cutoff)
+
+
+def pyarrow_kept(ds):
+    kept = set()
+    for fragment in ds.arrow_dataset.get_fragments(filter=ds.arrow_filter):
+        for piece in fragment.split_by_row_group(ds.arrow_filter):
+            kept.update((fragment.path, group.id) for group in piece.row_groups)
+    return kept
+
+
+# Capture what native code writes to a file descriptor (the Polars verbose log goes straight to stderr)
+@contextmanager
+def captured_fd(fd=2):
+    sys.stderr.flush()
+    saved = os.dup(fd)
+    with tempfile.TemporaryFile(mode="w+b") as capture:
+        os.dup2(capture.fileno(), fd)
+        output = []
+        try:
+            yield output
+        finally:
+            os.dup2(saved, fd)
+            os.close(saved)
+            capture.seek(0)
+            output.append(capture.read().decode(errors="replace"))
+
+
+def polars_scan(ds, projection=None):
+    lf = pl.scan_parquet(ds.source).filter(pl.col(ds.time_column) > ds.cutoff).select(projection or columns(ds))
+    plan = lf.explain()
+    with captured_fd() as log, pl.Config(verbose=True):
+        lf.collect()
+    matches = ROW_GROUPS_READ.findall(log[0])
+    return {
+        "plan": plan,
+        "filter_pushed": "SELECTION:" in plan and "SCAN" in plan,
+        "projection": re.search(r"PROJECT (\d+/\d+) COLUMNS", plan),
+        "row_groups_read": sum(int(read) for read, _ in matches) if matches else None,
+    }
+
+
+def _scan_nodes(node):
+    if "PARQUET_SCAN" in (node.get("operator_name"), node.get("extra_info", {}).get("Function")):
+        yield node
+    for child in node.get("children", []):
+        yield from _scan_nodes(child)
+
+
+def duckdb_profile(ds, projection=None):
+    con = duckdb.connect()
+    con.execute("PRAGMA enable_profiling = 'json'")
+    profile = json.loads(con.execute(f"""
+        EXPLAIN ANALYZE
+        SELECT {", ".join(projection or columns(ds))}
+        FROM {ds.sql_source}
+        WHERE {ds.sql_filter}
+    """).fetchall()[0][1])
+    scans = list(_scan_nodes(profile))
+    info = [scan.get("extra_info", {}) for scan in scans]
+    return {
+        "filter_pushed": any(i.get("Filters") for i in info),
+        "projections": [p for i in info for p in i.get("Projections", [])],
+        "rows_scanned": sum(scan.get("operator_rows_scanned", 0) for scan in scans),
+        "rows_returned": sum(scan.get("operator_cardinality", 0) for scan in scans),
+        "files_read": sum(int(i.get("Total Files Read", 0)) for i in info),
+    }
+
+
+# Pruning report of one dataset, one row per engine
+def report(ds, engines=None, projection=None):
+    projection = projection or columns(ds)
+    groups = row_groups(ds, projection)
+    total = len(groups)
+    footer = footer_kept(groups, ds)
+    schema_columns = len(pq.read_schema(ds.files[0]))
+    projected = f"{len(projection)}/{schema_columns}"
+    rows = []
+
+    # `read` is the mask of the row groups measured as read, `read_count` their number when only that is measured
+    def add(engine, filter_pushed, columns_read, measured_by, read=None, read_count=None, **extra):
+        expected = groups[footer if filter_pushed in (None, True) else all_groups]
+        read_mb = groups[read]["projected_bytes"].sum() / 1024 ** 2 if read is not None else None
+        read_count = int(read.sum()) if read is not None else read_count
+        rows.append({
+            "Dataset": ds.name,
+            "Engine": registry.ENGINES.get(engine, engine),
+            "Filter Pushed": filter_pushed,
+            "Columns Read": columns_read,
+            "Row Groups Expected": len(expected),
+            "Row Groups Read": read_count,
+            "Row Groups Skipped": total - read_count if read_count is not None else None,
+            "MB Expected": expected["projected_bytes"].sum() / 1024 ** 2,
+            "MB Read": read_mb,
+            "MB Skipped": total_mb - read_mb if read_mb is not None else None,
+            "Measured By": measured_by,
+            **extra,
+        })
+
+    all_groups = pd.Series(True, index=groups.index)
+    total_mb = groups["projected_bytes"].sum() / 1024 ** 2
+    add("footer", None, projected, "min/max statistics",
+        **{"Row Groups Without Stats": int((~groups["has_stats"]).sum())})
+
+    engines = engines or list(registry.ENGINES)
+    # Pandas with filters= and the tuned Pandas reader both scan through pyarrow.dataset
+    pyarrow_engines = [engine for engine in ("pandas", "pandas_tuned") if engine in engines]
+    if pyarrow_engines:
+        kept = pyarrow_kept(ds)
+        for engine in pyarrow_engines:
+            read = pd.Series([(f, g) in kept for f, g in zip(groups["file"], groups["row_group"])], index=groups.index)
+            add(engine, True, projected, "pyarrow.dataset split_by_row_group", read)
+    if "polars" in engines:
+        add("polars", False, projected, "read_parquet has no predicate", all_groups)
+    if "polars_lazy" in engines:
+        scan = polars_scan(ds, projection)
+        # the verbose log has the number of row groups read, not which ones
+        add("polars_lazy", scan["filter_pushed"], scan["projection"].group(1) if scan["projection"] else "all",
+            "explain() + verbose log" if scan["row_groups_read"] is not None else "explain() only",
+            read_count=scan["row_groups_read"])
+    if "duckdb" in engines:
+        profile = duckdb_profile(ds, projection)
+        add("duckdb", profile["filter_pushed"],
+            f"{len(profile['projections'])}/{schema_columns}" if profile["projections"] else "all", "EXPLAIN ANALYZE",
+            **{"Files Read": profile["files_read"], "Rows Returned": profile["rows_returned"]})
+    return pd.DataFrame(rows)
+
+
+def reports(datasets, engines=None):
+    tables = [report(ds, engines) for ds in datasets if ds.files]
+    return pd.concat(tables, ignore_index=True) if tables else pd.DataFrame()
@@ -1,110 +1,138 @@
-from datetime import datetime
 import pandas as pd
 import polars as pl
+import duckdb
 import benchmark as bm
+import registry
+from registry import case
 
-FILE = "data/taxi_2019_04.parquet"
-FILTER = [("pickup_at", ">", datetime(2019, 6, 30))]
-COLUMNS = ["pickup_at", "total_amount"]  # subset for projection
+'''
+Pushdown comparisons for Pandas, Polars and DuckDB.
+
+The same filter (time column > the dataset's cutoff) and projection (time column and total_amount) are applied
+with no pushdown, projection pushdown only, filter pushdown only, and both. DuckDB always pushes both down, so it
+only appears as a reference for the full pushdown case.
+
+Run through the CLI (`python main.py run --suite pushdown`) or directly as a script for the per-engine plots.
+'''
+
+SUITE = "pushdown"
+DATASET = "single"
 TITLE_START = "1 File Read Benchmark"
 SHOW_PLOTS = False
 REPEAT_TIMES = 5
 
-### Pushdown comparisons for Pandas and Polars
+con = duckdb.connect()
+
+
+def columns(ds):
+    # subset for projection
+    return [ds.time_column, "total_amount"]
+
 
 ## Pandas pushdown methods
 # --- Full scan: read everything, filter after
-def pd_read_all_then_filter():
-    df = pd.read_parquet(FILE)
-    return df[df["pickup_at"] > pd.Timestamp("2019-06-30")][COLUMNS]
+@case(SUITE, "full_scan", "pandas", bm.PANDAS)
+def pd_read_all_then_filter(ds):
+    df = pd.read_parquet(ds.source)
+    return df[df[ds.time_column] > pd.Timestamp(ds.cutoff)][columns(ds)]
 
 # --- Projection pushdown only
-def pd_read_columns_then_filter():
-    df = pd.read_parquet(FILE, columns=COLUMNS)
-    return df[df["pickup_at"] > pd.Timestamp("2019-06-30")]
+@case(SUITE, "projection_pushdown", "pandas", bm.PANDAS)
+def pd_read_columns_then_filter(ds):
+    df = pd.read_parquet(ds.source, columns=columns(ds))
+    return df[df[ds.time_column] > pd.Timestamp(ds.cutoff)]
 
 # --- Filter pushdown (pyarrow backend)
-def pd_read_with_filter_pushdown():
-    return pd.read_parquet(FILE, engine="pyarrow", filters=FILTER)[COLUMNS]
+@case(SUITE, "filter_pushdown", "pandas", bm.PANDAS)
+def pd_read_with_filter_pushdown(ds):
+    return pd.read_parquet(ds.source, engine="pyarrow", filters=ds.filters)[columns(ds)]
 
 # --- Filter + projection pushdown
-def pd_read_with_filter_and_projection():
-    return pd.read_parquet(FILE, engine="pyarrow", columns=COLUMNS, filters=FILTER)
+@case(SUITE, "filter_and_projection_pushdown", "pandas", bm.PANDAS)
+def pd_read_with_filter_and_projection(ds):
+    return pd.read_parquet(ds.source, engine="pyarrow", columns=columns(ds), filters=ds.filters)
 
 ## Polars pushdown methods
 # Polars dataframes
 # --- Full scan: read everything, filter after
-def pl_read_all_then_filter():
-    df = pl.read_parquet(FILE)
-    return df.filter(pl.col("pickup_at") > datetime(2019, 6, 30)).select(COLUMNS)
+@case(SUITE, "full_scan", "polars", bm.POLARS)
+def pl_read_all_then_filter(ds):
+    df = pl.read_parquet(ds.source)
+    return df.filter(pl.col(ds.time_column) > ds.cutoff).select(columns(ds))
 
 # --- Projection pushdown only
-def pl_read_columns_then_filter():
-    df = pl.read_parquet(FILE, columns=COLUMNS)
-    return df.filter(pl.col("pickup_at") > datetime(2019, 6, 30))
+@case(SUITE, "projection_pushdown", "polars", bm.POLARS)
+def pl_read_columns_then_filter(ds):
+    df = pl.read_parquet(ds.source, columns=columns(ds))
+    return df.filter(pl.col(ds.time_column) > ds.cutoff)
 
 # --- Polars DataFrame cannot do filter pushdown directly like Pandas
 
 
 # Polars LazyFrames
-def pl_lazy_read_all_then_filter():
-    lf = pl.scan_parquet(FILE)
-    return lf.collect().filter(pl.col("pickup_at") > datetime(2019, 6, 30)).select(COLUMNS)
-
-def pl_lazy_read_columns_then_filter():
-    lf = pl.scan_parquet(FILE).select(COLUMNS)
-    return lf.collect().filter(pl.col("pickup_at") > datetime(2019, 6, 30))
-
-def pl_lazy_read_with_filter_pushdown():
-    lf = pl.scan_parquet(FILE).filter(pl.col("pickup_at") > datetime(2019, 6, 30))
-    return lf.collect().select(COLUMNS)
-
-def pl_lazy_read_with_filter_and_projection():
+@case(SUITE, "full_scan", "polars_lazy", bm.POLARS)
+def pl_lazy_read_all_then_filter(ds):
+    lf = pl.scan_parquet(ds.source)
+    return lf.collect().filter(pl.col(ds.time_column) > ds.cutoff).select(columns(ds))
+
+@case(SUITE, "projection_pushdown", "polars_lazy", bm.POLARS)
+def pl_lazy_read_columns_then_filter(ds):
+    lf = pl.scan_parquet(ds.source).select(columns(ds))
+    return lf.collect().filter(pl.col(ds.time_column) > ds.cutoff)
+
+@case(SUITE, "filter_pushdown", "polars_lazy", bm.POLARS)
+def pl_lazy_read_with_filter_pushdown(ds):
+    lf = pl.scan_parquet(ds.source).filter(pl.col(ds.time_column) > ds.cutoff)
+    return lf.collect().select(columns(ds))
+
+@case(SUITE, "filter_and_projection_pushdown", "polars_lazy", bm.POLARS)
+def pl_lazy_read_with_filter_and_projection(ds):
     lf = (
-        pl.scan_parquet(FILE)
-        .filter(pl.col("pickup_at") > datetime(2019, 6, 30))
-        .select(COLUMNS)
+        pl.scan_parquet(ds.source)
+        .filter(pl.col(ds.time_column) > ds.cutoff)
+        .select(columns(ds))
     )
     return lf.collect()
 
-# Benchmarks
-methods_pushdown_pd = {
-    "Full Scan (Pandas)": pd_read_all_then_filter,
-    "Projection Pushdown (Pandas)": pd_read_columns_then_filter,
-    "Filter Pushdown (Pandas)": pd_read_with_filter_pushdown,
-    "Filter And Projection Pushdown (Pandas)": pd_read_with_filter_and_projection,
-}
-
-methods_pushdown_pl_df = {
-    "Full Scan (Polars DataFrame)": pl_read_all_then_filter,
-    "Projection Pushdown (Polars DataFrame)": pl_read_columns_then_filter,
+## DuckDB reference: the optimizer always pushes both down
+@case(SUITE, "filter_and_projection_pushdown", "duckdb", bm.ARROW)
+def duckdb_read_with_filter_and_projection(ds):
+    return con.execute(f"""
+        SELECT {", ".join(columns(ds))}
+        FROM {ds.sql_source}
+        WHERE {ds.sql_filter}
+    """)
+
+
+WORKLOAD_LABELS = {
+    "full_scan": "Full Scan",
+    "projection_pushdown": "Projection Pushdown",
+    "filter_pushdown": "Filter Pushdown",
+    "filter_and_projection_pushdown": "Filter And Projection Pushdown",
 }
-methods_pushdown_pl_lf = {
-    "Full Scan (Polars LazyFrame)": pl_lazy_read_all_then_filter,
-    "Projection Pushdown (Polars LazyFrame)": pl_lazy_read_columns_then_filter,
-    "Filter Pushdown (Polars LazyFrame)": pl_lazy_read_with_filter_pushdown,
-    "Filter And Projection Pushdown (Polars LazyFrame)": pl_lazy_read_with_filter_and_projection,
+ENGINE_LABELS = {
+    "pandas": "Pandas",
+    "polars": "Polars DataFrame",
+    "polars_lazy": "Polars LazyFrame",
+    "duckdb": "DuckDB",
 }
 
-results_pushdown_pd = bm.run_benchmark(methods_pushdown_pd, runs=REPEAT_TIMES)
-results_pushdown_relative_pd = bm.relative_speeds(results_pushdown_pd)
-
-results_pushdown_pl_df = bm.run_benchmark(methods_pushdown_pl_df, runs=REPEAT_TIMES)
-results_pushdown_pl_df_relative = bm.relative_speeds(results_pushdown_pl_df)
-
-results_pushdown_pl_lf = bm.run_benchmark(methods_pushdown_pl_lf, runs=REPEAT_TIMES)
-results_pushdown_pl_lf_relative = bm.relative_speeds(results_pushdown_pl_lf)
-
-results_combined = {**results_pushdown_pd, **results_pushdown_pl_df, **results_pushdown_pl_lf}
 
-# Plotting the results
-bm.plot_results(results_pushdown_pd, f"{TITLE_START}: Pushdown Methods (Pandas)", "speed_pushdown_methods_pandas.png")
-bm.plot_results(results_pushdown_relative_pd, f"{TITLE_START}: Pushdown Methods (Pandas)", relative=True, show=SHOW_PLOTS)
+if __name__ == "__main__":
+    # Benchmarks
+    dataset = registry.DATASETS[DATASET]
+    results = registry.run_cases(registry.select(suites=[SUITE]), [dataset], runs=REPEAT_TIMES)
+    results_by_engine = {}
+    for result in results:
+        label = f"{WORKLOAD_LABELS[result.case.workload]} ({ENGINE_LABELS[result.case.engine]})"
+        results_by_engine.setdefault(result.case.engine, {})[label] = result.timing
 
-bm.plot_results(results_pushdown_pl_df, f"{TITLE_START}: Pushdown Methods (Polars DataFrame)", "speed_pushdown_methods_polars.png")
-bm.plot_results(results_pushdown_pl_df_relative, f"{TITLE_START}: Pushdown Methods (Polars DataFrame)", relative=True, show=SHOW_PLOTS)
+    results_combined = {label: timing for engine_results in results_by_engine.values() for label, timing in engine_results.items()}
 
-bm.plot_results(results_pushdown_pl_lf, f"{TITLE_START}: Pushdown Methods (Polars LazyFrame)", "speed_pushdown_methods_polars_lazy.png")
-bm.plot_results(results_pushdown_pl_lf_relative, f"{TITLE_START}: Pushdown Methods (Polars LazyFrame)", relative=True, show=SHOW_PLOTS)
+    # Plotting the results
+    for engine, image in [("pandas", "speed_pushdown_methods_pandas.png"), ("polars", "speed_pushdown_methods_polars.png"), ("polars_lazy", "speed_pushdown_methods_polars_lazy.png")]:
+        engine_results = results_by_engine[engine]
+        bm.plot_results(engine_results, f"{TITLE_START}: Pushdown Methods ({ENGINE_LABELS[engine]})", image)
+        bm.plot_results(bm.relative_speeds(engine_results), f"{TITLE_START}: Pushdown Methods ({ENGINE_LABELS[engine]})", relative=True, show=SHOW_PLOTS)
 
-bm.plot_results(results_combined, f"{TITLE_START}: Pushdown Methods Combined", "speed_pushdown_methods.png", xtick_rotation=30)
\ No newline at end of file
+    bm.plot_results(results_combined, f"{TITLE_START}: Pushdown Methods Combined", "speed_pushdown_methods.png", xtick_rotation=30)
@@ -0,0 +1,364 @@
+import glob
+import importlib
+import os
+import shutil
+import sys
+import traceback
+from dataclasses import dataclass
+from datetime import datetime
+from functools import cached_property, partial
+
+import pyarrow as pa
+import pyarrow.dataset as pads
+import pyarrow.parquet as pq
+
+import benchmark as bm
+import page_cache
+
+'''
+Declarative registry of benchmark datasets and cases.
+
+A case is one (suite, workload, engine) combination, declared once with the `case` decorator in the suite module
+that owns it. Case functions take the `Dataset` to run against as their only argument, so the same declaration runs
+on the single-file and the multi-file data (or any dataset registered later) in the same process. Suite modules
+only declare cases when imported; running them is left to `run_cases` (used by `main.py`) or to the module's own
+`__main__` block.
+
+A case that reads inputs derived from the dataset (a CSV copy, a partitioned copy, generated tables) declares a
+`prepare(dataset)` function that builds them. It is called once before the case is timed, so building the inputs is
+never part of a timed run, whatever the number of warmup runs. `staged_path` builds such an input once on disk, and
+a `prepare` that stages inputs on disk returns their path, so the cache modes of `page_cache` cover them too.
+
+Variables:
+- `SUITE_MODULES`: Modules that declare cases, imported by `load_suites`.
+- `ENGINES`: Engine names and the labels used in plots.
+- `COLUMNS`: Candidate column names for each role, across the taxi schemas, looked up by `Dataset.column`.
+- `DATASETS`: Registered datasets by name.
+- `CASES`: Registered cases, in declaration order.
+- `REPORTS`: Extra per-suite tables (e.g. throughput) printed after the timings, registered with `register_report`.
+'''
+
+SUITE_MODULES = [
+    "time_comparisons",
+    "pushdown_comparisons",
+    "polars_sink_write_comparisons",
+    "duckdb_experimenting",
+    "csv_parquet_read_write",
+    "partition_comparisons",
+    "groupby_comparisons",
+    "join_comparisons",
+    "out_of_core_comparisons",
+    "interop_comparisons",
+    "index_comparisons",
+    "json_comparisons",
+    "excel_comparisons",
+    "spatial_comparisons",
+    "timeseries_comparisons",
+    "sort_comparisons",
+]
+
+ENGINES = {
+    "pandas": "Pandas",
+    "pandas_tuned": "Pandas (Tuned)",
+    "polars": "Polars",
+    "polars_lazy": "Polars Lazy",
+    "duckdb": "DuckDB",
+    "pyarrow": "PyArrow",
+    "numpy": "NumPy",
+    "shapely": "Shapely",
+}
+
+COLUMNS = {
+    "passenger_count": ["passenger_count"],
+    "vendor": ["vendor_id", "VendorID"],
+    "pickup_location": ["pickup_location_id", "PULocationID"],
+    "dropoff_location": ["dropoff_location_id", "DOLocationID"],
+}
+
+DATASETS = {}
+CASES = []
+REPORTS = {}
+
+
+@dataclass(frozen=True)
+class Dataset:
+    name: str
+    path: str  # a single Parquet file or a glob
+    time_column: str
+    cutoff: datetime  # filter workloads keep rows with time_column > cutoff
+    description: str = ""
+
+    @property
+    def files(self):
+        return sorted(glob.glob(self.path))
+
+    @property
+    def source(self):
+        # what pd/pl read functions accept: one path, or a list of paths for multi-file datasets
+        files = self.files
+        return files[0] if len(files) == 1 else files
+
+    @property
+    def sql_source(self):
+        return f"'{self.path}'"
+
+    @property
+    def filters(self):
+        return [(self.time_column, ">", self.cutoff)]
+
+    @property
+    def sql_filter(self):
+        return f"{self.time_column} > '{self.cutoff:%Y-%m-%d %H:%M:%S}'"
+
+    @property
+    def arrow_filter(self):
+        return pads.field(self.time_column) > pa.scalar(self.cutoff, type=pa.timestamp("us"))
+
+    @cached_property
+    def arrow_schema(self):
+        # a schema that all the files can be cast to (the monthly files differ), from their footers once per process
+        return pa.unify_schemas([pq.read_schema(f) for f in self.files], promote_options="permissive")
+
+    @property
+    def arrow_dataset(self):
+        return pads.dataset(self.files, schema=self.arrow_schema, format="parquet")
+
+    @cached_property
+    def num_rows(self):
+        return sum(pq.ParquetFile(f).metadata.num_rows for f in self.files)
+
+    def column(self, role):
+        # the 2019 and 2022 schemas name the vendor and location columns differently
+        names = set(self.arrow_schema.names)
+        found = [c for c in COLUMNS[role] if c in names]
+        if not found:
+            raise KeyError(f"Dataset {self.name!r} has none of the {role} columns {COLUMNS[role]}")
+        return found[0]
+
+
+@dataclass(frozen=True)
+class Case:
+    suite: str
+    workload: str
+    engine: str
+    func: object
+    output: str = None
+    variant: str = ""
+    datasets: tuple = None  # None runs on every dataset
+    prepare: object = None  # builds the case's derived inputs for a dataset, outside the timed runs
+
+    @property
+    def name(self):
+        parts = [self.suite, self.workload, self.engine] + ([self.variant] if self.variant else [])
+        return "/".join(parts)
+
+    @property
+    def label(self):
+        label = ENGINES.get(self.engine, self.engine)
+        return f"{label} {self.variant}" if self.variant else label
+
+    def applies_to(self, dataset):
+        return self.datasets is None or dataset.name in self.datasets
+
+    def bind(self, dataset):
+        return partial(self.func, dataset)
+
+    @property
+    def connection(self):
+        # the module-level DuckDB `con` of a DuckDB case's suite, for memory statistics
+        if self.engine != "duckdb":
+            return None
+        con = getattr(sys.modules.get(self.func.__module__), "con", None)
+        return con if hasattr(con, "execute") else None
+
+
+@dataclass
+class CaseResult:
+    case: Case
+    dataset: Dataset
+    timing: bm.TimingResult = None
+    cache: str = None
+    error: str = None
+    threads: int = None  # thread cap of every engine, None for the engines' defaults
+    memory_cap: int = None  # data segment cap of the case's process in bytes, None for no cap
+
+    @property
+    def label(self):
+        return f"{self.case.label} ({self.cache})" if self.cache else self.case.label
+
+
+def register_dataset(name, path, time_column, cutoff, description=""):
+    dataset = Dataset(name, path, time_column, cutoff, description)
+    DATASETS[name] = dataset
+    return dataset
+
+
+def register(suite, workload, engine, func, output=None, variant="", datasets=None, prepare=None):
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}, expected one of {list(ENGINES)}")
+    new_case = Case(suite, workload, engine, func, output, variant, tuple(datasets) if datasets else None, prepare)
+    if any(c.name == new_case.name for c in CASES):
+        raise ValueError(f"Case {new_case.name!r} is already registered")
+    CASES.append(new_case)
+    return new_case
+
+
+# Decorator form of `register`
+def case(suite, workload, engine, output=None, variant="", datasets=None, prepare=None):
+    def decorator(func):
+        register(suite, workload, engine, func, output, variant, datasets, prepare)
+        return func
+    return decorator
+
+
+# `func(results)` turns a suite's CaseResults into a DataFrame shown next to the timings
+def register_report(suite, func):
+    REPORTS[suite] = func
+    return func
+
+
+def load_suites(modules=None):
+    for module in modules or SUITE_MODULES:
+        importlib.import_module(module)
+
+
+def get_case(name):
+    for c in CASES:
+        if c.name == name:
+            return c
+    raise KeyError(f"No case named {name!r}")
+
+
+def suites():
+    return list(dict.fromkeys(c.suite for c in CASES))
+
+
+def workloads(suite=None):
+    return list(dict.fromkeys(c.workload for c in CASES if suite is None or c.suite == suite))
+
+
+def select(suites=None, workloads=None, engines=None):
+    return [
+        c for c in CASES
+        if (not suites or c.suite in suites)
+        and (not workloads or c.workload in workloads)
+        and (not engines or c.engine in engines)
+    ]
+
+
+def get_datasets(names=None):
+    if not names:
+        return list(DATASETS.values())
+    unknown = [name for name in names if name not in DATASETS]
+    if unknown:
+        raise ValueError(f"Unknown datasets {unknown}, expected some of {list(DATASETS)}")
+    return [DATASETS[name] for name in names]
+
+
+# (case, dataset) pairs to run, skipping datasets without files
+def plan(cases, datasets):
+    pairs = []
+    for dataset in datasets:
+        if not dataset.files:
+            print(f"Skipping dataset {dataset.name!r}: no files match {dataset.path}")
+            continue
+        pairs.extend((c, dataset) for c in cases if c.applies_to(dataset))
+    return pairs
+
+
+# Run every selected case on every dataset it applies to, in this process (see `executor` for process isolation).
+# A failing case is recorded with its error and the others still run.
+def run_cases(cases, datasets, runs=5, cache=None, **timing_kwargs):
+    results = []
+    for c, dataset in plan(cases, datasets):
+        try:
+            with page_cache.prepared(dataset, cache, c.prepare) as (run_dataset, setup):
+                timing = bm.timing(
+                    c.bind(run_dataset), runs=runs, label=c.label, output=c.output, setup=setup, con=c.connection,
+                    **timing_kwargs,
+                )
+        except KeyboardInterrupt:
+            raise
+        except BaseException:
+            # Polars panics raise pyo3's PanicException, a BaseException
+            error = traceback.format_exc()
+            print(f"FAILED {c.name} on {dataset.name}:\n{error}")
+            results.append(CaseResult(c, dataset, None, cache, error))
+            continue
+        results.append(CaseResult(c, dataset, timing, cache))
+    return results
+
+
+# Path of a file (or with `directory`, a directory) derived from the dataset's files and any other `sources`, built
+# with `build(staging)` when it is missing or older than them. `build` writes to a staging path next to `path`, which
+# is renamed into place once it returns, so an interrupted build is never mistaken for a finished one.
+def staged_path(dataset, path, build, sources=(), directory=False):
+    newest = max(os.path.getmtime(f) for f in dataset.files + list(sources))
+    if os.path.exists(path) and os.path.getmtime(path) >= newest:
+        return path
+    if directory:
+        staging = f"{path}.partial"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+    else:
+        # keeps the extension, for writers that pick the format from it
+        root, extension = os.path.splitext(path)
+        staging = f"{root}.partial{extension}"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if os.path.exists(staging):
+            os.remove(staging)
+    build(staging)
+    if directory:
+        shutil.rmtree(path, ignore_errors=True)
+    os.replace(staging, path)
+    return path
+
+
+# Group results into {(suite, workload, dataset): {label: TimingResult}} for plotting
+def group_results(results):
+    grouped = {}
+    for result in results:
+        if result.timing is None:
+            continue
+        key = (result.case.suite, result.case.workload, result.dataset.name)
+        grouped.setdefault(key, {})[result.label] = result.timing
+    return grouped
+
+
+### Datasets
+SINGLE_FILE = "data/taxi_2019_04.parquet"
+MULTI_FILE_PATH = "data/taxi/yellow*.parquet"
+
+register_dataset(
+    "single", SINGLE_FILE, "pickup_at", datetime(2019, 6, 30),
+    "One taxi Parquet file (2019 schema)",
+)
+# a cutoff instead of the old EXTRACT(MONTH ...) >= 7 filter, so min/max statistics can prune. With whole-second
+# timestamps the two keep the same 2022 rows, but the yellow files also hold a few rows with mistyped years (2002,
+# 2008, 2009, 2021, 2023, ...): the old filter kept those from July to December of any year, the cutoff keeps those
+# after 2022-06-30. Count the rows where they differ with
+#   SELECT count(*) FROM 'data/taxi/yellow*.parquet'
+#   WHERE (month(tpep_pickup_datetime) >= 7) <> (tpep_pickup_datetime > '2022-06-30 23:59:59')
+# The synthetic files only have 2022 timestamps, where the two are equivalent.
+register_dataset(
+    "multi", MULTI_FILE_PATH, "tpep_pickup_datetime", datetime(2022, 6, 30, 23, 59, 59),
+    "Monthly yellow taxi Parquet files (2022 schema)",
+)
+# generated by `python main.py generate` (see generate_data.py), same schemas and cutoffs as above
+register_dataset(
+    "synthetic_single", "data/synthetic/taxi_2019_04.parquet", "pickup_at", datetime(2019, 6, 30),
+    "Synthetic taxi file (2019 schema)",
+)
+register_dataset(
+    "synthetic_multi", "data/synthetic/taxi/yellow_tripdata_*.parquet", "tpep_pickup_datetime",
+    datetime(2022, 6, 30, 23, 59, 59),
+    "Synthetic yellow taxi files (2022 schema)",
+)
+# generated by `python main.py generate --scales 1 10 100`, one dataset per scale found on disk
+for directory in sorted(glob.glob("data/synthetic/scale_*m"), key=lambda d: float(d.rsplit("_", 1)[1][:-1])):
+    scale = directory.rsplit("_", 1)[1]
+    register_dataset(
+        f"synthetic_{scale}", f"{directory}/yellow_tripdata_*.parquet", "tpep_pickup_datetime",
+        datetime(2022, 6, 30, 23, 59, 59),
+        f"Synthetic yellow taxi files, {scale[:-1]}M rows (2022 schema)",
+    )
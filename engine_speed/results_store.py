@@ -0,0 +1,293 @@
+import hashlib
+import os
+import platform
+import subprocess
+import uuid
+from datetime import datetime
+from importlib import metadata
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+'''
+Persistent history of benchmark results with regression detection.
+
+Every run of `python main.py run` appends one row per (case, dataset, cache mode) to a DuckDB database, together
+with the raw run times, the memory profile, the engine versions, CPU count, git SHA and a fingerprint of the
+dataset files. `compare` then checks a candidate run against a baseline run, or against a rolling baseline made of
+the previous N runs pooled together, and flags the cases whose median changed significantly.
+
+A change is significant when the bootstrap confidence interval of the candidate/baseline median ratio lies
+entirely above (regression) or below (improvement) 1, and the ratio itself moved by more than `threshold`.
+
+Variables:
+- `DB_PATH`: Default results database.
+- `PACKAGES`: Packages whose versions are recorded with every run.
+'''
+
+DB_PATH = "results/history.duckdb"
+PACKAGES = ["pandas", "polars", "duckdb", "pyarrow", "numpy"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    run_id VARCHAR,
+    started_at TIMESTAMP,
+    git_sha VARCHAR,
+    git_dirty BOOLEAN,
+    hostname VARCHAR,
+    platform VARCHAR,
+    python_version VARCHAR,
+    cpu_count INTEGER,
+    pandas_version VARCHAR,
+    polars_version VARCHAR,
+    duckdb_version VARCHAR,
+    pyarrow_version VARCHAR,
+    numpy_version VARCHAR,
+    suite VARCHAR,
+    workload VARCHAR,
+    engine VARCHAR,
+    variant VARCHAR,
+    case_name VARCHAR,
+    dataset VARCHAR,
+    dataset_fingerprint VARCHAR,
+    cache VARCHAR,
+    threads INTEGER,
+    memory_cap BIGINT,
+    output VARCHAR,
+    error VARCHAR,
+    runs INTEGER,
+    warmup INTEGER,
+    median DOUBLE,
+    mean DOUBLE,
+    stddev DOUBLE,
+    p5 DOUBLE,
+    p95 DOUBLE,
+    ci_low DOUBLE,
+    ci_high DOUBLE,
+    times DOUBLE[],
+    peak_rss BIGINT,
+    peak_rss_increase BIGINT,
+    arrow_allocated BIGINT,
+    arrow_peak BIGINT,
+    python_peak BIGINT,
+    python_growth BIGINT,
+    duckdb_memory_usage BIGINT,
+    duckdb_memory_limit VARCHAR,
+    duckdb_spill BIGINT
+)
+"""
+
+# columns added after the first release of the schema, for databases created before them
+MIGRATIONS = [
+    "ALTER TABLE results ADD COLUMN IF NOT EXISTS threads INTEGER",
+    "ALTER TABLE results ADD COLUMN IF NOT EXISTS duckdb_spill BIGINT",
+    "ALTER TABLE results ADD COLUMN IF NOT EXISTS memory_cap BIGINT",
+]
+
+MEMORY_FIELDS = [
+    "peak_rss", "peak_rss_increase", "arrow_allocated", "arrow_peak", "python_peak", "python_growth",
+    "duckdb_memory_usage", "duckdb_memory_limit", "duckdb_spill",
+]
+
+
+def _git(*args):
+    try:
+        return subprocess.run(
+            ["git", *args], capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _version(package):
+    try:
+        return metadata.version(package)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def environment():
+    sha = _git("rev-parse", "HEAD")
+    status = _git("status", "--porcelain", "--untracked-files=no")
+    env = {
+        "git_sha": sha,
+        "git_dirty": bool(status) if status is not None else None,
+        "hostname": platform.node(),
+        "platform": platform.platform(),
+        "python_version": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+    }
+    for package in PACKAGES:
+        env[f"{package}_version"] = _version(package)
+    return env
+
+
+# Cheap fingerprint of a dataset's files: names, sizes and modification times
+def dataset_fingerprint(dataset):
+    digest = hashlib.sha256()
+    for path in dataset.files:
+        stat = os.stat(path)
+        digest.update(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:16]
+
+
+def connect(db_path=DB_PATH):
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    con = duckdb.connect(db_path)
+    con.execute(SCHEMA)
+    for migration in MIGRATIONS:
+        con.execute(migration)
+    return con
+
+
+def _rows(results, run_id, started_at, env):
+    fingerprints = {}
+    rows = []
+    for result in results:
+        dataset = result.dataset
+        if dataset.name not in fingerprints:
+            fingerprints[dataset.name] = dataset_fingerprint(dataset)
+        row = {
+            "run_id": run_id,
+            "started_at": started_at,
+            **env,
+            "suite": result.case.suite,
+            "workload": result.case.workload,
+            "engine": result.case.engine,
+            "variant": result.case.variant,
+            "case_name": result.case.name,
+            "dataset": dataset.name,
+            "dataset_fingerprint": fingerprints[dataset.name],
+            "cache": result.cache,
+            "threads": result.threads,
+            "memory_cap": result.memory_cap,
+            "output": result.case.output,
+            "error": result.error,
+        }
+        timing = result.timing
+        if timing is not None:
+            ci_low, ci_high = timing.ci
+            row.update({
+                "runs": timing.runs, "warmup": timing.warmup, "median": timing.median, "mean": timing.mean,
+                "stddev": timing.stddev, "p5": timing.p5, "p95": timing.p95, "ci_low": ci_low, "ci_high": ci_high,
+                "times": [float(t) for t in timing.times],
+            })
+            if timing.memory is not None:
+                row.update({name: getattr(timing.memory, name) for name in MEMORY_FIELDS})
+        rows.append(row)
+    return rows
+
+
+# Append a run to the history, returns its run id
+def save(results, db_path=DB_PATH, run_id=None):
+    started_at = datetime.now()
+    run_id = run_id or f"{started_at:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}"
+    rows = _rows(results, run_id, started_at, environment())
+    if not rows:
+        return run_id
+    con = connect(db_path)
+    try:
+        columns = [column for column, *_ in con.execute("DESCRIBE results").fetchall()]
+        df = pd.DataFrame(rows).reindex(columns=columns)
+        con.register("new_results", df)
+        con.execute("INSERT INTO results SELECT * FROM new_results")
+    finally:
+        con.close()
+    return run_id
+
+
+def history(db_path=DB_PATH, limit=20):
+    con = connect(db_path)
+    try:
+        return con.execute("""
+            SELECT run_id, min(started_at) AS started_at, any_value(git_sha)[:10] AS git_sha,
+                   any_value(polars_version) AS polars, any_value(duckdb_version) AS duckdb,
+                   any_value(pandas_version) AS pandas, any_value(pyarrow_version) AS pyarrow,
+                   count(*) AS cases, count(error) AS errors
+            FROM results
+            GROUP BY run_id
+            ORDER BY started_at DESC
+            LIMIT ?
+        """, [limit]).df()
+    finally:
+        con.close()
+
+
+def load(db_path=DB_PATH):
+    con = connect(db_path)
+    try:
+        return con.execute("SELECT * FROM results WHERE error IS NULL ORDER BY started_at").df()
+    finally:
+        con.close()
+
+
+# Percentile bootstrap CI of median(candidate) / median(baseline)
+def ratio_ci(baseline, candidate, confidence=0.95, samples=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    baseline = np.asarray(baseline, dtype=float)
+    candidate = np.asarray(candidate, dtype=float)
+    base = np.median(rng.choice(baseline, size=(samples, len(baseline))), axis=1)
+    cand = np.median(rng.choice(candidate, size=(samples, len(candidate))), axis=1)
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(cand / base, [alpha, 1 - alpha])
+    return float(low), float(high)
+
+
+# Compare `candidate` (default: latest run) with `baseline` (a run id), or with the previous `rolling` runs pooled
+def compare(candidate=None, baseline=None, rolling=None, threshold=0.05, confidence=0.95, db_path=DB_PATH):
+    df = load(db_path)
+    if df.empty:
+        raise ValueError(f"No results stored in {db_path}")
+    runs = df.groupby("run_id")["started_at"].min().sort_values()
+    run_ids = list(runs.index)
+    candidate = candidate or run_ids[-1]
+    if candidate not in run_ids:
+        raise ValueError(f"Unknown run {candidate!r}")
+    earlier = run_ids[:run_ids.index(candidate)]
+    if baseline is not None:
+        if baseline not in run_ids:
+            raise ValueError(f"Unknown run {baseline!r}")
+        baseline_ids = [baseline]
+    else:
+        if not earlier:
+            raise ValueError(f"No run before {candidate!r} to compare against")
+        baseline_ids = earlier[-(rolling or 1):]
+
+    key = ["case_name", "dataset", "cache", "threads", "memory_cap"]
+    candidate_rows = df[df["run_id"] == candidate]
+    baseline_rows = df[df["run_id"].isin(baseline_ids)]
+    rows = []
+    for _, row in candidate_rows.iterrows():
+        match = baseline_rows
+        for column in key:
+            match = match[match[column].isna()] if pd.isna(row[column]) else match[match[column] == row[column]]
+        if match.empty:
+            continue
+        base_times = np.concatenate([np.asarray(t, dtype=float) for t in match["times"]])
+        cand_times = np.asarray(row["times"], dtype=float)
+        ratio = np.median(cand_times) / np.median(base_times)
+        low, high = ratio_ci(base_times, cand_times, confidence)
+        if low > 1 and ratio > 1 + threshold:
+            verdict = "REGRESSION"
+        elif high < 1 and ratio < 1 - threshold:
+            verdict = "improvement"
+        else:
+            verdict = ""
+        rows.append({
+            "Case": row["case_name"],
+            "Dataset": row["dataset"],
+            "Cache": row["cache"],
+            "Threads": row["threads"],
+            "Memory Cap": row["memory_cap"],
+            "Baseline (s)": float(np.median(base_times)),
+            "Candidate (s)": float(np.median(cand_times)),
+            "Ratio": ratio,
+            "CI Low": low,
+            "CI High": high,
+            "Fingerprint Changed": set(match["dataset_fingerprint"]) != {row["dataset_fingerprint"]},
+            "Verdict": verdict,
+        })
+    return candidate, baseline_ids, pd.DataFrame(rows)
@@ -0,0 +1,203 @@
+import os
+from functools import cache
+
+import duckdb
+import pandas as pd
+import polars as pl
+
+import benchmark as bm
+import registry
+from groupby_comparisons import plot_by_rows
+
+'''
+Ordering comparisons for Pandas, Polars (eager and lazy) and DuckDB: full sorts, top-k, distinct values and exact and
+approximate distinct counts, on input sorted by the key and on the same rows in their original order.
+
+The inputs are written once per dataset under `data/sorting/<dataset>/` before the first run, and rewritten when the
+source files change, with the same column names for every taxi schema (`pickup_at`, `pickup_location`,
+`total_amount`, `trip_distance`):
+- `unsorted.parquet`: the trips in the order of the source files
+- `sorted.parquet`: the same trips ordered by `total_amount`, the key of every workload
+
+Every case has a `[sorted]` and an `[unsorted]` variant. On the sorted input Polars gets the sorted flag
+(`set_sorted`), so sorting is a no-op, top-k a slice and `unique` a linear scan; Pandas and DuckDB get no hint and
+only benefit from what they detect themselves.
+
+Workloads:
+- `sort`: every trip ordered by total_amount (`sort_values`, `sort`, `ORDER BY`)
+- `top_k`: the `TOP_K` most expensive trips (`nlargest`, `top_k`, `ORDER BY ... DESC LIMIT`)
+- `distinct`: the distinct fares (`drop_duplicates`, `unique`, `DISTINCT`)
+- `distinct_pairs`: the distinct (pickup location, fare) pairs
+- `count_distinct`: the exact number of distinct fares (`nunique`, `n_unique`, `count(DISTINCT ...)`)
+- `approx_count_distinct`: the same count estimated with HyperLogLog (`approx_n_unique`, `approx_count_distinct`);
+  Pandas has no approximate count
+
+For the 1M to 100M+ row scaling, generate the `synthetic_<N>m` datasets first (`python main.py generate --scales 1 10
+100`) and run `python main.py run --suite sorting --dataset synthetic_1m synthetic_10m synthetic_100m --isolate`.
+
+Variables:
+- `SUITE`: Name of the suite in the registry.
+- `SORTING_DIR`: Where the inputs are written.
+- `KEY`: Sort and distinct key of every workload.
+- `TOP_K`: Rows returned by the top-k workload.
+- `WORKLOADS`: (engine, function, output) of every workload.
+- `REPEAT_TIMES`: Number of times each function will be run when this file is run as a script.
+- `con`: DuckDB connection object for executing SQL queries.
+'''
+
+# parameters
+SUITE = "sorting"
+SORTING_DIR = "data/sorting"
+KEY = "total_amount"
+TOP_K = 10
+TIME = "pickup_at"
+LOCATION = "pickup_location"
+REPEAT_TIMES = 3
+TITLES = {"single": "Single File", "multi": "Multiple Files"}
+
+# init
+con = duckdb.connect()
+con.execute(f"SET temp_directory = '{SORTING_DIR}/spill'")
+
+
+### Generating the inputs
+def _write_inputs(ds, directory):
+    trips = f"""
+        SELECT CAST({ds.time_column} AS TIMESTAMP) AS {TIME}, {ds.column("pickup_location")} AS {LOCATION},
+            total_amount, trip_distance
+        FROM {ds.sql_source}
+    """
+    con.execute(f"COPY ({trips}) TO '{directory}/unsorted.parquet' (FORMAT parquet)")
+    con.execute(f"COPY ({trips} ORDER BY {KEY}) TO '{directory}/sorted.parquet' (FORMAT parquet)")
+
+
+# Directory of the inputs of a dataset; regenerated when the source files are newer
+@cache
+def sorting_inputs(ds):
+    return registry.staged_path(
+        ds, os.path.join(SORTING_DIR, ds.name), lambda directory: _write_inputs(ds, directory), directory=True,
+    )
+
+
+def input_path(ds, sorted_input):
+    return os.path.join(sorting_inputs(ds), "sorted.parquet" if sorted_input else "unsorted.parquet")
+
+
+### Pandas
+def pandas_sort(df):
+    return df.sort_values(KEY, ignore_index=True)
+
+
+def pandas_top_k(df):
+    return df.nlargest(TOP_K, KEY)
+
+
+def pandas_distinct(df):
+    return df[[KEY]].drop_duplicates()
+
+
+def pandas_distinct_pairs(df):
+    return df[[LOCATION, KEY]].drop_duplicates()
+
+
+def pandas_count_distinct(df):
+    return df[KEY].nunique()
+
+
+def pandas_case(func):
+    return lambda ds, sorted_input: func(pd.read_parquet(input_path(ds, sorted_input)))
+
+
+### Polars: the same functions for DataFrames and LazyFrames
+def polars_sort(df):
+    return df.sort(KEY)
+
+
+def polars_top_k(df):
+    return df.top_k(TOP_K, by=KEY)
+
+
+def polars_distinct(df):
+    return df.select(pl.col(KEY).unique())
+
+
+def polars_distinct_pairs(df):
+    return df.select(LOCATION, KEY).unique()
+
+
+def polars_count_distinct(df):
+    return df.select(pl.col(KEY).n_unique())
+
+
+def polars_approx_count_distinct(df):
+    return df.select(pl.col(KEY).approx_n_unique())
+
+
+def polars_case(func, lazy):
+    read = pl.scan_parquet if lazy else pl.read_parquet
+
+    def run(ds, sorted_input):
+        df = read(input_path(ds, sorted_input))
+        # the sorted input tells Polars so, which is all the sorted-data fast paths need
+        result = func(df.with_columns(pl.col(KEY).set_sorted()) if sorted_input else df)
+        return result.collect() if lazy else result
+    return run
+
+
+### DuckDB
+SQL = {
+    "sort": lambda source: f"SELECT * FROM {source} ORDER BY {KEY}",
+    "top_k": lambda source: f"SELECT * FROM {source} ORDER BY {KEY} DESC LIMIT {TOP_K}",
+    "distinct": lambda source: f"SELECT DISTINCT {KEY} FROM {source}",
+    "distinct_pairs": lambda source: f"SELECT DISTINCT {LOCATION}, {KEY} FROM {source}",
+    "count_distinct": lambda source: f"SELECT count(DISTINCT {KEY}) FROM {source}",
+    "approx_count_distinct": lambda source: f"SELECT approx_count_distinct({KEY}) FROM {source}",
+}
+
+
+def duckdb_case(workload):
+    return lambda ds, sorted_input: con.execute(SQL[workload](f"'{input_path(ds, sorted_input)}'"))
+
+
+### Registering every (workload, engine, variant)
+# The counts are one number: an int from Pandas and DuckDB, a 1x1 DataFrame from Polars
+def engine_funcs(workload, pandas_func, polars_func, count=False):
+    funcs = [("pandas", pandas_case(pandas_func), bm.COUNT if count else bm.PANDAS)] if pandas_func else []
+    return funcs + [
+        ("polars", polars_case(polars_func, lazy=False), bm.POLARS),
+        ("polars_lazy", polars_case(polars_func, lazy=True), bm.POLARS),
+        ("duckdb", duckdb_case(workload), bm.COUNT if count else bm.ARROW),
+    ]
+
+
+WORKLOADS = {
+    "sort": engine_funcs("sort", pandas_sort, polars_sort),
+    "top_k": engine_funcs("top_k", pandas_top_k, polars_top_k),
+    "distinct": engine_funcs("distinct", pandas_distinct, polars_distinct),
+    "distinct_pairs": engine_funcs("distinct_pairs", pandas_distinct_pairs, polars_distinct_pairs),
+    "count_distinct": engine_funcs("count_distinct", pandas_count_distinct, polars_count_distinct, count=True),
+    "approx_count_distinct": engine_funcs("approx_count_distinct", None, polars_approx_count_distinct, count=True),
+}
+for workload, funcs in WORKLOADS.items():
+    for sorted_input in (True, False):
+        for engine, func, output in funcs:
+            registry.register(
+                SUITE, workload, engine, lambda ds, func=func, sorted_input=sorted_input: func(ds, sorted_input),
+                output, "sorted" if sorted_input else "unsorted", prepare=sorting_inputs,
+            )
+
+
+if __name__ == "__main__":
+    ### Run benchmarks on the taxi files and on any generated scale datasets
+    scaled = [ds.name for ds in registry.get_datasets() if ds.name.startswith("synthetic_") and ds.name.endswith("m")]
+    datasets = registry.get_datasets(list(TITLES) + scaled)
+    results = registry.run_cases(registry.select(suites=[SUITE]), datasets, runs=REPEAT_TIMES)
+
+    ### Plotting results for each workload, sorted and unsorted side by side
+    for (_, workload, dataset), timings in registry.group_results(results).items():
+        title = TITLES.get(dataset, dataset)
+        bm.plot_results(timings, f"{title}: {workload}", f"speed_sorting_{workload}_{dataset}.png", xtick_rotation=30)
+    if scaled:
+        for workload in registry.workloads(SUITE):
+            plot_by_rows([r for r in results if r.dataset.name in scaled], workload,
+                         f"scaling_rows_sorting_{workload}.png", title="Ordering Scaling")
@@ -0,0 +1,324 @@
+import importlib.util
+import json
+import time
+from functools import cache
+
+import duckdb
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import benchmark as bm
+import registry
+
+'''
+Point-in-polygon: assigning generated pickup points to the NYC neighborhoods of
+`data/citibike/nyc-neighborhoods.geojson` and counting the points per neighborhood.
+
+One point per trip of the dataset is generated uniformly over the neighborhoods' bounding box (`SEED`), so some points
+fall outside every neighborhood (water, New Jersey) and are not counted. The points, the polygons and the indexes are
+built once per process before each case is timed. A point inside several neighborhoods (shared borders) goes to the
+first one, so every method gives the same counts.
+
+Methods (`<engine> [<variant>]`):
+- NumPy `[bbox_scan]`: every point against every neighborhood's bounding box, then an even-odd ray casting test of the
+  points inside the box, vectorized over the points one polygon edge at a time
+- NumPy `[grid]`: a `GRID_CELLS` x `GRID_CELLS` grid over the bounding box, each cell listing the neighborhoods whose
+  bounding box overlaps it. The points are bucketed into cells and only tested against the neighborhoods of their cell.
+- Shapely `[bbox_scan]`: the same bounding box scan, with `shapely.contains_xy` on prepared polygons as the test
+- Shapely `[strtree]`: an STR-tree of the polygons, queried with every point (`STRtree.query(predicate="intersects")`)
+- DuckDB: a join on `ST_Contains` with the `spatial` extension, when it is installed locally (not downloaded)
+
+Shapely and DuckDB cases are only registered when shapely or the spatial extension are available.
+
+After the timings `throughput` prints points per second by index type, the time to build each index (built again,
+uncached) and whether each method's counts match the NumPy bounding box scan (each method is run once more). It runs
+in the process that prints the report, so it also works for cases run with `--isolate`.
+
+Variables:
+- `SUITE`: Name of the suite in the registry.
+- `NEIGHBORHOODS_PATH`: The bundled neighborhood polygons.
+- `SEED`: Seed of the generated points.
+- `GRID_CELLS`: Cells per axis of the grid index.
+- `INDEXES`: Index type of each method, by case variant.
+- `BUILDS`: Uncached build function of each index, by case variant, timed by `throughput`.
+- `REPEAT_TIMES`: Number of times each function will be run when this file is run as a script.
+- `con`: DuckDB connection object for executing SQL queries.
+'''
+
+# parameters
+SUITE = "spatial"
+NEIGHBORHOODS_PATH = "data/citibike/nyc-neighborhoods.geojson"
+SEED = 0
+GRID_CELLS = 64
+INDEXES = {"bbox_scan": "bounding boxes (scan)", "grid": "grid", "strtree": "STR-tree", "": "spatial join"}
+REPEAT_TIMES = 3
+TITLES = {"single": "Single File", "multi": "Multiple Files"}
+
+# init
+con = duckdb.connect()
+try:
+    # only a locally installed extension, a benchmark should not download one
+    con.execute("SET autoinstall_known_extensions = false")
+    con.execute("LOAD spatial")
+    SPATIAL_EXTENSION = True
+except duckdb.Error:
+    SPATIAL_EXTENSION = False
+SHAPELY = importlib.util.find_spec("shapely") is not None
+
+
+### Inputs
+# DataFrame of the neighborhoods (name, borough, bounding box) and the rings of each polygon as (n, 2) arrays
+@cache
+def neighborhoods():
+    with open(NEIGHBORHOODS_PATH) as f:
+        features = json.load(f)["features"]
+    rows, rings = [], []
+    for feature in features:
+        coordinates = feature["geometry"]["coordinates"]
+        polygons = coordinates if feature["geometry"]["type"] == "MultiPolygon" else [coordinates]
+        feature_rings = [np.asarray(ring, dtype=np.float64) for polygon in polygons for ring in polygon]
+        points = np.concatenate(feature_rings)
+        (min_x, min_y), (max_x, max_y) = points.min(axis=0), points.max(axis=0)
+        rows.append({
+            "neighborhood": feature["properties"]["neighborhood"],
+            "borough": feature["properties"]["borough"],
+            "min_x": min_x, "min_y": min_y, "max_x": max_x, "max_y": max_y,
+        })
+        rings.append(feature_rings)
+    return pd.DataFrame(rows), rings
+
+
+@cache
+def points(ds):
+    count = ds.num_rows
+    frame, _ = neighborhoods()
+    rng = np.random.default_rng(SEED)
+    x = rng.uniform(frame["min_x"].min(), frame["max_x"].max(), count)
+    y = rng.uniform(frame["min_y"].min(), frame["max_y"].max(), count)
+    return x, y
+
+
+# Points per neighborhood from the neighborhood index of every point (-1 for none)
+def count_points(assigned):
+    frame, _ = neighborhoods()
+    counts = np.bincount(assigned[assigned >= 0], minlength=len(frame))
+    return frame[["neighborhood", "borough"]].assign(points=counts)
+
+
+### NumPy
+# Even-odd ray casting: whether each point is inside the polygon (holes included), one edge at a time
+def contains(rings, x, y):
+    inside = np.zeros(len(x), dtype=bool)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for ring in rings:
+            for (ax, ay), (bx, by) in zip(ring[:-1], ring[1:]):
+                crosses = (ay > y) != (by > y)
+                inside ^= crosses & (x < (bx - ax) * (y - ay) / (by - ay) + ax)
+    return inside
+
+
+def in_bbox(row, x, y):
+    return (x >= row.min_x) & (x <= row.max_x) & (y >= row.min_y) & (y <= row.max_y)
+
+
+# Test `candidates` (point indices) against neighborhood i, assigning the points inside that are not yet assigned
+def assign(assigned, i, candidates, x, y, test):
+    candidates = candidates[assigned[candidates] < 0]
+    inside = test(i, x[candidates], y[candidates])
+    assigned[candidates[inside]] = i
+
+
+def numpy_test(i, x, y):
+    return contains(neighborhoods()[1][i], x, y)
+
+
+def bbox_scan(ds, test):
+    x, y = points(ds)
+    frame, _ = neighborhoods()
+    assigned = np.full(len(x), -1, dtype=np.int64)
+    for row in frame.itertuples():
+        assign(assigned, row.Index, np.flatnonzero(in_bbox(row, x, y)), x, y, test)
+    return assigned
+
+
+# Neighborhoods of every grid cell: cell -> array of neighborhood indices whose bounding box overlaps the cell
+def build_grid():
+    frame, _ = neighborhoods()
+    origin = np.array([frame["min_x"].min(), frame["min_y"].min()])
+    size = (np.array([frame["max_x"].max(), frame["max_y"].max()]) - origin) / GRID_CELLS
+    cells = {}
+    for row in frame.itertuples():
+        x0, y0 = np.clip(((row.min_x, row.min_y) - origin) // size, 0, GRID_CELLS - 1).astype(int)
+        x1, y1 = np.clip(((row.max_x, row.max_y) - origin) // size, 0, GRID_CELLS - 1).astype(int)
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cells.setdefault(cx * GRID_CELLS + cy, []).append(row.Index)
+    # per neighborhood, the cells it has to look at
+    by_neighborhood = {}
+    for cell, members in cells.items():
+        for i in members:
+            by_neighborhood.setdefault(i, []).append(cell)
+    return origin, size, by_neighborhood
+
+
+@cache
+def grid_index():
+    return build_grid()
+
+
+def grid_assign(ds):
+    x, y = points(ds)
+    origin, size, by_neighborhood = grid_index()
+    cx = np.clip(((x - origin[0]) // size[0]).astype(np.int64), 0, GRID_CELLS - 1)
+    cy = np.clip(((y - origin[1]) // size[1]).astype(np.int64), 0, GRID_CELLS - 1)
+    cell = cx * GRID_CELLS + cy
+    # points sorted by cell, so the points of a cell are one slice
+    order = np.argsort(cell, kind="stable")
+    bounds = np.searchsorted(cell[order], np.arange(GRID_CELLS * GRID_CELLS + 1))
+    assigned = np.full(len(x), -1, dtype=np.int64)
+    frame, _ = neighborhoods()
+    for row in frame.itertuples():
+        slices = [order[bounds[c]:bounds[c + 1]] for c in by_neighborhood.get(row.Index, [])]
+        if slices:
+            candidates = np.concatenate(slices)
+            candidates = candidates[in_bbox(row, x[candidates], y[candidates])]
+            assign(assigned, row.Index, np.sort(candidates), x, y, numpy_test)
+    return assigned
+
+
+### Shapely
+@cache
+def shapely_polygons():
+    import shapely
+
+    polygons = [shapely.Polygon(rings[0], rings[1:]) for rings in neighborhoods()[1]]
+    shapely.prepare(polygons)
+    return polygons
+
+
+def build_strtree():
+    import shapely
+
+    return shapely.STRtree(shapely_polygons())
+
+
+@cache
+def strtree():
+    return build_strtree()
+
+
+def shapely_test(i, x, y):
+    import shapely
+
+    return shapely.contains_xy(shapely_polygons()[i], x, y)
+
+
+def strtree_assign(ds):
+    import shapely
+
+    x, y = points(ds)
+    point_index, polygon_index = strtree().query(shapely.points(x, y), predicate="intersects")
+    # the first neighborhood of every point: pairs sorted by point, then neighborhood
+    order = np.lexsort((polygon_index, point_index))
+    first = np.unique(point_index[order], return_index=True)[1]
+    assigned = np.full(len(x), -1, dtype=np.int64)
+    assigned[point_index[order][first]] = polygon_index[order][first]
+    return assigned
+
+
+### DuckDB spatial
+@cache
+def duckdb_neighborhoods():
+    _, rings = neighborhoods()
+    wkt = [
+        "POLYGON(" + ", ".join("(" + ", ".join(f"{px} {py}" for px, py in ring) + ")" for ring in polygon) + ")"
+        for polygon in rings
+    ]
+    shapes = pa.table({"id": np.arange(len(wkt)), "wkt": wkt})
+    con.execute("CREATE OR REPLACE TABLE neighborhoods AS SELECT id, ST_GeomFromText(wkt) AS geom FROM shapes")
+    return "neighborhoods"
+
+
+def duckdb_assign(ds):
+    x, y = points(ds)
+    trips = pa.table({"point_id": np.arange(len(x)), "x": x, "y": y})
+    table = duckdb_neighborhoods()
+    assigned = np.full(len(x), -1, dtype=np.int64)
+    pairs = con.execute(f"""
+        SELECT point_id, min(id) AS id
+        FROM trips JOIN {table} ON ST_Contains(geom, ST_Point(x, y))
+        GROUP BY point_id
+    """).fetchnumpy()
+    assigned[pairs["point_id"]] = pairs["id"]
+    return assigned
+
+
+# Register `assign(ds)`, with `prepare` building the points and the inputs of the method
+def method(engine, variant, assign_points, prepare=None):
+    def prepare_inputs(ds):
+        points(ds)
+        if prepare:
+            prepare()
+    return registry.register(
+        SUITE, "assign", engine, lambda ds: count_points(assign_points(ds)), bm.PANDAS, variant,
+        prepare=prepare_inputs,
+    )
+
+
+method("numpy", "bbox_scan", lambda ds: bbox_scan(ds, numpy_test))
+method("numpy", "grid", grid_assign, grid_index)
+if SHAPELY:
+    method("shapely", "bbox_scan", lambda ds: bbox_scan(ds, shapely_test), shapely_polygons)
+    method("shapely", "strtree", strtree_assign, strtree)
+if SPATIAL_EXTENSION:
+    method("duckdb", "", duckdb_assign, duckdb_neighborhoods)
+BUILDS = {"grid": build_grid, "strtree": build_strtree}
+
+
+def build_time(variant):
+    if variant not in BUILDS:
+        return None
+    started = time.perf_counter()
+    BUILDS[variant]()
+    return time.perf_counter() - started
+
+
+# Points per second of every method by index type, printed by `main.py run` after the timings
+def throughput(results):
+    rows = []
+    baselines = {}
+    for result in results:
+        if result.timing is None:
+            continue
+        ds, variant = result.dataset, result.case.variant
+        count = len(points(ds)[0])
+        if ds.name not in baselines:
+            baselines[ds.name] = count_points(bbox_scan(ds, numpy_test))
+        counts = result.case.bind(ds)()
+        rows.append({
+            "Dataset": ds.name,
+            "Engine": result.label,
+            "Index": INDEXES[variant],
+            "Index Build (s)": build_time(variant),
+            "Points (M)": count / 1e6,
+            "Assigned (%)": 100 * counts["points"].sum() / count,
+            "Median (s)": result.timing.median,
+            "Throughput (M points/s)": count / 1e6 / result.timing.median,
+            "Matches Scan": counts["points"].equals(baselines[ds.name]["points"]),
+        })
+    return pd.DataFrame(rows)
+
+
+registry.register_report(SUITE, throughput)
+
+
+if __name__ == "__main__":
+    ### Run benchmarks
+    results = registry.run_cases(registry.select(suites=[SUITE]), registry.get_datasets(TITLES), runs=REPEAT_TIMES)
+    print(throughput(results))
+
+    ### Plotting results for each dataset
+    for (_, workload, dataset), timings in registry.group_results(results).items():
+        bm.plot_results(timings, f"{TITLES[dataset]}: Point in Polygon", f"speed_spatial_{workload}_{dataset}.png",
+                        xtick_rotation=30)
@@ -0,0 +1,84 @@
+import os
+
+import matplotlib.pyplot as plt
+import pandas as pd
+import seaborn as sns
+
+import executor
+
+'''
+Thread-scaling sweep: how much each engine gains from extra cores.
+
+Every case is rerun in a fresh subprocess (see `executor`) at each thread count, with Polars' pool capped through
+`POLARS_MAX_THREADS`, pyarrow's CPU and I/O pools through `set_cpu_count`/`set_io_thread_count` (which is also what
+Pandas reads Parquet with) and DuckDB through `SET threads`. For each (case, dataset) the speedup at N threads is
+the median at the smallest thread count run divided by the median at N, and the parallel efficiency is the speedup
+divided by the thread ratio: 1.0 is perfect scaling, and the point where efficiency drops off is where extra cores
+stop paying for themselves.
+
+Thread counts above the number of cores oversubscribe the machine, and are only useful to show that.
+
+Variables:
+- `DEFAULT_SUITES`: Suites swept when none are selected.
+'''
+
+DEFAULT_SUITES = ["read_filter"]
+
+
+# 1, 2, 4, ... up to and including the number of cores
+def thread_counts(max_threads=None):
+    max_threads = max_threads or os.cpu_count() or 1
+    counts = []
+    threads = 1
+    while threads < max_threads:
+        counts.append(threads)
+        threads *= 2
+    counts.append(max_threads)
+    return counts
+
+
+# Run every case at every thread count, each case in a fresh process; yields CaseResults as they finish
+def run_scaling(cases, datasets, threads, runs=5, cache=None, **timing_kwargs):
+    for count in threads:
+        yield from executor.run_isolated(cases, datasets, runs=runs, cache=cache, threads=count, **timing_kwargs)
+
+
+# Median, speedup and efficiency per (case, dataset, threads)
+def scaling_table(results):
+    rows = [
+        {"Suite": r.case.suite, "Workload": r.case.workload, "Dataset": r.dataset.name, "Engine": r.label,
+         "Threads": r.threads, "Median (s)": r.timing.median}
+        for r in results if r.timing is not None
+    ]
+    if not rows:
+        return pd.DataFrame()
+    df = pd.DataFrame(rows).sort_values(["Suite", "Workload", "Dataset", "Engine", "Threads"], ignore_index=True)
+    group = df.groupby(["Suite", "Workload", "Dataset", "Engine"])
+    base_time = group["Median (s)"].transform("first")
+    base_threads = group["Threads"].transform("first")
+    df["Speedup"] = base_time / df["Median (s)"]
+    df["Efficiency"] = df["Speedup"] / (df["Threads"] / base_threads)
+    return df
+
+
+def plot_scaling(df, filename_prefix="scaling", show=False):
+    for (suite, workload, dataset), group in df.groupby(["Suite", "Workload", "Dataset"]):
+        fig, (ax_speedup, ax_efficiency) = plt.subplots(1, 2, figsize=(14, 6))
+        sns.lineplot(group, x="Threads", y="Speedup", hue="Engine", marker="o", ax=ax_speedup)
+        threads = sorted(group["Threads"].unique())
+        ax_speedup.plot(threads, [t / threads[0] for t in threads], linestyle="--", color="grey", label="Ideal")
+        ax_speedup.set_title("Speedup")
+        ax_speedup.legend()
+        sns.lineplot(group, x="Threads", y="Efficiency", hue="Engine", marker="o", ax=ax_efficiency)
+        ax_efficiency.axhline(1.0, linestyle="--", color="grey")
+        ax_efficiency.set_ylim(bottom=0)
+        ax_efficiency.set_title("Parallel Efficiency")
+        for ax in (ax_speedup, ax_efficiency):
+            ax.set_xscale("log", base=2)
+            ax.set_xticks(threads, [str(t) for t in threads])
+        fig.suptitle(f"Thread Scaling: {suite} / {workload} ({dataset})")
+        fig.tight_layout()
+        fig.savefig(f"images/{filename_prefix}_{suite}_{workload}_{dataset}.png")
+        if show:
+            plt.show()
+        plt.close(fig)
@@ -1,254 +1,205 @@
-from warnings import filters
 import pandas as pd
 import polars as pl
 import duckdb
-from datetime import datetime
-import glob
 
 # Benchmark .py file
 import benchmark as bm
+import registry
+from registry import case
 
 '''
 Comparing speeds of Pandas, Polars, and DuckDB against various functions on Parquet files such as reading and filtering.
 This script benchmarks various read and filter operations on chosen Parquet files using Pandas, Polars, and DuckDB.
-It includes functions to read all data, filter data by a date condition, and count rows, as well as miscellaneous
-comparisons between Polars LazyFrame and DataFrame, and different Pandas read methods.
+It includes functions to read all data, filter data by a date condition, and count rows, each declared once in the
+`registry` and run against both the single-file and the multi-file datasets.
 
-Pandas uses read_parqet which loads the data into memory. Polars has the option to use scan_parquet then collect which is
-significantly more memory efficient. DuckDB is very fast since it uses SQL, however, this benchmark does not return a df
-after a DuckDB query. Take that as you will. It's more focused on the query itself.
+Pandas uses read_parquet, which loads the data into memory: one file with the filter pushed down, multiple files one
+at a time, concatenated and then filtered in Pandas. "Pandas (Tuned)" is the same workload written the fast way: one
+`pyarrow.dataset` over all the files, which reads them concurrently with the filter and projection pushed down, and a
+single `to_pandas(types_mapper=pd.ArrowDtype)` on the combined Arrow table, so the columns stay Arrow-backed instead
+of being copied into NumPy. On the multiple files the gap between the two is the naive loop, not the library.
 
-This script uses the `benchmark` module to measure the time taken for each operation and plot the results.
+Polars has the option to use scan_parquet then collect which should be more memory efficient; the peak memory
+recorded for every case (second panel of each plot) shows by how much. DuckDB is very fast since it uses SQL.
 
+Each case declares an output contract and the harness materialises it inside the timed region: Pandas and Polars
+build their DataFrames, the DuckDB queries are fetched into an Arrow table (or a scalar for the row counts) so that
+DuckDB is timed end-to-end like the others.
+
+Run through the CLI (`python main.py run --suite read_filter`) or directly as a script, which runs every dataset and
+writes the plots to `images/`.
 
 Variables:
-- `SINGLE_FILE`: A single Parquet file to be used for benchmarking.
-- `MULTI_FILES`: Multiple Parquet files to be used for benchmarking.
-- `FILTER`: The row filter to be applied.
-- `COLUMNS`: The column filter to be applied.
-- `TITLE_START`: The start of the title to use for each output.
-- `REPEAT_TIMES`: Number of times each function will be run to average the time taken.
+- `SUITE`: Name of the suite in the registry.
+- `REPEAT_TIMES`: Number of times each function will be run when this file is run as a script.
+- `IMAGES`: Plot file names for each (workload, dataset) when this file is run as a script.
 - `con`: DuckDB connection object for executing SQL queries.
 '''
 
 # parameters
-SINGLE_FILE = 'data/taxi_2019_04.parquet'
-MULTI_FILE_PATH = "data/taxi/yellow*.parquet"
-MULTI_FILES = glob.glob(MULTI_FILE_PATH)
-
-FILTER = [("pickup_at", ">", datetime(2019, 6, 30))]
-COLUMNS = ["pickup_at"]
-SHOW_PLOTS = False
+SUITE = "read_filter"
 REPEAT_TIMES = 5
-READ_SINGLE_FILE = True
-if READ_SINGLE_FILE:
-    TITLE_START = "Single File Benchmarks"
-else:
-    TITLE_START = "Multiple File Benchmarks"
+IMAGES = {
+    ("read_all", "single"): ("Read All Data", "speed_read_all_single_file.png"),
+    ("filter_all", "single"): ("Filter & Return All Columns", "speed_filter_return_all_cols_single_file.png"),
+    ("filter_one", "single"): ("Filter & Return One Column", "speed_filter_return_one_cols_single_file.png"),
+    ("filter_count", "single"): ("Filtered Row Count", "speed_filter_count_rows_single_file.png"),
+    ("read_all", "multi"): ("Read All Data", "speed_read_all_multiple_files.png"),
+    ("filter_all", "multi"): ("Filter & Return All Columns", "speed_filter_return_all_cols_multiple_files.png"),
+    ("filter_one", "multi"): ("Filter & Return One Column", "speed_filter_return_one_cols_multiple_files.png"),
+    ("filter_count", "multi"): ("Filtered Row Count", "speed_filter_count_rows_multiple_files.png"),
+}
+TITLES = {"single": "Single File Benchmarks", "multi": "Multiple File Benchmarks"}
 
 # init
 con = duckdb.connect()
 
-if READ_SINGLE_FILE:
-    ### Functions to compare on speeds - for one parquet SINGLE_FILE 'alltaxi.parquet'
-    # Ordinary read functions on all data without filters
-    def pandas_read_all():
-        return pd.read_parquet(SINGLE_FILE)
-    def polars_read_all():
-        return pl.scan_parquet(SINGLE_FILE).collect()
-    def duckdb_read_all():
-        return con.execute(f"SELECT * FROM '{SINGLE_FILE}'")
-
-    # Filtering function 1 - read ALL columns with filter on pickup_at > '2019-06-30'
-    def pandas_filter_all():
-        return pd.read_parquet(SINGLE_FILE, filters=[("pickup_at", ">", datetime(2019, 6, 30))])
-    def polars_filter_all():
-        return (
-            pl.scan_parquet(SINGLE_FILE)
-            .filter(pl.col("pickup_at").dt.date() > pl.datetime(2019, 6, 30))
-            .collect()
-        )
-    def duckdb_filter_all():
-        return con.execute(f"""
-            SELECT *
-            FROM '{SINGLE_FILE}'
-            WHERE pickup_at > '2019-06-30'
-        """)
-
-    # Filtering function 2 - read ONE column with filter on pickup_at > '2019-06-30'
-    def pandas_filter_one():
-        return pd.read_parquet(SINGLE_FILE, columns=['pickup_at'], filters=[("pickup_at", ">", datetime(2019, 6, 30))])
-    def polars_filter_one():
-        return (
-            pl.scan_parquet(SINGLE_FILE).select(COLUMNS)
-            .filter(pl.col("pickup_at").dt.date() > pl.datetime(2019, 6, 30))
-            .collect()
-        )
-    def duckdb_filter_one():
-        return con.execute(f"""
-            SELECT pickup_at
-            FROM '{SINGLE_FILE}'
-            WHERE pickup_at > '2019-06-30'
-        """)
-
-    # Filtering function 3 - count rows with filter on pickup_at > '2019-06-30'
-    # Note: only selecting one column for optimal row count performance
-    def pandas_filter_count():
-        return len(pd.read_parquet(SINGLE_FILE, columns=['pickup_at'], filters=[("pickup_at", ">", datetime(2019, 6, 30))]))
-    def polars_filter_count():
-        return len(
-            pl.scan_parquet(SINGLE_FILE)
-            .filter(pl.col("pickup_at").dt.date() > pl.datetime(2019, 6, 30))
-            .select(["pickup_at"])
-            .collect()
-        )
-    def duckdb_filter_count():
-        return con.execute(f"""
-            SELECT count(*)
-            FROM '{SINGLE_FILE}'
-            WHERE pickup_at > '2019-06-30'
-        """)
 
+# Pandas reads one file directly with the filter pushed down, multiple files one at a time, concatenated and then
+# filtered in Pandas (the naive loop)
+def pandas_read(ds, columns=None, filtered=False):
+    files = ds.files
+    if len(files) == 1:
+        return pd.read_parquet(files[0], columns=columns, filters=ds.filters if filtered else None)
+    df = pd.concat([pd.read_parquet(f, columns=columns) for f in files])
+    return df[df[ds.time_column] > ds.cutoff] if filtered else df
+
+
+def pandas_tuned_read(ds, columns=None, filtered=False):
+    table = ds.arrow_dataset.to_table(columns=columns, filter=ds.arrow_filter if filtered else None)
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def polars_predicate(ds):
+    return pl.col(ds.time_column) > ds.cutoff
+
+
+### Ordinary read functions on all data without filters
+@case(SUITE, "read_all", "pandas", bm.PANDAS)
+def pandas_read_all(ds):
+    return pandas_read(ds)
+
+@case(SUITE, "read_all", "pandas_tuned", bm.PANDAS)
+def pandas_tuned_read_all(ds):
+    return pandas_tuned_read(ds)
+
+@case(SUITE, "read_all", "polars", bm.POLARS)
+def polars_read_all(ds):
+    return pl.read_parquet(ds.source)
+
+@case(SUITE, "read_all", "polars_lazy", bm.POLARS)
+def polars_lazy_read_all(ds):
+    return pl.scan_parquet(ds.source).collect()
+
+@case(SUITE, "read_all", "duckdb", bm.ARROW)
+def duckdb_read_all(ds):
+    return con.execute(f"SELECT * FROM {ds.sql_source}")
+
+
+### Filtering function 1 - read ALL columns with filter on the time column
+@case(SUITE, "filter_all", "pandas", bm.PANDAS)
+def pandas_filter_all(ds):
+    return pandas_read(ds, filtered=True)
+
+@case(SUITE, "filter_all", "pandas_tuned", bm.PANDAS)
+def pandas_tuned_filter_all(ds):
+    return pandas_tuned_read(ds, filtered=True)
+
+@case(SUITE, "filter_all", "polars", bm.POLARS)
+def polars_filter_all(ds):
+    return pl.read_parquet(ds.source).filter(polars_predicate(ds))
+
+@case(SUITE, "filter_all", "polars_lazy", bm.POLARS)
+def polars_lazy_filter_all(ds):
+    return (
+        pl.scan_parquet(ds.source)
+        .filter(polars_predicate(ds))
+        .collect()
+    )
+
+@case(SUITE, "filter_all", "duckdb", bm.ARROW)
+def duckdb_filter_all(ds):
+    return con.execute(f"""
+        SELECT *
+        FROM {ds.sql_source}
+        WHERE {ds.sql_filter}
+    """)
+
+
+### Filtering function 2 - read ONE column with filter on the time column
+@case(SUITE, "filter_one", "pandas", bm.PANDAS)
+def pandas_filter_one(ds):
+    return pandas_read(ds, columns=[ds.time_column], filtered=True)
+
+@case(SUITE, "filter_one", "pandas_tuned", bm.PANDAS)
+def pandas_tuned_filter_one(ds):
+    return pandas_tuned_read(ds, columns=[ds.time_column], filtered=True)
+
+@case(SUITE, "filter_one", "polars", bm.POLARS)
+def polars_filter_one(ds):
+    return pl.read_parquet(ds.source, columns=[ds.time_column]).filter(polars_predicate(ds))
+
+@case(SUITE, "filter_one", "polars_lazy", bm.POLARS)
+def polars_lazy_filter_one(ds):
+    return (
+        pl.scan_parquet(ds.source).select(ds.time_column)
+        .filter(polars_predicate(ds))
+        .collect()
+    )
+
+@case(SUITE, "filter_one", "duckdb", bm.ARROW)
+def duckdb_filter_one(ds):
+    return con.execute(f"""
+        SELECT {ds.time_column}
+        FROM {ds.sql_source}
+        WHERE {ds.sql_filter}
+    """)
+
+
+### Filtering function 3 - count rows with filter on the time column
+# Note: only selecting one column for optimal row count performance
+@case(SUITE, "filter_count", "pandas", bm.COUNT)
+def pandas_filter_count(ds):
+    files = ds.files
+    if len(files) == 1:
+        return len(pandas_read(ds, columns=[ds.time_column], filtered=True))
+    # the rows of each file counted after loading it
+    frames = (pd.read_parquet(f, columns=[ds.time_column]) for f in files)
+    return sum(int((df[ds.time_column] > ds.cutoff).sum()) for df in frames)
+
+# counted by the scanner without building a DataFrame at all
+@case(SUITE, "filter_count", "pandas_tuned", bm.COUNT)
+def pandas_tuned_filter_count(ds):
+    return ds.arrow_dataset.count_rows(filter=ds.arrow_filter)
+
+@case(SUITE, "filter_count", "polars", bm.COUNT)
+def polars_filter_count(ds):
+    return pl.read_parquet(ds.source, columns=[ds.time_column]).filter(polars_predicate(ds)).height
+
+@case(SUITE, "filter_count", "polars_lazy", bm.COUNT)
+def polars_lazy_filter_count(ds):
+    return (
+        pl.scan_parquet(ds.source)
+        .filter(polars_predicate(ds))
+        .select(pl.len())
+        .collect()
+        .item()
+    )
+
+@case(SUITE, "filter_count", "duckdb", bm.COUNT)
+def duckdb_filter_count(ds):
+    return con.execute(f"""
+        SELECT count(*)
+        FROM {ds.sql_source}
+        WHERE {ds.sql_filter}
+    """)
+
+
+if __name__ == "__main__":
     ### Run benchmarks
-    # Benchmark: Read all data (no filter)
-    results_all = {
-        "Pandas": bm.timing(pandas_read_all, runs=REPEAT_TIMES, label="Pandas"),
-        "Polars": bm.timing(polars_read_all, runs=REPEAT_TIMES, label="Polars"),
-        "DuckDB": bm.timing(duckdb_read_all, runs=REPEAT_TIMES, label="DuckDB"),
-    }
-
-    # Benchmark: Filter column and return all columns
-    results_filter_all = {
-        "Pandas": bm.timing(pandas_filter_all, runs=REPEAT_TIMES, label="Pandas"),
-        "Polars": bm.timing(polars_filter_all, runs=REPEAT_TIMES, label="Polars"),
-        "DuckDB": bm.timing(duckdb_filter_all, runs=REPEAT_TIMES, label="DuckDB"),
-    }
-
-    # Benchmark: Filter column and return that one column
-    results_filter_one = {
-        "Pandas": bm.timing(pandas_filter_one, runs=REPEAT_TIMES, label="Pandas"),
-        "Polars": bm.timing(polars_filter_one, runs=REPEAT_TIMES, label="Polars"),
-        "DuckDB": bm.timing(duckdb_filter_one, runs=REPEAT_TIMES, label="DuckDB"),
-    }
-
-    # Benchmark: Filter count
-    results_filter_count = {
-        "Pandas": bm.timing(pandas_filter_count, runs=REPEAT_TIMES, label="Pandas"),
-        "Polars": bm.timing(polars_filter_count, runs=REPEAT_TIMES, label="Polars"),
-        "DuckDB": bm.timing(duckdb_filter_count, runs=REPEAT_TIMES, label="DuckDB"),
-    }
-
-    ### Plotting results
-    # Plot each benchmark group
-    bm.plot_results(results_all, f"{TITLE_START}: Read All Data", "speed_read_all_single_file.png")
-    bm.plot_results(results_filter_all, f"{TITLE_START}: Filter & Return All Columns", "speed_filter_return_all_cols_single_file.png")
-    bm.plot_results(results_filter_one, f"{TITLE_START}: Filter & Return One Column", "speed_filter_return_one_cols_single_file.png")
-    bm.plot_results(results_filter_count, f"{TITLE_START}: Filtered Row Count", "speed_filter_count_rows_single_file.png")
-    
-else:
-    ### Functions to compare for reading multiple parquet files
-    # Ordinary read functions on all data without filters
-    def pandas_read_multi():
-        return pd.concat([pd.read_parquet(f) for f in MULTI_FILES])
-    def polars_read_multi():
-        return pl.read_parquet(MULTI_FILES)
-    def duckdb_read_multi():
-        return con.execute(f"SELECT * FROM '{MULTI_FILE_PATH}'")
-    
-    # Filtering function 1 - read ALL columns with filter of pickup month July or older
-    def pandas_multi_filter_all():
-        df = pd.concat([pd.read_parquet(f) for f in MULTI_FILES])
-        return df[df["tpep_pickup_datetime"].dt.month >= 7]
-    def polars_multi_filter_all():
-        return (
-            pl.scan_parquet(MULTI_FILES)
-            .filter(pl.col("tpep_pickup_datetime").dt.month() >= 7)
-            .collect()
-        )
-    def duckdb_multi_filter_all():
-        return con.execute(f"""
-            SELECT *
-            FROM '{MULTI_FILE_PATH}'
-            WHERE EXTRACT(MONTH FROM tpep_pickup_datetime) >= 7
-        """)
-
-    # Filtering function 2 - read ONE column with filter of pickup month July or older
-    def pandas_multi_filter_one():
-        df = pd.concat([
-            pd.read_parquet(f, columns=['tpep_pickup_datetime'])
-            for f in MULTI_FILES
-        ])
-        return df[df["tpep_pickup_datetime"].dt.month >= 7]
-    def polars_multi_filter_one():
-        return (
-            pl.scan_parquet(MULTI_FILES)
-            .filter(pl.col("tpep_pickup_datetime").dt.month() >= 7)
-            .select(["tpep_pickup_datetime"])
-            .collect()
-        )
-    def duckdb_multi_filter_one():
-        return con.execute(f"""
-            SELECT tpep_pickup_datetime
-            FROM '{MULTI_FILE_PATH}'
-            WHERE EXTRACT(MONTH FROM tpep_pickup_datetime) >= 7
-        """)
-
-    # Filtering function 3 - count rows with filter of pickup month July or older
-    # Note: only selecting one column for optimal row count performance
-    def pandas_multi_filter_count():
-        return sum([
-            len(
-                pd.read_parquet(f, columns=['tpep_pickup_datetime'])
-                .query("tpep_pickup_datetime.dt.month >= 7")
-            )
-            for f in MULTI_FILES
-        ])
-    def polars_multi_filter_count():
-        return (
-            pl.scan_parquet(MULTI_FILES)
-            .filter(pl.col("tpep_pickup_datetime").dt.month() >= 7)
-            .select(["tpep_pickup_datetime"])
-            .collect()
-            .height
-        )
-    def duckdb_multi_filter_count():
-        return con.execute(f"""
-            SELECT count(*)
-            FROM '{MULTI_FILE_PATH}'
-            WHERE EXTRACT(MONTH FROM tpep_pickup_datetime) >= 7
-        """)
-    
-    ### Run benchmarks
-    # Benchmark: Read all data (no filter)
-    results_all = {
-        "Pandas": bm.timing(pandas_read_multi, runs=REPEAT_TIMES, label="Pandas"),
-        "Polars": bm.timing(polars_read_multi, runs=REPEAT_TIMES, label="Polars"),
-        "DuckDB": bm.timing(duckdb_read_multi, runs=REPEAT_TIMES, label="DuckDB"),
-    }
-
-    # Benchmark: Filter column and return all columns
-    results_filter_all = {
-        "Pandas": bm.timing(pandas_multi_filter_all, runs=REPEAT_TIMES, label="Pandas"),
-        "Polars": bm.timing(polars_multi_filter_all, runs=REPEAT_TIMES, label="Polars"),
-        "DuckDB": bm.timing(duckdb_multi_filter_all, runs=REPEAT_TIMES, label="DuckDB"),
-    }
-
-    # Benchmark: Filter column and return that one column
-    results_filter_one = {
-        "Pandas": bm.timing(pandas_multi_filter_one, runs=REPEAT_TIMES, label="Pandas"),
-        "Polars": bm.timing(polars_multi_filter_one, runs=REPEAT_TIMES, label="Polars"),
-        "DuckDB": bm.timing(duckdb_multi_filter_one, runs=REPEAT_TIMES, label="DuckDB"),
-    }
-
-    # Benchmark: Filter count
-    results_filter_count = {
-        "Pandas": bm.timing(pandas_multi_filter_count, runs=REPEAT_TIMES, label="Pandas"),
-        "Polars": bm.timing(polars_multi_filter_count, runs=REPEAT_TIMES, label="Polars"),
-        "DuckDB": bm.timing(duckdb_multi_filter_count, runs=REPEAT_TIMES, label="DuckDB"),
-    }
+    results = registry.run_cases(registry.select(suites=[SUITE]), registry.get_datasets(TITLES), runs=REPEAT_TIMES)
 
     ### Plotting results for each benchmark group
-    bm.plot_results(results_all, f"{TITLE_START}: Read All Data", "speed_read_all_multiple_files.png")
-    bm.plot_results(results_filter_all, f"{TITLE_START}: Filter & Return All Columns", "speed_filter_return_all_cols_multiple_files.png")
-    bm.plot_results(results_filter_one, f"{TITLE_START}: Filter & Return One Column", "speed_filter_return_one_cols_multiple_files.png")
-    bm.plot_results(results_filter_count, f"{TITLE_START}: Filtered Row Count", "speed_filter_count_rows_multiple_files.png")
+    for (_, workload, dataset), timings in registry.group_results(results).items():
+        title, filename = IMAGES[(workload, dataset)]
+        bm.plot_results(timings, f"{TITLES[dataset]}: {title}", filename)
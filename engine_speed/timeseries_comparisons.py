@@ -0,0 +1,260 @@
+import os
+from functools import cache, partial
+
+import duckdb
+import numpy as np
+import pandas as pd
+import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import benchmark as bm
+import registry
+
+'''
+Time-series comparisons for Pandas, Polars (eager and lazy) and DuckDB: time buckets, rolling windows, as-of joins and
+lag/lead over the pickup timestamps, on input sorted by pickup time and on the same rows shuffled.
+
+The inputs are written once per dataset under `data/timeseries/<dataset>/` before the first run, and rewritten when
+the source files change, with the same column names for every taxi schema (`pickup_at`, `pickup_location`,
+`total_amount`, `trip_distance`):
+- `sorted.parquet`: the trips ordered by pickup time
+- `unsorted.parquet`: the same trips in a fixed pseudo-random order
+- `readings.parquet`: `READINGS` readings (`reading_at`, `surge`) at random times over the trips' time range, sorted,
+  the right side of the as-of join
+
+Every case has a `[sorted]` and an `[unsorted]` variant. Where an operation needs ordered input, the sorted variants
+tell the engine instead of sorting: Polars gets the sorted flag (`set_sorted`), Pandas sees a monotonic column. The
+unsorted variants sort first (or pass `order_by` to Polars' `over`). DuckDB runs the same SQL on both.
+
+Workloads:
+- `resample_5min`, `resample_hourly`: trips and total_amount per 5-minute and hourly bin (`resample`,
+  `group_by_dynamic`, `time_bucket`), non-empty bins in time order
+- `rolling_1h`: mean total_amount over the hour up to each trip (`rolling("1h")`, `rolling_mean_by`, a `RANGE` window),
+  one row per trip
+- `asof_join`: each trip with the latest reading at or before its pickup (`merge_asof`, `join_asof`, `ASOF JOIN`)
+- `lag_lead`: per pickup location, the time since the previous pickup and the next trip's total_amount (`shift`
+  per group, `shift().over()`, `lag`/`lead`)
+
+Variables:
+- `SUITE`: Name of the suite in the registry.
+- `TIMESERIES_DIR`: Where the inputs are written.
+- `READINGS`: Number of rows of the as-of join's right side.
+- `BINS`: Bin width of each resample workload, in each engine's notation.
+- `WORKLOADS`: (engine, function, output) of every workload.
+- `REPEAT_TIMES`: Number of times each function will be run when this file is run as a script.
+- `con`: DuckDB connection object for executing SQL queries.
+'''
+
+# parameters
+SUITE = "timeseries"
+TIMESERIES_DIR = "data/timeseries"
+READINGS = 100_000
+BINS = {
+    "resample_5min": {"pandas": "5min", "polars": "5m", "duckdb": "5 minutes"},
+    "resample_hourly": {"pandas": "1h", "polars": "1h", "duckdb": "1 hour"},
+}
+TIME = "pickup_at"
+LOCATION = "pickup_location"
+REPEAT_TIMES = 3
+TITLES = {"single": "Single File", "multi": "Multiple Files"}
+
+# init
+con = duckdb.connect()
+
+
+### Generating the inputs
+def _readings(ds):
+    low, high = con.execute(f"SELECT min({ds.time_column}), max({ds.time_column}) FROM {ds.sql_source}").fetchone()
+    rng = np.random.default_rng(0)
+    offsets = np.sort(rng.integers(0, int((high - low).total_seconds()) + 1, READINGS))
+    return pa.table({
+        "reading_at": pa.array(np.datetime64(low, "us") + offsets.astype("timedelta64[s]"), type=pa.timestamp("us")),
+        "surge": np.round(1 + np.abs(rng.normal(0, 0.2, READINGS)), 2),
+    })
+
+
+def _write_inputs(ds, directory):
+    trips = f"""
+        SELECT CAST({ds.time_column} AS TIMESTAMP) AS {TIME}, {ds.column("pickup_location")} AS {LOCATION},
+            total_amount, trip_distance
+        FROM {ds.sql_source}
+        WHERE {ds.time_column} IS NOT NULL
+    """
+    con.execute(f"COPY ({trips} ORDER BY {TIME}) TO '{directory}/sorted.parquet' (FORMAT parquet)")
+    con.execute(f"""
+        COPY ({trips} ORDER BY hash({TIME}, {LOCATION}, total_amount, trip_distance))
+        TO '{directory}/unsorted.parquet' (FORMAT parquet)
+    """)
+    pq.write_table(_readings(ds), os.path.join(directory, "readings.parquet"))
+
+
+# Directory of the inputs of a dataset; regenerated when the source files are newer
+@cache
+def timeseries_inputs(ds):
+    return registry.staged_path(
+        ds, os.path.join(TIMESERIES_DIR, ds.name), lambda directory: _write_inputs(ds, directory), directory=True,
+    )
+
+
+def input_path(ds, name):
+    return os.path.join(timeseries_inputs(ds), f"{name}.parquet")
+
+
+def trips_path(ds, sorted_input):
+    return input_path(ds, "sorted" if sorted_input else "unsorted")
+
+
+### Pandas
+# The trips, ordered by pickup time: already in order for the sorted input
+def pandas_ordered(ds, sorted_input):
+    df = pd.read_parquet(trips_path(ds, sorted_input))
+    return df if sorted_input else df.sort_values(TIME, ignore_index=True)
+
+
+def pandas_resample(ds, sorted_input, workload):
+    df = pd.read_parquet(trips_path(ds, sorted_input))
+    bins = df.resample(BINS[workload]["pandas"], on=TIME).agg(
+        trips=("total_amount", "size"), total_amount=("total_amount", "sum"),
+    )
+    return bins[bins["trips"] > 0].reset_index()
+
+
+def pandas_rolling(ds, sorted_input):
+    df = pandas_ordered(ds, sorted_input)
+    return df.assign(total_amount_1h=df.rolling("1h", on=TIME, closed="both")["total_amount"].mean())
+
+
+def pandas_asof(ds, sorted_input):
+    readings = pd.read_parquet(input_path(ds, "readings"))
+    return pd.merge_asof(pandas_ordered(ds, sorted_input), readings, left_on=TIME, right_on="reading_at")
+
+
+def pandas_lag_lead(ds, sorted_input):
+    df = pandas_ordered(ds, sorted_input)
+    grouped = df.groupby(LOCATION, sort=False)
+    return df[[LOCATION, TIME]].assign(
+        since_previous=df[TIME] - grouped[TIME].shift(1),
+        next_total_amount=grouped["total_amount"].shift(-1),
+    )
+
+
+### Polars: the same functions for DataFrames and LazyFrames
+# The trips, ordered by pickup time: the sorted input only gets the sorted flag
+def polars_ordered(df, sorted_input):
+    return df.with_columns(pl.col(TIME).set_sorted()) if sorted_input else df.sort(TIME)
+
+
+def polars_resample(df, sorted_input, workload):
+    return polars_ordered(df, sorted_input).group_by_dynamic(TIME, every=BINS[workload]["polars"]).agg(
+        pl.len().alias("trips"), pl.col("total_amount").sum(),
+    )
+
+
+def polars_rolling(df, sorted_input):
+    return polars_ordered(df, sorted_input).with_columns(
+        pl.col("total_amount").rolling_mean_by(TIME, window_size="1h", closed="both").alias("total_amount_1h"),
+    )
+
+
+def polars_asof(df, readings, sorted_input):
+    return polars_ordered(df, sorted_input).join_asof(
+        readings.with_columns(pl.col("reading_at").set_sorted()), left_on=TIME, right_on="reading_at",
+    )
+
+
+def polars_lag_lead(df, sorted_input):
+    # rows of a location are already in time order in the sorted input, otherwise `over` orders them
+    order_by = None if sorted_input else TIME
+    return df.select(
+        LOCATION, TIME,
+        (pl.col(TIME) - pl.col(TIME).shift(1)).over(LOCATION, order_by=order_by).alias("since_previous"),
+        pl.col("total_amount").shift(-1).over(LOCATION, order_by=order_by).alias("next_total_amount"),
+    )
+
+
+def polars_case(func, lazy, needs_readings=False):
+    read = pl.scan_parquet if lazy else pl.read_parquet
+
+    def run(ds, sorted_input):
+        inputs = [read(trips_path(ds, sorted_input))] + ([read(input_path(ds, "readings"))] if needs_readings else [])
+        result = func(*inputs, sorted_input)
+        return result.collect() if lazy else result
+    return run
+
+
+### DuckDB
+def duckdb_resample(ds, sorted_input, workload):
+    return con.execute(f"""
+        SELECT time_bucket(INTERVAL '{BINS[workload]["duckdb"]}', {TIME}) AS {TIME},
+            count(*) AS trips, sum(total_amount) AS total_amount
+        FROM '{trips_path(ds, sorted_input)}'
+        GROUP BY ALL
+        ORDER BY {TIME}
+    """)
+
+
+def duckdb_rolling(ds, sorted_input):
+    return con.execute(f"""
+        SELECT *, avg(total_amount) OVER (
+            ORDER BY {TIME} RANGE BETWEEN INTERVAL 1 HOUR PRECEDING AND CURRENT ROW
+        ) AS total_amount_1h
+        FROM '{trips_path(ds, sorted_input)}'
+    """)
+
+
+def duckdb_asof(ds, sorted_input):
+    return con.execute(f"""
+        SELECT *
+        FROM '{trips_path(ds, sorted_input)}' t
+        ASOF LEFT JOIN '{input_path(ds, "readings")}' r ON t.{TIME} >= r.reading_at
+    """)
+
+
+def duckdb_lag_lead(ds, sorted_input):
+    return con.execute(f"""
+        SELECT {LOCATION}, {TIME},
+            {TIME} - lag({TIME}) OVER w AS since_previous,
+            lead(total_amount) OVER w AS next_total_amount
+        FROM '{trips_path(ds, sorted_input)}'
+        WINDOW w AS (PARTITION BY {LOCATION} ORDER BY {TIME})
+    """)
+
+
+### Registering every (workload, engine, variant)
+def engine_funcs(pandas_func, polars_func, duckdb_func, needs_readings=False):
+    return [
+        ("pandas", pandas_func, bm.PANDAS),
+        ("polars", polars_case(polars_func, lazy=False, needs_readings=needs_readings), bm.POLARS),
+        ("polars_lazy", polars_case(polars_func, lazy=True, needs_readings=needs_readings), bm.POLARS),
+        ("duckdb", duckdb_func, bm.ARROW),
+    ]
+
+
+WORKLOADS = {
+    **{
+        workload: engine_funcs(partial(pandas_resample, workload=workload), partial(polars_resample, workload=workload),
+                               partial(duckdb_resample, workload=workload))
+        for workload in BINS
+    },
+    "rolling_1h": engine_funcs(pandas_rolling, polars_rolling, duckdb_rolling),
+    "asof_join": engine_funcs(pandas_asof, polars_asof, duckdb_asof, needs_readings=True),
+    "lag_lead": engine_funcs(pandas_lag_lead, polars_lag_lead, duckdb_lag_lead),
+}
+for workload, funcs in WORKLOADS.items():
+    for sorted_input in (True, False):
+        for engine, func, output in funcs:
+            registry.register(
+                SUITE, workload, engine, lambda ds, func=func, sorted_input=sorted_input: func(ds, sorted_input),
+                output, "sorted" if sorted_input else "unsorted", prepare=timeseries_inputs,
+            )
+
+
+if __name__ == "__main__":
+    ### Run benchmarks
+    results = registry.run_cases(registry.select(suites=[SUITE]), registry.get_datasets(TITLES), runs=REPEAT_TIMES)
+
+    ### Plotting results for each workload, sorted and unsorted side by side
+    for (_, workload, dataset), timings in registry.group_results(results).items():
+        bm.plot_results(timings, f"{TITLES[dataset]}: {workload}", f"speed_timeseries_{workload}_{dataset}.png",
+                        xtick_rotation=30)